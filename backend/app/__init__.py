@@ -1,5 +1,6 @@
 from flask import Flask
 from .routes import notifications_bp, frontend_bp
+from .db_pool import init_pool
 import os
 from dotenv import load_dotenv
 
@@ -13,6 +14,9 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default-secret-key')
     app.config['DEBUG'] = os.getenv('FLASK_ENV', 'development') == 'development'
 
+    # One database connection pool per process; requests check connections out through get_db()
+    init_pool(app)
+
     # Register blueprints
     app.register_blueprint(notifications_bp, url_prefix='/api')  # API routes
     app.register_blueprint(frontend_bp)  # Frontend routes
@@ -1,5 +1,7 @@
 import requests
 import json
+from app.http_client import http_get
+from app.database import bulk_update_listings, stream_rows, STAGE_CHUNK_SIZE
 
 def get_gold_price_per_gram():
     """
@@ -27,7 +29,7 @@ def get_gold_price_per_gram():
         endpoint_url = "https://forex-data-feed.swissquote.com/public-quotes/bboquotes/instrument/XAU/USD"
 
         # Send a GET request to the specified endpoint
-        response = requests.get(endpoint_url)
+        response = http_get(endpoint_url)
 
         # Raise an exception if the request was not successful (e.g., 404, 500)
         response.raise_for_status()  # This is crucial for proper error handling
@@ -97,8 +99,7 @@ def calculate_profit(row, current_gold_price):
         print(f"Error calculating profit for item {row[0]}: {e}")
         return None, None
 
-def update_profit_column(conn):
-    cursor = conn.cursor()
+def update_profit_column(conn, chunk_size=STAGE_CHUNK_SIZE):
     successful_updates = 0
     failed_updates = 0
 
@@ -111,28 +112,25 @@ def update_profit_column(conn):
             AND weight IS NOT NULL
             AND purity IS NOT NULL;
         """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
         current_gold_price = get_gold_price_per_gram()
         if current_gold_price is None:
-            print("Failed to retrieve the current gold price. Exiting.")
+            # Like the pipeline's profit stage: leave the listings unpriced for the next run
+            print("Warning: no gold price available; profit will be calculated on the next run.")
             return
 
-        # Calculate profit for each row and update the 'profit' column
-        for row in rows:
+        # Calculate profit for each row; the 'profit' and 'melt_value' columns are updated in bulk,
+        # one chunk of streamed rows at a time
+        updates = []
+        for row in stream_rows(conn, query, chunk_size=chunk_size):
+            if len(updates) >= chunk_size:
+                bulk_update_listings(conn, ['profit', 'melt_value'], updates)
+                updates = []
             try:
                 # Calculate melt value and profit
                 melt_value, profit = calculate_profit(row, current_gold_price)
                 
                 if melt_value is not None and profit is not None:
-                    # Update the 'profit' and 'melt_value' columns for the current row
-                    update_query = """
-                        UPDATE ebay_listings
-                        SET profit = %s, melt_value = %s
-                        WHERE item_id = %s;
-                    """
-                    cursor.execute(update_query, (profit, melt_value, row[0]))
+                    updates.append((row[0], profit, melt_value))
                     successful_updates += 1
                 else:
                     print(f"Skipping profit update for item {row[0]} due to invalid calculations")
@@ -142,11 +140,10 @@ def update_profit_column(conn):
                 failed_updates += 1
                 continue  # Continue with next item
 
-        conn.commit()
+        bulk_update_listings(conn, ['profit', 'melt_value'], updates)
+        conn.commit()  # Ends the read transaction even when there was nothing to update
         print(f"Updated 'profit' column: {successful_updates} successful, {failed_updates} failed")
 
     except Exception as e:
         conn.rollback()
-        print(f"Error updating 'profit' column: {e}")
-    finally:
-        cursor.close()
\ No newline at end of file
+        raise Exception(f"Error updating 'profit' column: {e}")
\ No newline at end of file
@@ -0,0 +1,166 @@
+import uuid
+import psycopg2
+
+# --- Configuration ---
+RESUME_MAX_AGE_HOURS = 24 # An unfinished run older than this is abandoned rather than resumed
+RESUME_MAX_ATTEMPTS = 3 # Attempts (the first try plus resumes) before an unfinished run is abandoned
+
+
+# --- Pipeline runs ---
+
+def start_run(conn, mode):
+    """
+    Records a new run.py run.
+
+    Args:
+        conn: The database connection object.
+        mode (str): 'full', 'incremental' or 'enrich'.
+
+    Returns:
+        str: The new run ID.
+    """
+    run_id = uuid.uuid4().hex[:12]
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO pipeline_runs (run_id, mode) VALUES (%s, %s);", (run_id, mode))
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error recording pipeline run: {e}")
+    finally:
+        cursor.close()
+    return run_id
+
+
+def get_resumable_run(conn, max_age_hours=RESUME_MAX_AGE_HOURS, max_attempts=RESUME_MAX_ATTEMPTS):
+    """
+    Returns the most recent run that didn't complete, counting this as another attempt at it.
+
+    A run started more than max_age_hours ago (its scrape is stale) or already attempted
+    max_attempts times (it keeps failing the same way) is marked 'abandoned' instead, so the
+    caller starts a new run.
+
+    Returns:
+        tuple: (run_id, mode, completed_steps), or None if there is no run to resume.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT run_id, mode, status, completed_steps, attempts,
+                   started_at < NOW() - %s * INTERVAL '1 hour'
+            FROM pipeline_runs
+            ORDER BY started_at DESC LIMIT 1;
+        """, (max_age_hours,))
+        row = cursor.fetchone()
+        if row is None or row[2] in ('completed', 'abandoned'):
+            conn.commit()
+            return None
+        run_id, mode, _, completed_steps, attempts, too_old = row
+        if too_old or attempts >= max_attempts:
+            reason = f"started over {max_age_hours} hours ago" if too_old else f"attempted {attempts} times"
+            cursor.execute("""
+                UPDATE pipeline_runs SET status = 'abandoned', last_error = CONCAT_WS(' ', last_error, %s), updated_at = NOW()
+                WHERE run_id = %s;
+            """, (f"(abandoned: {reason})", run_id))
+            conn.commit()
+            print(f"   Not resuming run {run_id}: {reason}")
+            return None
+        cursor.execute("UPDATE pipeline_runs SET attempts = attempts + 1, updated_at = NOW() WHERE run_id = %s;", (run_id,))
+        conn.commit()
+        return run_id, mode, list(completed_steps)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error looking up the last pipeline run: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def _update_run(conn, run_id, query, params):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error updating pipeline run {run_id}: {e}")
+    finally:
+        cursor.close()
+
+
+# Params: (step, run_id, step). Steps whose work must not be repeated run it in their own transaction.
+MARK_STEP_COMPLETED_SQL = """
+    UPDATE pipeline_runs
+    SET completed_steps = array_append(completed_steps, %s), status = 'running', updated_at = NOW()
+    WHERE run_id = %s AND NOT (%s = ANY(completed_steps));
+"""
+
+
+def mark_step_completed(conn, run_id, step):
+    """Records that a run.py step finished, so a resumed run skips it."""
+    _update_run(conn, run_id, MARK_STEP_COMPLETED_SQL, (step, run_id, step))
+
+
+def finish_run(conn, run_id, error=None):
+    """Marks a run completed, or failed with the error that stopped it."""
+    _update_run(conn, run_id, """
+        UPDATE pipeline_runs SET status = %s, last_error = %s, updated_at = NOW() WHERE run_id = %s;
+    """, ('failed' if error else 'completed', str(error) if error else None, run_id))
+
+
+# --- Scrape checkpoints ---
+
+def get_scrape_checkpoints(conn, run_id, marketplace_id, search_keyword):
+    """
+    Returns the saved progress of a keyword's searches in a run.
+
+    Returns:
+        dict: search_filter ('' for none) -> (next_offset, completed). Empty if the keyword
+              hasn't been started in this run.
+    """
+    if conn is None or run_id is None:
+        return {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT search_filter, next_offset, completed FROM scrape_checkpoints
+            WHERE run_id = %s AND marketplace_id = %s AND search_keyword = %s;
+        """, (run_id, marketplace_id, search_keyword))
+        return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error loading scrape checkpoints for '{search_keyword}': {e}")
+        return {}
+    finally:
+        cursor.close()
+
+
+def save_scrape_checkpoints(conn, run_id, checkpoints):
+    """
+    Saves search progress. Only call this once every listing from the pages before
+    next_offset has been stored, so a resumed run never skips unsaved listings.
+
+    Args:
+        conn: The database connection object.
+        run_id (str): The pipeline run.
+        checkpoints (list): (marketplace_id, search_keyword, search_filter, next_offset, completed) tuples.
+    """
+    if conn is None or run_id is None or not checkpoints:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("""
+            INSERT INTO scrape_checkpoints (run_id, marketplace_id, search_keyword, search_filter, next_offset, completed)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (run_id, marketplace_id, search_keyword, search_filter) DO UPDATE
+            SET next_offset = GREATEST(scrape_checkpoints.next_offset, EXCLUDED.next_offset),
+                completed = scrape_checkpoints.completed OR EXCLUDED.completed,
+                updated_at = NOW();
+        """, [(run_id, marketplace_id, keyword, search_filter or '', next_offset, completed)
+              for marketplace_id, keyword, search_filter, next_offset, completed in checkpoints])
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error saving scrape checkpoints: {e}")
+    finally:
+        cursor.close()
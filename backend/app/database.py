@@ -1,7 +1,11 @@
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from psycopg2.extras import Json  # For handling JSON data
+from psycopg2.extras import Json, execute_values  # For handling JSON data and multi-row inserts
 import os
+import base64
+import json
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -95,10 +99,21 @@ def create_tables(conn):
                 melt_value DECIMAL,
                 profit DECIMAL,
                 scam_risk_score INTEGER,
-                scam_risk_score_explanation TEXT
+                scam_risk_score_explanation TEXT,
+                marketplace_id VARCHAR(50),
+                original_price DECIMAL,
+                original_currency VARCHAR(10)
             )
         """)
 
+        # Columns added after the table was first created; price/currency hold the converted price
+        cursor.execute("""
+            ALTER TABLE ebay_listings
+                ADD COLUMN IF NOT EXISTS marketplace_id VARCHAR(50),
+                ADD COLUMN IF NOT EXISTS original_price DECIMAL,
+                ADD COLUMN IF NOT EXISTS original_currency VARCHAR(10)
+        """)
+
         # ai_processed_listings Table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS ai_processed_listings (
@@ -109,13 +124,97 @@ def create_tables(conn):
                 profit DECIMAL,
                 scam_score INTEGER,
                 deal_score DECIMAL,
-                PRIMARY KEY (ebay_item_id),
-                FOREIGN KEY (ebay_item_id) REFERENCES ebay_listings(item_id)
+                PRIMARY KEY (ebay_item_id)
+            )
+        """)  # No foreign key: full runs swap ebay_listings out (migration 5 drops the old one)
+
+        # scrape_watermarks Table - newest listing seen per keyword, for incremental scraping
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_watermarks (
+                search_keyword TEXT NOT NULL,
+                marketplace_id VARCHAR(50) NOT NULL,
+                last_item_creation_date TIMESTAMPTZ NOT NULL,
+                last_item_id VARCHAR(255) NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (search_keyword, marketplace_id)
+            )
+        """)
+
+        # gated_listings Table - search results rejected before their details were fetched
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS gated_listings (
+                item_id VARCHAR(255) PRIMARY KEY,
+                search_keyword TEXT,
+                title TEXT,
+                price DECIMAL,
+                reason TEXT NOT NULL,
+                gate_version INTEGER NOT NULL,
+                gated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+
+        # scrape_jobs Table - crawl plan and detail fetches, claimed by scrape workers (see app/job_queue.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                job_id BIGSERIAL PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                kind VARCHAR(20) NOT NULL,
+                dedupe_key TEXT UNIQUE,
+                payload JSONB NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                worker_id TEXT,
+                heartbeat_at TIMESTAMPTZ,
+                last_error TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scrape_jobs_claim ON scrape_jobs (status, available_at, job_id);")
+
+        # scrape_job_items Table - items a run has already queued for a detail fetch, across all workers
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_job_items (
+                run_id TEXT NOT NULL,
+                item_id VARCHAR(255) NOT NULL,
+                search_job_key TEXT NOT NULL,
+                PRIMARY KEY (run_id, item_id)
+            )
+        """)
+
+        # pipeline_runs Table - one row per run.py run, with the steps it has completed (see app/checkpoints.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_runs (
+                run_id TEXT PRIMARY KEY,
+                mode VARCHAR(20) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'running',
+                completed_steps TEXT[] NOT NULL DEFAULT '{}',
+                attempts INTEGER NOT NULL DEFAULT 1,
+                last_error TEXT,
+                started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+
+        # scrape_checkpoints Table - next results page of every search (keyword, marketplace, price band) in a run
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+                run_id TEXT NOT NULL,
+                marketplace_id VARCHAR(50) NOT NULL,
+                search_keyword TEXT NOT NULL,
+                search_filter TEXT NOT NULL DEFAULT '',
+                next_offset INTEGER NOT NULL DEFAULT 0,
+                completed BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (run_id, marketplace_id, search_keyword, search_filter)
             )
         """)
 
         conn.commit()
-        print("Tables 'ebay_listings' and 'ai_processed_listings' created successfully.")
+        print("Tables 'ebay_listings', 'ai_processed_listings', 'scrape_watermarks', 'gated_listings', 'scrape_jobs', "
+              "'scrape_job_items', 'pipeline_runs' and 'scrape_checkpoints' created successfully.")
 
     except psycopg2.Error as e:
         cursor.execute("ROLLBACK;")
@@ -124,6 +223,46 @@ def create_tables(conn):
     finally:
         cursor.close()
 
+# Columns written for a scraped listing, in the order of listing_values()
+LISTING_COLUMNS = [
+    'item_id', 'title', 'price', 'currency', 'seller_username', 'seller_feedback_score',
+    'feedback_percent', 'image_url', 'item_url', 'shipping_options',
+    'top_rated_buying_experience', 'description', 'returns_accepted', 'item_specifics', 'metal',
+    'total_carat_weight', 'metal_purity', 'is_gold', 'weight', 'purity', 'melt_value', 'profit',
+    'marketplace_id', 'original_price', 'original_currency'
+]
+BULK_INSERT_PAGE_SIZE = 500 # Rows per multi-row INSERT statement sent by insert_listings_bulk
+
+def listing_values(data):
+    """The LISTING_COLUMNS values of a listing dict, as one row tuple."""
+    return (
+        data['item_id'],
+        data['title'],
+        data['price'],
+        data['currency'],
+        data['seller_username'],
+        data['seller_feedback_score'],
+        data['feedback_percent'],
+        data['image_url'],
+        data['item_url'],
+        Json(data['shipping_options']) if data.get('shipping_options') else None,
+        data['top_rated_buying_experience'],
+        data['description'],
+        data['returns_accepted'],
+        Json(data['item_specifics']) if data.get('item_specifics') else None,
+        data['metal'],
+        data.get('total_carat_weight'),  # New column for total carat weight
+        data.get('metal_purity'),        # New column for metal purity
+        data.get('is_gold', None),       # Optional: Include is_gold if available
+        data.get('weight'),              # Optional: enrichment results when the listing
+        data.get('purity'),              # was classified and enriched before insertion
+        data.get('melt_value'),
+        data.get('profit'),
+        data.get('marketplace_id'),      # Where the listing was found, and its price
+        data.get('original_price'),      # before conversion into the stored currency
+        data.get('original_currency')
+    )
+
 def insert_data(conn, table_name, data):
     """Inserts data into the specified table"""
     if conn is None:
@@ -135,34 +274,11 @@ def insert_data(conn, table_name, data):
         if table_name == "ebay_listings":
 
             # Insert data into ebay_listings
-            cursor.execute("""
-                INSERT INTO ebay_listings (
-                    item_id, title, price, currency, seller_username, seller_feedback_score,
-                    feedback_percent, image_url, item_url, shipping_options,
-                    top_rated_buying_experience, description, returns_accepted, item_specifics, metal,
-                    total_carat_weight, metal_purity, is_gold
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            cursor.execute(f"""
+                INSERT INTO ebay_listings ({', '.join(LISTING_COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(LISTING_COLUMNS))})
                 ON CONFLICT (item_id) DO NOTHING;
-            """, (
-                data['item_id'],
-                data['title'],
-                data['price'],
-                data['currency'],
-                data['seller_username'],
-                data['seller_feedback_score'],
-                data['feedback_percent'],
-                data['image_url'],
-                data['item_url'],
-                Json(data['shipping_options']) if data.get('shipping_options') else None,
-                data['top_rated_buying_experience'],
-                data['description'],
-                data['returns_accepted'],
-                Json(data['item_specifics']) if data.get('item_specifics') else None,
-                data['metal'],
-                data.get('total_carat_weight'),  # New column for total carat weight
-                data.get('metal_purity'),        # New column for metal purity
-                data.get('is_gold', None)        # Optional: Include is_gold if available
-            ))
+            """, listing_values(data))
 
         elif table_name == "ai_processed_listings":
             # Insert data into ai_processed_listings
@@ -204,6 +320,124 @@ def insert_data(conn, table_name, data):
         # Otherwise, manage connection closure in the main block
         
 
+def insert_listings_bulk(conn, listings, page_size=BULK_INSERT_PAGE_SIZE):
+    """
+    Inserts a batch of listings into ebay_listings in one transaction, sending page_size rows
+    per INSERT statement (execute_values) instead of one statement and commit per listing.
+    Listings already stored are skipped (ON CONFLICT DO NOTHING).
+
+    If the batch fails as a whole (e.g. one malformed listing), it is rolled back and retried
+    one listing at a time, so the good listings are still stored.
+
+    Args:
+        conn: The database connection object.
+        listings (list): Listing dicts, as built by the scraper.
+        page_size (int): Rows per INSERT statement.
+
+    Returns:
+        dict: 'inserted' (new rows), 'duplicates' (already stored), 'failed' (count) and
+              'failed_item_ids' (list).
+    """
+    result = {'inserted': 0, 'duplicates': 0, 'failed': 0, 'failed_item_ids': []}
+    if conn is None or not listings:
+        return result
+
+    cursor = conn.cursor()
+    try:
+        inserted = execute_values(cursor, f"""
+            INSERT INTO ebay_listings ({', '.join(LISTING_COLUMNS)}) VALUES %s
+            ON CONFLICT (item_id) DO NOTHING
+            RETURNING item_id;
+        """, [listing_values(listing) for listing in listings], page_size=page_size, fetch=True)
+        conn.commit()
+        result['inserted'] = len(inserted)
+        result['duplicates'] = len(listings) - len(inserted)
+        return result
+    except (psycopg2.Error, KeyError) as e:
+        conn.rollback()
+        print(f"Bulk insert of {len(listings)} listings failed ({e}); inserting them one at a time")
+    finally:
+        cursor.close()
+
+    # Fallback: isolate the listings that can't be stored
+    for listing in listings:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                INSERT INTO ebay_listings ({', '.join(LISTING_COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(LISTING_COLUMNS))})
+                ON CONFLICT (item_id) DO NOTHING;
+            """, listing_values(listing))
+            conn.commit()
+            result['inserted' if cursor.rowcount == 1 else 'duplicates'] += 1
+        except (psycopg2.Error, KeyError) as e:
+            conn.rollback()
+            print(f"Error inserting listing {listing.get('item_id')}: {e}")
+            result['failed'] += 1
+            result['failed_item_ids'].append(listing.get('item_id'))
+        finally:
+            cursor.close()
+    return result
+
+# Column types of the enrichment columns, for casting the untyped VALUES rows in bulk_update_listings
+ENRICHMENT_COLUMN_TYPES = {
+    'is_gold': 'BOOLEAN',
+    'weight': 'FLOAT',
+    'purity': 'INT',
+    'melt_value': 'DECIMAL',
+    'profit': 'DECIMAL',
+    'scam_risk_score': 'INTEGER',
+    'scam_risk_score_explanation': 'TEXT',
+}
+BULK_UPDATE_CHUNK_SIZE = 1000 # Rows per UPDATE ... FROM (VALUES ...) statement
+
+def bulk_update_listings(conn, columns, rows, chunk_size=BULK_UPDATE_CHUNK_SIZE):
+    """
+    Sets enrichment columns on many listings with one UPDATE ... FROM (VALUES ...) statement
+    per chunk, instead of one UPDATE round trip per listing. Each chunk is committed, so the
+    listings it covers count as done if a later chunk fails.
+
+    Args:
+        conn: The database connection object.
+        columns (list): Columns to set, from ENRICHMENT_COLUMN_TYPES.
+        rows (list): (item_id, value for each column) tuples.
+        chunk_size (int): Rows per statement.
+
+    Returns:
+        int: Number of listings updated.
+
+    Raises:
+        Exception: If a chunk fails; it is rolled back, earlier chunks stay committed.
+    """
+    if conn is None or not rows:
+        return 0
+    unknown = [column for column in columns if column not in ENRICHMENT_COLUMN_TYPES]
+    if unknown:
+        raise ValueError(f"Not an enrichment column: {', '.join(unknown)}")
+
+    # VALUES rows are untyped; cast each column so NULLs and comparisons get the table's types
+    template = "(%s, " + ", ".join(f"%s::{ENRICHMENT_COLUMN_TYPES[column]}" for column in columns) + ")"
+    query = f"""
+        UPDATE ebay_listings AS listing
+        SET {', '.join(f"{column} = v.{column}" for column in columns)}
+        FROM (VALUES %s) AS v (item_id, {', '.join(columns)})
+        WHERE listing.item_id = v.item_id
+    """
+    updated = 0
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            execute_values(cursor, query, chunk, template=template, page_size=len(chunk))
+            updated += cursor.rowcount
+            conn.commit()
+        return updated
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error updating {', '.join(columns)} for {len(rows)} listings: {e}")
+    finally:
+        cursor.close()
+
 def fetch_data(conn, query, params=None, fetchone=False):
     """
     Fetches data from the database based on the provided query.
@@ -233,31 +467,380 @@ def fetch_data(conn, query, params=None, fetchone=False):
     finally:
         cursor.close()
 
-def clear_tables(conn):
+STAGE_CHUNK_SIZE = int(os.getenv('STAGE_CHUNK_SIZE', '1000')) # Rows an enrichment stage holds in memory at a time
+
+def stream_rows(conn, query, params=None, chunk_size=STAGE_CHUNK_SIZE):
     """
-    Clears all data from the ebay_listings and ai_processed_listings tables.
+    Yields a query's rows through a named (server-side) cursor, fetching chunk_size rows per
+    round trip, so a stage's memory stays flat however many listings match.
+
+    The cursor is declared WITH HOLD so the stage can keep committing its updates while it
+    iterates. Postgres keeps the rows left over at the first commit on the server (spilling
+    to temp files past work_mem), not in this process.
 
     Args:
         conn: The database connection object.
+        query: The SELECT to run.
+        params: Optional parameters to pass to the query.
+        chunk_size (int): Rows fetched per round trip.
+    """
+    cursor = conn.cursor(name=f"stream_{os.getpid()}_{threading.get_ident()}_{time.monotonic_ns()}", withhold=True)
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        if not conn.closed:
+            try:
+                cursor.close()
+            except psycopg2.Error:
+                pass # Dropped with the aborted transaction that declared it
+
+def load_existing_item_ids(conn):
+    """
+    Loads every item_id already in ebay_listings into a set, so the scraper can skip
+    known items without a query per item.
+
+    Args:
+        conn: The database connection object.
+
+    Returns:
+        set: The existing item IDs (empty on error or without a connection).
     """
     if conn is None:
-        print("No database connection. Cannot clear tables.")
+        return set()
+
+    # Named (server-side) cursor so large tables are streamed instead of loaded in one response
+    cursor = conn.cursor(name="existing_item_ids")
+    cursor.itersize = 10000
+    try:
+        cursor.execute("SELECT item_id FROM ebay_listings;")
+        return {row[0] for row in cursor}
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error loading existing item IDs: {e}")
+        return set()
+    finally:
+        cursor.close()
+
+def load_gated_item_ids(conn, gate_version):
+    """
+    Loads every item_id rejected by the current summary gate rules, so later runs skip them like
+    duplicates. Verdicts of other rule versions are ignored, so those listings are gated again.
+
+    Args:
+        conn: The database connection object.
+        gate_version (int): The current GATE_RULES_VERSION.
+
+    Returns:
+        set: The gated item IDs (empty on error or without a connection).
+    """
+    if conn is None:
+        return set()
+
+    cursor = conn.cursor(name="gated_item_ids")
+    cursor.itersize = 10000
+    try:
+        cursor.execute("SELECT item_id FROM gated_listings WHERE gate_version = %s;", (gate_version,))
+        return {row[0] for row in cursor}
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error loading gated item IDs: {e}")
+        return set()
+    finally:
+        cursor.close()
+
+def insert_gate_verdicts(conn, verdicts):
+    """
+    Stores summary gate rejections.
+
+    Args:
+        conn: The database connection object.
+        verdicts: List of (item_id, search_keyword, title, price, reason, gate_version) tuples.
+                  A verdict replaces the one an earlier rule version stored for the item.
+    """
+    if conn is None or not verdicts:
         return
 
     cursor = conn.cursor()
     try:
-        # Clear data from ai_processed_listings first due to foreign key dependency
-        cursor.execute("TRUNCATE TABLE ai_processed_listings RESTART IDENTITY CASCADE;")
-        cursor.execute("TRUNCATE TABLE ebay_listings RESTART IDENTITY CASCADE;")
+        cursor.executemany("""
+            INSERT INTO gated_listings (item_id, search_keyword, title, price, reason, gate_version)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (item_id) DO UPDATE
+            SET search_keyword = EXCLUDED.search_keyword, title = EXCLUDED.title, price = EXCLUDED.price,
+                reason = EXCLUDED.reason, gate_version = EXCLUDED.gate_version, gated_at = NOW()
+            WHERE gated_listings.gate_version <> EXCLUDED.gate_version;
+        """, verdicts)
         conn.commit()
-        print("Tables 'ai_processed_listings' and 'ebay_listings' cleared successfully.")
     except psycopg2.Error as e:
         conn.rollback()
-        print(f"Error clearing tables: {e}")
+        print(f"Error storing gate verdicts: {e}")
     finally:
         cursor.close()
 
-def get_listings_with_filters(conn, profit_min=None, scam_risk_max=None, returns_accepted=None, sort_by='profit_desc', page=1, per_page=20):
+def get_watermark(conn, search_keyword, marketplace_id):
+    """
+    Returns the newest listing seen for a keyword by a previous incremental scrape.
+
+    Args:
+        conn: The database connection object.
+        search_keyword: The search keyword.
+        marketplace_id: The eBay marketplace ID.
+
+    Returns:
+        tuple: (last_item_creation_date, last_item_id), or None if the keyword has no watermark.
+    """
+    return fetch_data(
+        conn,
+        """
+            SELECT last_item_creation_date, last_item_id
+            FROM scrape_watermarks
+            WHERE search_keyword = %s AND marketplace_id = %s;
+        """,
+        (search_keyword, marketplace_id),
+        fetchone=True
+    )
+
+def update_watermark(conn, search_keyword, marketplace_id, last_item_creation_date, last_item_id):
+    """
+    Stores the newest listing seen for a keyword, so the next incremental scrape can stop there.
+
+    Args:
+        conn: The database connection object.
+        search_keyword: The search keyword.
+        marketplace_id: The eBay marketplace ID.
+        last_item_creation_date: itemCreationDate of the newest listing seen.
+        last_item_id: itemId of that listing.
+    """
+    if conn is None:
+        return
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO scrape_watermarks (search_keyword, marketplace_id, last_item_creation_date, last_item_id, updated_at)
+            VALUES (%s, %s, %s, %s, NOW())
+            ON CONFLICT (search_keyword, marketplace_id) DO UPDATE
+            SET last_item_creation_date = EXCLUDED.last_item_creation_date,
+                last_item_id = EXCLUDED.last_item_id,
+                updated_at = NOW();
+        """, (search_keyword, marketplace_id, last_item_creation_date, last_item_id))
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error updating watermark for '{search_keyword}': {e}")
+    finally:
+        cursor.close()
+
+# sort_by values accepted by the feed; each column has a (column, item_id) index on listing_feed.
+# listing_feed (migrations 2 and 3 in app/migrations.py) holds only the rows the feed can show, with the
+# frontend's listing JSON precomputed, and is refreshed by refresh_listing_feed().
+LISTING_SORT_ORDERS = {
+    'profit_desc': 'profit DESC',
+    'profit_asc': 'profit ASC',
+    'price_desc': 'price DESC',
+    'price_asc': 'price ASC',
+    'melt_value_desc': 'melt_value DESC',
+    'melt_value_asc': 'melt_value ASC',
+    'scam_risk_asc': 'scam_risk_score ASC',
+    'scam_risk_desc': 'scam_risk_score DESC',
+    'seller_feedback_desc': 'seller_feedback_score DESC',
+    'seller_feedback_asc': 'seller_feedback_score ASC'
+}
+
+FEED_COUNT_CACHE_SECONDS = 60 # Feed totals are reused for this long per filter combination
+
+_feed_count_cache = {} # _feed_filters arguments -> (monotonic time, count)
+_feed_count_lock = threading.Lock()
+
+def _feed_filters(profit_min=None, scam_risk_max=None, returns_accepted=None, specifics=None, shipping_max=None):
+    """
+    The feed's optional filters as (' AND ...' condition string, params).
+
+    specifics maps item specific names to the value a listing must have, or to None to only
+    require the name; both use the GIN index on listing_feed.item_specifics. shipping_max is
+    the most the cheapest shipping option may cost, in the listing's currency.
+    """
+    conditions = []
+    params = []
+    
+    # Only apply profit filter if profit_min is greater than 0
+    if profit_min is not None and profit_min > 0:
+        conditions.append("profit_pct >= %s")
+        params.append(profit_min)
+        
+    # Only apply scam risk filter if scam_risk_max is greater than 0
+    if scam_risk_max is not None and scam_risk_max > 0:
+        conditions.append("scam_risk_score <= %s")
+        params.append(scam_risk_max)
+        
+    if returns_accepted is not None:
+        conditions.append("returns_accepted = %s")
+        params.append(returns_accepted)
+
+    for name, value in sorted((specifics or {}).items()):
+        if value is None:
+            conditions.append("item_specifics ? %s")
+            params.append(name)
+        else:
+            conditions.append("item_specifics @> %s::jsonb")
+            params.append(Json({name: value}))
+
+    if shipping_max is not None:
+        conditions.append("shipping_cost <= %s")
+        params.append(shipping_max)
+
+    condition_string = " AND " + " AND ".join(conditions) if conditions else ""
+    return condition_string, params
+
+def build_listings_query(profit_min=None, scam_risk_max=None, returns_accepted=None, sort_by='profit_desc', specifics=None, shipping_max=None):
+    """
+    Builds the offset-paginated listings feed queries. Rows are (item_id, sort value, listing JSON).
+
+    Returns:
+        tuple: (count_query, query, params). query ends in LIMIT %s OFFSET %s; pass
+               params + [limit, offset] when executing it.
+    """
+    condition_string, params = _feed_filters(profit_min, scam_risk_max, returns_accepted, specifics, shipping_max)
+    column, direction = LISTING_SORT_ORDERS.get(sort_by, 'profit DESC').split()
+
+    # Base query for counting total items
+    count_query = f"""
+        SELECT COUNT(*)
+        FROM listing_feed
+        WHERE TRUE {condition_string}
+    """
+
+    # Base query - listing_feed only holds gold listings with the required data
+    base_query = f"""
+        SELECT item_id, {column}, listing
+        FROM listing_feed
+        WHERE TRUE {condition_string}
+    """
+
+    # Add sorting; item_id breaks ties so pages are stable
+    query = f"{base_query} ORDER BY {column} {direction}, item_id {direction} LIMIT %s OFFSET %s"
+    return count_query, query, params
+
+def _keyset_segment_order(direction):
+    """
+    The feed order for one sort column as segments, each an index range in (column, item_id)
+    order: rows with a NULL sort key come first when descending and last when ascending
+    (Postgres' default), ordered by item_id alone.
+
+    Returns:
+        list: True for the NULL segment, False for the rest, in feed order.
+    """
+    return [True, False] if direction == 'DESC' else [False, True]
+
+def build_keyset_query(column, direction, condition_string, after=None, null_segment=False):
+    """
+    Builds the query for one keyset page segment. Rows are (item_id, sort value, listing JSON).
+
+    Args:
+        column (str): Sort column.
+        direction (str): 'ASC' or 'DESC'.
+        condition_string (str): Optional filters from _feed_filters.
+        after (tuple): (sort value, item_id) of the last row already returned in this
+                       segment, or None to start at the segment's first row.
+        null_segment (bool): Page through the rows whose sort key is NULL.
+
+    Returns:
+        tuple: (query, extra params appended after the filter params, before the limit).
+    """
+    comparison = '<' if direction == 'DESC' else '>'
+    segment = f"{column} IS NULL" if null_segment else f"{column} IS NOT NULL"
+    extra_params = []
+    if after is not None:
+        if null_segment:
+            segment += f" AND item_id {comparison} %s"
+            extra_params = [after[1]]
+        else:
+            # Row comparison: an index range scan on (column, item_id)
+            segment += f" AND ({column}, item_id) {comparison} (%s, %s)"
+            extra_params = [after[0], after[1]]
+    order_clause = f"item_id {direction}" if null_segment else f"{column} {direction}, item_id {direction}"
+    query = f"""
+        SELECT item_id, {column}, listing
+        FROM listing_feed
+        WHERE {segment} {condition_string}
+        ORDER BY {order_clause}
+        LIMIT %s
+    """
+    return query, extra_params
+
+def encode_listings_cursor(sort_by, value, item_id):
+    """Opaque cursor token pointing after the row with this sort value and item_id."""
+    data = {'s': sort_by, 'v': None if value is None else str(value), 'id': item_id}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_listings_cursor(token, sort_by):
+    """
+    Decodes a cursor token.
+
+    Returns:
+        tuple: (sort value as string or None, item_id)
+
+    Raises:
+        ValueError: If the token is malformed or was issued for another sort order.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        value, item_id, token_sort = data['v'], data['id'], data['s']
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if token_sort != sort_by:
+        raise ValueError(f"Cursor was issued for sort '{token_sort}', not '{sort_by}'")
+    return value, item_id
+
+def count_feed_listings(conn, profit_min=None, scam_risk_max=None, returns_accepted=None, specifics=None, shipping_max=None, max_age=FEED_COUNT_CACHE_SECONDS):
+    """
+    Counts the feed rows matching the filters, reusing a count up to max_age seconds old
+    (the table only changes when the pipeline runs).
+    """
+    key = (profit_min, scam_risk_max, returns_accepted, tuple(sorted((specifics or {}).items())), shipping_max)
+    with _feed_count_lock:
+        cached = _feed_count_cache.get(key)
+    if cached and time.monotonic() - cached[0] < max_age:
+        return cached[1]
+
+    count_query, _, params = build_listings_query(profit_min, scam_risk_max, returns_accepted, specifics=specifics, shipping_max=shipping_max)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(count_query, params)
+        total_items = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    with _feed_count_lock:
+        _feed_count_cache[key] = (time.monotonic(), total_items)
+    return total_items
+
+def refresh_listing_feed(conn):
+    """
+    Rebuilds listing_feed from ebay_listings. CONCURRENTLY diffs the new contents into the
+    view, so API reads keep being served from the previous version until it commits.
+    """
+    if conn is None:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY listing_feed;")
+        conn.commit()
+        with _feed_count_lock:
+            _feed_count_cache.clear()
+        print("Materialized view 'listing_feed' refreshed successfully.")
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error refreshing listing feed: {e}")
+    finally:
+        cursor.close()
+
+def get_listings_with_filters(conn, profit_min=None, scam_risk_max=None, returns_accepted=None, sort_by='profit_desc', page=1, per_page=20, specifics=None, shipping_max=None):
     """
     Fetches listings from the database with optional filters.
     
@@ -267,6 +850,8 @@ def get_listings_with_filters(conn, profit_min=None, scam_risk_max=None, returns
         scam_risk_max: Maximum scam risk score (None or 0 to disable filter)
         returns_accepted: Boolean filter for returns accepted
         sort_by: Sort order for results
+        specifics: Item specifics to match, {name: value}, or {name: None} to only require the name
+        shipping_max: Maximum cost of the cheapest shipping option
     
     Returns:
         List of dictionaries containing listing data
@@ -277,115 +862,20 @@ def get_listings_with_filters(conn, profit_min=None, scam_risk_max=None, returns
     
     cursor = conn.cursor()
     try:
-        # Base query for counting total items
-        count_query = """
-            SELECT COUNT(*)
-            FROM ebay_listings 
-            WHERE is_gold = TRUE 
-                AND weight IS NOT NULL 
-                AND purity IS NOT NULL 
-                AND melt_value IS NOT NULL 
-                AND profit IS NOT NULL
-                AND (profit / price) * 100 <= 10
-        """
+        _, query, params = build_listings_query(profit_min, scam_risk_max, returns_accepted, sort_by, specifics, shipping_max)
 
-        # Base query - only get gold listings with required data
-        base_query = """
-            SELECT 
-                item_id, title, description, price, currency,
-                seller_username, seller_feedback_score, feedback_percent,
-                image_url, item_url, top_rated_buying_experience,
-                returns_accepted, weight, purity, melt_value, profit,
-                scam_risk_score, scam_risk_score_explanation
-            FROM ebay_listings 
-            WHERE is_gold = TRUE 
-                AND weight IS NOT NULL 
-                AND purity IS NOT NULL 
-                AND melt_value IS NOT NULL 
-                AND profit IS NOT NULL
-                AND (profit / price) * 100 <= 10
-        """
-        
-        # Build WHERE conditions and parameters
-        conditions = []
-        params = []
-        
-        # Only apply profit filter if profit_min is greater than 0
-        if profit_min is not None and profit_min > 0:
-            conditions.append("(profit / price) * 100 >= %s")
-            params.append(profit_min)
-            
-        # Only apply scam risk filter if scam_risk_max is greater than 0
-        if scam_risk_max is not None and scam_risk_max > 0:
-            conditions.append("scam_risk_score <= %s")
-            params.append(scam_risk_max)
-            
-        if returns_accepted is not None:
-            conditions.append("returns_accepted = %s")
-            params.append(returns_accepted)
-        
-        # # Combine query with conditions
-        # if conditions:
-        #     query = base_query + " AND " + " AND ".join(conditions)
-        # else:
-        #     query = base_query
-        # Add conditions to both queries
-        if conditions:
-            condition_string = " AND " + " AND ".join(conditions)
-            count_query += condition_string
-            base_query += condition_string
-
-        # Get total count
-        cursor.execute(count_query, params)
-        total_items = cursor.fetchone()[0]
+        # Get total count (cached; recounting on every page request costs a scan of the feed)
+        total_items = count_feed_listings(conn, profit_min, scam_risk_max, returns_accepted, specifics, shipping_max)
         total_pages = (total_items + per_page - 1) // per_page  # Ceiling division
             
-        # Add sorting
-        sort_mapping = {
-            'profit_desc': 'profit DESC',
-            'profit_asc': 'profit ASC',
-            'price_desc': 'price DESC',
-            'price_asc': 'price ASC',
-            'melt_value_desc': 'melt_value DESC',
-            'melt_value_asc': 'melt_value ASC',
-            'scam_risk_asc': 'scam_risk_score ASC',
-            'scam_risk_desc': 'scam_risk_score DESC',
-            'seller_feedback_desc': 'seller_feedback_score DESC',
-            'seller_feedback_asc': 'seller_feedback_score ASC'
-        }
-        
-        order_clause = sort_mapping.get(sort_by, 'profit DESC')
         offset = (page - 1) * per_page
-
-        query = f"{base_query} ORDER BY {order_clause} LIMIT %s OFFSET %s"
-        params.extend([per_page, offset])
+        params = params + [per_page, offset]
 
         cursor.execute(query, params)
         rows = cursor.fetchall()
         
-        # Convert to list of dictionaries
-        listings = []
-        for row in rows:
-            listings.append({
-                'id': row[0],
-                'title': row[1],
-                'description': row[2] or '',
-                'images': [row[8]] if row[8] else ['https://via.placeholder.com/300x200'],
-                'price': float(row[3]),
-                'currency': row[4],
-                'sellerUsername': row[5],
-                'sellerFeedbackScore': row[6],
-                'feedbackPercent': float(row[7]) if row[7] else 0,
-                'ebayUrl': row[9],
-                'topRatedBuyingExperience': row[10],
-                'returnsAccepted': row[11],
-                'weight': float(row[12]) if row[12] else 0,
-                'purity': row[13] if row[13] else 0,
-                'meltValue': float(row[14]) if row[14] else 0,
-                'profit': float(row[15]) if row[15] else 0,
-                'scamRisk': row[16] if row[16] else 5,
-                'scamRiskExplanation': row[17] or ''
-            })
+        # listing_feed stores each listing already in the frontend's format
+        listings = [row[2] for row in rows]
         
         return {
             'listings': listings,
@@ -403,6 +893,72 @@ def get_listings_with_filters(conn, profit_min=None, scam_risk_max=None, returns
     finally:
         cursor.close()
 
+def get_listings_after_cursor(conn, profit_min=None, scam_risk_max=None, returns_accepted=None, sort_by='profit_desc', cursor_token=None, per_page=20, include_total=False, specifics=None, shipping_max=None):
+    """
+    Fetches one page of the listings feed after a cursor (keyset pagination). Each page is an
+    index range scan starting at the previous page's last row, so deep pages cost the same as
+    the first and rows inserted meanwhile don't shift or repeat listings.
+
+    Args:
+        conn: Database connection object
+        profit_min, scam_risk_max, returns_accepted, specifics, shipping_max: Filters, as for
+            get_listings_with_filters
+        sort_by: Sort order for results
+        cursor_token: nextCursor of the previous page, or None for the first page
+        per_page: Listings per page
+        include_total: Also return the (cached) number of matching listings
+
+    Returns:
+        dict: 'listings' and 'pagination' ({'nextCursor', 'itemsPerPage', 'totalItems'}).
+              nextCursor is None on the last page.
+
+    Raises:
+        ValueError: If cursor_token is invalid.
+    """
+    if sort_by not in LISTING_SORT_ORDERS:
+        sort_by = 'profit_desc'
+    after = decode_listings_cursor(cursor_token, sort_by) if cursor_token else None
+    empty = {'listings': [], 'pagination': {'nextCursor': None, 'itemsPerPage': per_page, 'totalItems': 0 if include_total else None}}
+    if conn is None:
+        return empty
+
+    column, direction = LISTING_SORT_ORDERS[sort_by].split()
+    condition_string, filter_params = _feed_filters(profit_min, scam_risk_max, returns_accepted, specifics, shipping_max)
+    segments = _keyset_segment_order(direction)
+    if after is not None:
+        # Continue in the cursor's segment; earlier segments are done
+        segments = segments[segments.index(after[0] is None):]
+
+    cursor = conn.cursor()
+    try:
+        # Fetch one row more than needed to know whether another page follows
+        rows = []
+        for position, null_segment in enumerate(segments):
+            query, extra_params = build_keyset_query(column, direction, condition_string,
+                                                     after if position == 0 else None, null_segment)
+            cursor.execute(query, filter_params + extra_params + [per_page + 1 - len(rows)])
+            rows.extend(cursor.fetchall())
+            if len(rows) > per_page:
+                break
+
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = encode_listings_cursor(sort_by, rows[-1][1], rows[-1][0]) if has_more else None
+        total_items = count_feed_listings(conn, profit_min, scam_risk_max, returns_accepted, specifics, shipping_max) if include_total else None
+        return {
+            'listings': [row[2] for row in rows],
+            'pagination': {
+                'nextCursor': next_cursor,
+                'itemsPerPage': per_page,
+                'totalItems': total_items
+            }
+        }
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error fetching listings: {e}")
+        return empty
+    finally:
+        cursor.close()
 
 if __name__ == "__main__":
     conn = connect_to_db()
@@ -441,8 +997,6 @@ if __name__ == "__main__":
             'deal_score': 2.5
         }
 
-        clear_tables(conn)  # Clear tables before inserting new data
-
         # if insert_data(conn, "ebay_listings", ebay_data):
         #     print("ebay_listings insertion was successful")
         # else:
@@ -470,5 +1024,3 @@ if __name__ == "__main__":
         conn.close()
     else:
         print("Failed to connect to the database")
-
-
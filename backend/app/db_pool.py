@@ -0,0 +1,205 @@
+import os # for .env file
+import threading
+import time
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from flask import current_app, g
+from dotenv import load_dotenv
+from app.database import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+
+load_dotenv()
+
+# --- Configuration ---
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1')) # Connections kept open per process once the pool is used
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '5')) # Per process; gunicorn workers x DB_POOL_MAX must stay below Postgres max_connections
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '5')) # seconds a request waits for a free connection
+DB_POOL_PING_AFTER_SECONDS = 30 # Connections idle for longer are checked with SELECT 1 before being handed out
+
+
+class DatabasePool:
+    """
+    Per-process pool of Postgres connections for the API, with utilization metrics.
+
+    The underlying ThreadedConnectionPool is opened on first use and reopened after a fork,
+    so gunicorn workers never share sockets inherited from the master. Check-outs beyond
+    maxconn wait up to checkout_timeout for a connection to be returned.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.lock = threading.Lock()
+        self.pool = None
+        self.pid = None
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.last_used = {} # id(conn) -> monotonic time it was returned
+        self.stats = {'checkouts': 0, 'in_use': 0, 'peak_in_use': 0, 'waits': 0, 'wait_seconds': 0.0,
+                      'timeouts': 0, 'errors': 0, 'discarded': 0, 'pings_failed': 0}
+
+    def _get_pool(self):
+        with self.lock:
+            if self.pool is None or self.pid != os.getpid():
+                # Connections inherited through fork belong to the parent; drop them without closing
+                self.pool = ThreadedConnectionPool(
+                    self.minconn, self.maxconn,
+                    database=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+                )
+                self.pid = os.getpid()
+                self.slots = threading.BoundedSemaphore(self.maxconn)
+                self.last_used = {}
+                self.stats['in_use'] = 0
+            return self.pool
+
+    def _is_alive(self, conn):
+        """Pings a connection that sat idle for a while; the server may have dropped it."""
+        if conn.closed:
+            return False
+        last_used = self.last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self.lock:
+                self.stats['pings_failed'] += 1
+            return False
+
+    def getconn(self):
+        """
+        Checks a connection out of the pool.
+
+        Returns:
+            The connection, or None if none became free within checkout_timeout or the
+            database can't be reached.
+        """
+        try:
+            pool = self._get_pool()
+        except psycopg2.Error as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"Error opening database pool: {e}")
+            return None
+
+        slots = self.slots
+        start = time.monotonic()
+        if not slots.acquire(blocking=False):
+            with self.lock:
+                self.stats['waits'] += 1
+            if not slots.acquire(timeout=self.checkout_timeout):
+                with self.lock:
+                    self.stats['timeouts'] += 1
+                print(f"Error: no database connection free after {self.checkout_timeout} s")
+                return None
+        waited = time.monotonic() - start
+
+        try:
+            conn = pool.getconn()
+            if not self._is_alive(conn):
+                pool.putconn(conn, close=True)
+                with self.lock:
+                    self.stats['discarded'] += 1
+                conn = pool.getconn()
+        except psycopg2.Error as e:
+            slots.release()
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"Error checking out database connection: {e}")
+            return None
+
+        with self.lock:
+            self.stats['checkouts'] += 1
+            self.stats['wait_seconds'] += waited
+            self.stats['in_use'] += 1
+            self.stats['peak_in_use'] = max(self.stats['peak_in_use'], self.stats['in_use'])
+        return conn
+
+    def putconn(self, conn):
+        """Returns a connection, rolling back whatever the request left open. Broken connections are closed."""
+        discard = bool(conn.closed)
+        if not discard and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        try:
+            self._get_pool().putconn(conn, close=discard)
+        except PoolError as e:
+            # Checked out before a fork; the new pool doesn't know it
+            print(f"Error returning database connection: {e}")
+            return
+        with self.lock:
+            if discard:
+                self.stats['discarded'] += 1
+                self.last_used.pop(id(conn), None)
+            else:
+                self.last_used[id(conn)] = time.monotonic()
+            self.stats['in_use'] -= 1
+        self.slots.release()
+
+    def check_health(self):
+        """
+        Runs SELECT 1 on a pooled connection.
+
+        Returns:
+            tuple: (healthy, error message or None)
+        """
+        conn = self.getconn()
+        if conn is None:
+            return False, "no database connection available"
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            return True, None
+        except psycopg2.Error as e:
+            return False, str(e).strip()
+        finally:
+            self.putconn(conn)
+
+    def get_stats(self):
+        """Pool size and utilization counters for this process."""
+        with self.lock:
+            stats = dict(self.stats)
+            pool = self.pool if self.pid == os.getpid() else None
+            # psycopg2 keeps idle connections in _pool and checked-out ones in _used
+            stats['open'] = len(pool._pool) + len(pool._used) if pool else 0
+            stats['idle'] = len(pool._pool) if pool else 0
+        stats['min'] = self.minconn
+        stats['max'] = self.maxconn
+        stats['utilization'] = stats['in_use'] / self.maxconn if self.maxconn else 0
+        stats['avg_wait_ms'] = stats['wait_seconds'] * 1000 / stats['checkouts'] if stats['checkouts'] else 0
+        stats['pid'] = os.getpid()
+        return stats
+
+
+def init_pool(app):
+    """Attaches a DatabasePool to the app and returns request connections to it on teardown."""
+    app.extensions['db_pool'] = DatabasePool()
+    app.teardown_appcontext(_return_connection)
+
+
+def get_pool():
+    return current_app.extensions['db_pool']
+
+
+def get_db():
+    """
+    The request's pooled connection, checked out on first use and returned when the request
+    ends. Don't close it.
+
+    Returns:
+        The connection, or None if the pool couldn't provide one.
+    """
+    if 'db_conn' not in g:
+        g.db_conn = get_pool().getconn()
+    return g.db_conn
+
+
+def _return_connection(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        get_pool().putconn(conn)
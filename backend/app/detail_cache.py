@@ -0,0 +1,121 @@
+import os # for .env file
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DETAIL_CACHE_PATH = os.getenv('DETAIL_CACHE_PATH', os.path.join(BACKEND_DIR, '.item_detail_cache.sqlite'))
+DETAIL_CACHE_MAX_ENTRIES = int(os.getenv('DETAIL_CACHE_MAX_ENTRIES', '100000')) # Least recently used entries beyond this are evicted
+EVICTION_CHECK_INTERVAL = 500 # Check the cache size every this many stores
+
+# Summary fields that change when a seller revises a listing. The Browse API search results carry
+# no explicit revision or last-modified field, so a fingerprint of these stands in for one.
+REVISION_FIELDS = ('title', 'price', 'condition', 'conditionId', 'buyingOptions', 'itemEndDate', 'shippingOptions')
+
+_lock = threading.Lock()
+_conn = None
+_stores_since_eviction = 0
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+
+def summary_revision(summary):
+    """Returns a fingerprint of the revision-sensitive fields of an item summary."""
+    revision_data = {field: summary.get(field) for field in REVISION_FIELDS}
+    return hashlib.sha1(json.dumps(revision_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _get_conn():
+    """Opens the cache database on first use. Caller must hold _lock."""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DETAIL_CACHE_PATH, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL;")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS item_details (
+                item_id TEXT PRIMARY KEY,
+                revision TEXT NOT NULL,
+                details TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_item_details_last_access ON item_details (last_access);")
+        _conn.commit()
+    return _conn
+
+
+def get_cached_details(item_id, revision):
+    """
+    Returns the cached extracted details for an item, or None on a miss.
+    Entries stored for a different revision of the item count as a miss.
+    """
+    with _lock:
+        try:
+            conn = _get_conn()
+            row = conn.execute(
+                "SELECT details FROM item_details WHERE item_id = ? AND revision = ?;", (item_id, revision)
+            ).fetchone()
+            if row is None:
+                _stats['misses'] += 1
+                return None
+            conn.execute("UPDATE item_details SET last_access = ? WHERE item_id = ?;", (time.time(), item_id))
+            conn.commit()
+            _stats['hits'] += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"  Detail cache read failed for item {item_id}: {e}")
+            _stats['misses'] += 1
+            return None
+
+
+def store_details(item_id, revision, details):
+    """Caches an item's extracted details, replacing any older revision."""
+    global _stores_since_eviction
+    with _lock:
+        try:
+            conn = _get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO item_details (item_id, revision, details, last_access) VALUES (?, ?, ?, ?);",
+                (item_id, revision, json.dumps(details), time.time())
+            )
+            _stats['stores'] += 1
+            _stores_since_eviction += 1
+            if _stores_since_eviction >= EVICTION_CHECK_INTERVAL:
+                _evict_locked(conn)
+                _stores_since_eviction = 0
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"  Detail cache write failed for item {item_id}: {e}")
+
+
+def _evict_locked(conn):
+    """Deletes the least recently used entries beyond DETAIL_CACHE_MAX_ENTRIES. Caller must hold _lock."""
+    count = conn.execute("SELECT COUNT(*) FROM item_details;").fetchone()[0]
+    excess = count - DETAIL_CACHE_MAX_ENTRIES
+    if excess > 0:
+        conn.execute("""
+            DELETE FROM item_details WHERE item_id IN (
+                SELECT item_id FROM item_details ORDER BY last_access ASC LIMIT ?
+            );
+        """, (excess,))
+        _stats['evictions'] += excess
+
+
+def get_cache_stats():
+    """Returns the hit/miss/store/eviction counters for this process."""
+    with _lock:
+        return dict(_stats)
+
+
+def print_cache_stats():
+    """Prints the detail cache counters."""
+    stats = get_cache_stats()
+    lookups = stats['hits'] + stats['misses']
+    hit_percent = (stats['hits'] / lookups * 100) if lookups else 0
+    print(f"  Detail cache: {stats['hits']} hits, {stats['misses']} misses ({hit_percent:.1f}% hit rate), "
+          f"{stats['stores']} stored, {stats['evictions']} evicted")
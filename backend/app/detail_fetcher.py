@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.ebay_search import (
+    get_item_details, get_items_details_batch,
+    DETAIL_FETCH_CONCURRENCY, USE_BATCH_ITEM_LOOKUP, ITEMS_BATCH_SIZE, USE_DETAIL_CACHE
+)
+from app.detail_cache import summary_revision, get_cached_details, store_details
+
+
+def _fetch_single(access_token, item_id, marketplace_id):
+    try:
+        return get_item_details(access_token, item_id, marketplace_id)
+    except Exception as e:
+        print(f"  Unexpected error fetching details for item {item_id}: {e}")
+        return None
+
+
+def _fetch_batch(access_token, item_ids, marketplace_id):
+    """Fetches one getItems batch, falling back to single fetches for IDs the batch didn't return."""
+    try:
+        details_by_id = get_items_details_batch(access_token, item_ids, marketplace_id)
+    except Exception as e:
+        print(f"  Unexpected error fetching batch of {len(item_ids)} items: {e}")
+        details_by_id = {}
+
+    missing = [item_id for item_id in item_ids if item_id not in details_by_id]
+    if missing:
+        print(f"  Batch returned {len(item_ids) - len(missing)}/{len(item_ids)} items; fetching the rest one by one")
+    for item_id in missing:
+        details_by_id[item_id] = _fetch_single(access_token, item_id, marketplace_id)
+
+    return [details_by_id[item_id] for item_id in item_ids]
+
+
+def fetch_item_details_concurrently(access_token, item_summaries, marketplace_id, max_in_flight=DETAIL_FETCH_CONCURRENCY, use_batch=USE_BATCH_ITEM_LOOKUP, use_cache=USE_DETAIL_CACHE):
+    """
+    Fetches item details for a page of item summaries concurrently.
+
+    With use_batch, summaries are grouped into getItems calls of up to ITEMS_BATCH_SIZE IDs;
+    otherwise each item gets its own getItem call. Either way the calls run on a bounded
+    thread pool, so at most max_in_flight requests are waiting on eBay at any time.
+
+    With use_cache, items whose summary is unchanged since their details were last fetched
+    are served from the on-disk detail cache and skip the network entirely.
+
+    Args:
+        access_token (str): eBay OAuth access token.
+        item_summaries (list): itemSummaries entries from search_ebay_listings.
+        marketplace_id (str): eBay marketplace ID (e.g. 'EBAY_US').
+        max_in_flight (int): Maximum number of concurrent detail requests.
+        use_batch (bool): Use the getItems batch endpoint.
+        use_cache (bool): Read and write the on-disk detail cache.
+
+    Returns:
+        list: (summary, extracted_details) tuples in the same order as item_summaries.
+              extracted_details is None when the fetch failed.
+    """
+    if not item_summaries:
+        return []
+
+    results = [None] * len(item_summaries)
+    revisions = [summary_revision(summary) for summary in item_summaries] if use_cache else None
+    to_fetch = [] # indexes of summaries that need a network fetch
+    for index, summary in enumerate(item_summaries):
+        cached = get_cached_details(summary.get('itemId'), revisions[index]) if use_cache else None
+        if cached is not None:
+            results[index] = cached
+        else:
+            to_fetch.append(index)
+
+    item_ids = [item_summaries[index].get('itemId') for index in to_fetch]
+    if use_batch:
+        chunks = [item_ids[i:i + ITEMS_BATCH_SIZE] for i in range(0, len(item_ids), ITEMS_BATCH_SIZE)]
+        workers = max(1, min(max_in_flight, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunk_results = executor.map(lambda chunk: _fetch_batch(access_token, chunk, marketplace_id), chunks)
+            fetched = [details for chunk in chunk_results for details in chunk]
+    else:
+        workers = max(1, min(max_in_flight, len(item_ids)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fetched = list(executor.map(lambda item_id: _fetch_single(access_token, item_id, marketplace_id), item_ids))
+
+    for index, details in zip(to_fetch, fetched):
+        results[index] = details
+        if use_cache and details is not None:
+            store_details(item_summaries[index].get('itemId'), revisions[index], details)
+
+    return list(zip(item_summaries, results))
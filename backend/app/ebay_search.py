@@ -1,19 +1,14 @@
 import os # for .env file
 from dotenv import load_dotenv # for loading environment variables
-import base64 # for base64 encoding OAuth credentials
 import requests # for HTTP requests
 import json # for JSON parsing
-import csv # for CSV file writing
-import sys
 import re # for regex operations
 import time # for sleep between requests
 from urllib.parse import quote  # Import the quote function for URL encoding
-from psycopg2.extras import Json  # For handling JSON data
-from app.database import connect_to_db, insert_data 
-from app.zero_shot_classifier import update_gold_column # Import the zero-shot classifier function
-from app.extract_metadata import extract_metadata # Import the metadata extraction function
-from app.calculate_profit import update_profit_column # Import the profit calculation function
-from app.scam_risk_score import update_scam_risk_score_column # Import the scam risk score function
+from app.database import connect_to_db
+from app.http_client import http_get, print_connection_stats # shared keep-alive session
+from app import token_provider # cached OAuth token shared by all workers
+from app.rate_limit import get_rate_limiter, backoff_delay, RETRY_MAX_ATTEMPTS, RETRYABLE_STATUS_CODES
 
 load_dotenv(override=True) # Load environment variables from .env file
 
@@ -27,9 +22,11 @@ CLIENT_SECRET = os.getenv('CLIENT_SECRET')
 # ITEM_DETAILS_BASE_URL = 'https://api.sandbox.ebay.com/buy/browse/v1/item/'
 
 #Production
-TOKEN_URL = "https://api.ebay.com/identity/v1/oauth2/token"  
-SEARCH_API_URL = "https://api.ebay.com/buy/browse/v1/item_summary/search"  
-ITEM_DETAILS_BASE_URL = "https://api.ebay.com/buy/browse/v1/item/"  
+# Set EBAY_API_BASE_URL to point the scraper at another host, e.g. the local mock API (app/mock_ebay_api.py)
+EBAY_API_BASE_URL = os.getenv('EBAY_API_BASE_URL', 'https://api.ebay.com').rstrip('/')
+TOKEN_URL = f"{EBAY_API_BASE_URL}/identity/v1/oauth2/token"  
+SEARCH_API_URL = f"{EBAY_API_BASE_URL}/buy/browse/v1/item_summary/search"  
+ITEM_DETAILS_BASE_URL = f"{EBAY_API_BASE_URL}/buy/browse/v1/item/"  
 
 
 SEARCH_KEYWORDS = [
@@ -41,12 +38,36 @@ SEARCH_KEYWORDS = [
     'gold estate jewelry'
 ] 
 MARKETPLACE_ID = 'EBAY_US' 
+# Marketplaces scraped concurrently, each with its own rate budget (e.g. EBAY_MARKETPLACES=EBAY_US,EBAY_GB,EBAY_DE)
+MARKETPLACE_IDS = [m.strip() for m in os.getenv('EBAY_MARKETPLACES', MARKETPLACE_ID).split(',') if m.strip()]
+# Listing currency and the buyer location sent in X-EBAY-C-ENDUSERCTX (shipping estimates are computed for it)
+MARKETPLACES = {
+    'EBAY_US': {'currency': 'USD', 'country': 'US', 'zip': '19406'},
+    'EBAY_GB': {'currency': 'GBP', 'country': 'GB', 'zip': 'SW1A 1AA'},
+    'EBAY_DE': {'currency': 'EUR', 'country': 'DE', 'zip': '10115'},
+    'EBAY_FR': {'currency': 'EUR', 'country': 'FR', 'zip': '75001'},
+    'EBAY_IT': {'currency': 'EUR', 'country': 'IT', 'zip': '00118'},
+    'EBAY_ES': {'currency': 'EUR', 'country': 'ES', 'zip': '28001'},
+    'EBAY_AU': {'currency': 'AUD', 'country': 'AU', 'zip': '2000'},
+    'EBAY_CA': {'currency': 'CAD', 'country': 'CA', 'zip': 'M5V 2T6'},
+}
 RESULTS_PER_PAGE = 100
 MAX_PAGES = 20
+SEARCH_OFFSET_CAP = 10000 # eBay serves at most this many results per search, however it is paginated
+USE_PRICE_PARTITIONING = True # Split searches with more results than we can page through into price bands
+PRICE_PARTITION_CEILING = 50000 # Bands are split below this price; everything above is one open-ended band
+PARTITION_CONCURRENCY = 4 # Price bands of one keyword crawled in parallel
+# New items per keyword and marketplace before it is cut short; 0 = no cap. Off by default with price
+# partitioning, whose bands reach every listing; without it the offset cap stops a keyword anyway
+MAX_ITEMS_PER_KEYWORD = int(os.getenv('MAX_ITEMS_PER_KEYWORD', '0' if USE_PRICE_PARTITIONING else '1000')) or None
 FILTER_RETURNS_ACCEPTED = False  # Set to True to filter for listings that accept returns
 OUTPUT_CSV_FILENAME = 'ebay_gold_listings_browse_api.csv'
 CATEGORY_IDS = None # Set to None to search all categories, or specify a list of category IDs
 SELLER_FEEDBACK_MIN = 0 # Minimum feedback score for sellers (if needed)
+DETAIL_FETCH_CONCURRENCY = int(os.getenv('DETAIL_FETCH_CONCURRENCY', '8')) # Max item detail requests in flight at once
+USE_BATCH_ITEM_LOOKUP = True # Fetch details through getItems (up to ITEMS_BATCH_SIZE items per call)
+ITEMS_BATCH_SIZE = 20 # Maximum item IDs the getItems endpoint accepts per call
+USE_DETAIL_CACHE = True # Reuse cached details for items whose summary hasn't changed since they were fetched
 
 
 DATABASE = os.environ.get('DB_NAME')
@@ -62,61 +83,76 @@ API_KEY = os.getenv('OPENAI_API_KEY')
 def get_access_token(client_id, client_secret, target_endpoint):
     """
     Obtains an OAuth access token from eBay using Client Credentials Grant.
+    The token is cached in memory and on disk and reused until shortly before it expires.
     """
-    print("Requesting Access Token...")
+    return token_provider.get_access_token(client_id, client_secret, target_endpoint)
 
-    try:
-        # Set the following HTTP request headers:
-            # Content-Type – Must be set to: application/x-www-form-urlencoded
-            # Authorization – The word "Basic " followed by your Base64-encoded OAuth credentials (<client_id>:<client_secret>).
-            # Prepare credentials for Basic Auth: base64(client_id:client_secret)
-        credentials = f"{client_id}:{client_secret}"
-        encoded_credentials = base64.b64encode(credentials.encode()).decode()
-        headers = {
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                    'Authorization': f'Basic {encoded_credentials}'
-        }
-
-        # Format the payload of your POST request with the following values:
-        # Set grant_type to client_credentials.
-            # Set scope to the URL-encoded space-separated list of the scopes needed for the 
-            # interfaces you call with the access token.
-        payload = {
-                'grant_type': 'client_credentials',
-                # Define the scope(s) your application needs. Check eBay documentation.
-                # Example scope for buying APIs
-                'scope': 'https://api.ebay.com/oauth/api_scope'
-                # For different APIs or scopes, adjust this value.
-                # Example: 'scope': 'https://api.ebay.com/oauth/api_scope https://api.ebay.com/oauth/api_scope/sell.marketing.readonly'
-        }
-
-        response = requests.post(target_endpoint, headers=headers, data=payload)
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-        token_data = response.json()
-        access_token = token_data.get('access_token')
-
-        if not access_token:
-                print("Error: Could not retrieve access token.")
-                print("Response:", response.text)
-                return None
-        
-        print("Access Token obtained successfully!")
-        # Optional: print("Token:", access_token) # Be careful printing tokens
-        # Optional: print("Expires in:", token_data.get('expires_in'), "seconds")
-        
-        return access_token
-    
-    # ??? Learn what this does
-    except requests.exceptions.RequestException as e:
-        print(f"Error getting access token: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Response status code: {e.response.status_code}")
-            print(f"Response text: {e.response.text}")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred during token retrieval: {e}")
-        return None
+
+def marketplace_limiter_name(marketplace_id):
+    """Name of the rate limiter for a marketplace; every marketplace gets its own budget."""
+    return f"ebay:{marketplace_id}" if marketplace_id else 'ebay'
+
+
+def marketplace_currency(marketplace_id):
+    """Currency listings on a marketplace are priced in."""
+    return MARKETPLACES.get(marketplace_id, MARKETPLACES[MARKETPLACE_ID])['currency']
+
+
+def enduser_context(marketplace_id):
+    """X-EBAY-C-ENDUSERCTX value placing the buyer in the marketplace's own country."""
+    marketplace = MARKETPLACES.get(marketplace_id, MARKETPLACES[MARKETPLACE_ID])
+    return 'contextualLocation=' + quote(f"country={marketplace['country']},zip={marketplace['zip']}", safe='')
+
+
+def _browse_get(url, access_token, headers, params, timeout, max_retries=RETRY_MAX_ATTEMPTS):
+    """
+    Sends a Browse API GET with the current shared access token, through the rate limiter of
+    the marketplace in the X-EBAY-C-MARKETPLACE-ID header.
+
+    - 401: refreshes the token once and retries transparently.
+    - 429/5xx and connection errors: retried up to max_retries times with exponential backoff
+      and jitter, honoring Retry-After. A 429 pauses every worker, not just this one.
+    Returns the last response; raises the last connection error if every attempt failed.
+    """
+    limiter = get_rate_limiter(marketplace_limiter_name(headers.get('X-EBAY-C-MARKETPLACE-ID')))
+    refreshed = False
+    attempt = 0
+    while True:
+        access_token = token_provider.current_access_token(access_token)
+        limiter.wait()
+        try:
+            response = http_get(url, headers={**headers, 'Authorization': f'Bearer {access_token}'}, params=params, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            limiter.record(False)
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"  Request failed ({e}). Retrying in {delay:.1f} seconds...")
+        else:
+            if response.status_code == 401 and not refreshed:
+                refreshed = True
+                new_token = token_provider.refresh_access_token(access_token)
+                if new_token and new_token != access_token:
+                    print("  Access token rejected (401). Retrying with a refreshed token...")
+                    access_token = new_token
+                    continue
+                return response
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                limiter.record(True)
+                return response
+
+            limiter.record(False)
+            if attempt >= max_retries:
+                return response
+            delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+            if response.status_code == 429:
+                limiter.pause(delay) # Throttled: everyone backs off, not just this worker
+            print(f"  HTTP {response.status_code} from eBay. Retrying in {delay:.1f} seconds (attempt {attempt + 1}/{max_retries})...")
+
+        limiter.record_retry()
+        time.sleep(delay)
+        attempt += 1
     
 
 # --- Function to Search eBay Listings ---
@@ -129,11 +165,10 @@ def search_ebay_listings(access_token, search_query, category_ids, limit, market
     """
     if not access_token:
         print("Cannot search listings without an access token.")
-        return None
+        return None, 0
 
     print(f"\nSearching eBay marketplace '{marketplace_id}' for '{search_query}'...")
     headers = {
-        'Authorization': f'Bearer {access_token}',
         'X-EBAY-C-MARKETPLACE-ID': marketplace_id,
         'Accept': 'application/json'
     }
@@ -145,6 +180,9 @@ def search_ebay_listings(access_token, search_query, category_ids, limit, market
     if filter_str:
         params['filter'] = filter_str
         print(f"  Applying filter: '{filter_str}'")
+    if sort_order:
+        params['sort'] = sort_order
+        print(f"  Sorting by: '{sort_order}'")
         
 
     #THIS IS WEIRD!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!    
@@ -160,7 +198,7 @@ def search_ebay_listings(access_token, search_query, category_ids, limit, market
     # print(f"Request URL: {full_url_with_params}") # Print the full URL
 
     try:
-        response = requests.get(SEARCH_API_URL, headers=headers, params=params, timeout=20)
+        response = _browse_get(SEARCH_API_URL, access_token, headers, params, timeout=20)
         response.raise_for_status()
         listings_data = response.json() 
         total_listings = listings_data.get('total', 0)
@@ -178,10 +216,49 @@ def search_ebay_listings(access_token, search_query, category_ids, limit, market
                 print(f"Response text: {e.response.text}")
         return None, 0
 
+def extract_item_details(item_details):
+    """
+    Maps a Browse API item payload (from getItem or getItems) onto the fields we store:
+    description, returns_accepted, metal, total_carat_weight, metal_purity and item_specifics.
+    """
+    # Extract prioritized details
+    extracted_details = {
+        'description': sanitize_text(item_details.get('description')),
+        'metal': None,
+        'returns_accepted': None,
+        'item_specifics': None  # Initialize
+    }
+
+    # VERY SUSPICIOUS__________----------------------------------________________-----------------____--_-_-__---_--
+    # Extract metal from localizedAspects
+    localized_aspects = item_details.get('localizedAspects', [])
+
+    # Extract returnsAccepted
+    return_terms = item_details.get('returnTerms', {})
+    extracted_details['returns_accepted'] = return_terms.get('returnsAccepted')
+
+    # Extract item specifics - build a dictionary
+    item_specifics_dict = {}
+    for aspect in localized_aspects:
+        name = aspect.get('name', '').lower()  # Safe access, case-insensitive
+        if name == 'metal':  # Safe access, case-insensitive
+            extracted_details['metal'] = aspect.get('value')
+        elif name == 'total carat weight':
+            extracted_details['total_carat_weight'] = aspect.get('value')
+        elif name == 'metal purity':
+            extracted_details['metal_purity'] = aspect.get('value')
+        else: 
+            item_specifics_dict[aspect.get('name')] = aspect.get('value')
+    extracted_details['item_specifics'] = item_specifics_dict
+    #__________----------------------------------________________-----------------____--_-_-__---_--
+
+    return extracted_details
+
 # --- Function to Get Item Details ---
-def get_item_details(access_token, item_id, marketplace_id, max_retries=1, retry_delay=1):
+def get_item_details(access_token, item_id, marketplace_id, max_retries=RETRY_MAX_ATTEMPTS):
     """
     Retrieves detailed information for a specific item using the /item/{item_id} endpoint.
+    Throttled and transient failures are retried by _browse_get (up to max_retries times).
     See: https://developer.ebay.com/api-docs/buy/browse/resources/item/methods/getItem
     See (for field groups): https://developer.ebay.com/api-docs/buy/static/ref-buy-browse-request-parameters.html#Parameter-fieldgroups
     """
@@ -194,9 +271,8 @@ def get_item_details(access_token, item_id, marketplace_id, max_retries=1, retry
 
 
     headers = {
-        'Authorization': f'Bearer {access_token}',
         'X-EBAY-C-MARKETPLACE-ID': marketplace_id,
-        'X-EBAY-C-ENDUSERCTX': 'contextualLocation=country%3DUS%2Czip%3D19406', # Add the required header
+        'X-EBAY-C-ENDUSERCTX': enduser_context(marketplace_id), # Add the required header
         'Accept': 'application/json',
     }
     params = {
@@ -205,72 +281,70 @@ def get_item_details(access_token, item_id, marketplace_id, max_retries=1, retry
 
     print(f"  Fetching details for Item ID: {item_id}...")
 
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(details_url, headers=headers, params=params, timeout=15)
-            response.raise_for_status() # Raise an exception for HTTP errors
-
-            
-            item_details = response.json()
-
-            # Extract prioritized details
-            extracted_details = {
-                'description': sanitize_text(item_details.get('description')),
-                'metal': None,
-                'returns_accepted': None,
-                'item_specifics': None  # Initialize
-            }
-
-            # VERY SUSPICIOUS__________----------------------------------________________-----------------____--_-_-__---_--
-            # Extract metal from localizedAspects
-            localized_aspects = item_details.get('localizedAspects', [])
-
-            # Extract returnsAccepted
-            return_terms = item_details.get('returnTerms', {})
-            extracted_details['returns_accepted'] = return_terms.get('returnsAccepted')
-
-            # Extract item specifics - build a dictionary
-            item_specifics_dict = {}
-            for aspect in localized_aspects:
-                name = aspect.get('name', '').lower()  # Safe access, case-insensitive
-                if name == 'metal':  # Safe access, case-insensitive
-                    extracted_details['metal'] = aspect.get('value')
-                elif name == 'total carat weight':
-                    extracted_details['total_carat_weight'] = aspect.get('value')
-                elif name == 'metal purity':
-                    extracted_details['metal_purity'] = aspect.get('value')
-                else: 
-                    item_specifics_dict[aspect.get('name')] = aspect.get('value')
-            extracted_details['item_specifics'] = item_specifics_dict
-            #__________----------------------------------________________-----------------____--_-_-__---_--
-
-            return extracted_details
-
-        except requests.exceptions.RequestException as e:
-            print(f"  Error fetching details for item {item_id} (Attempt {attempt + 1}/{max_retries}): {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"  Response status code: {e.response.status_code}")
-                try:
-                    error_details = e.response.json()
-                    print(f"  Error details: {json.dumps(error_details, indent=2)}")
-                    if e.response.status_code != 500: # Don't retry if it's a different client error
-                        break
-                except json.JSONDecodeError:
-                    print(f"  Response text: {e.response.text}")
-                    if e.response.status_code != 500:
-                        break
-
-            # Retry logic
-            if attempt < max_retries - 1:
-                print(f"  Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            else:
-                print(f"  Max retries reached for item {item_id}. Skipping.")
-                return None
-    return None
+    try:
+        response = _browse_get(details_url, access_token, headers, params, timeout=15, max_retries=max_retries)
+        response.raise_for_status() # Raise an exception for HTTP errors
+
+        item_details = response.json()
+        return extract_item_details(item_details)
+
+    except requests.exceptions.RequestException as e:
+        print(f"  Error fetching details for item {item_id}: {e}")
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"  Response status code: {e.response.status_code}")
+            try:
+                error_details = e.response.json()
+                print(f"  Error details: {json.dumps(error_details, indent=2)}")
+            except json.JSONDecodeError:
+                print(f"  Response text: {e.response.text}")
+        print(f"  Skipping item {item_id}.")
+        return None
+
+# --- Function to Get Details for Several Items ---
+def get_items_details_batch(access_token, item_ids, marketplace_id):
+    """
+    Retrieves details for up to ITEMS_BATCH_SIZE items in one call using the getItems endpoint.
+    See: https://developer.ebay.com/api-docs/buy/browse/resources/item/methods/getItems
+
+    Returns:
+        dict: item_id -> extracted details (same fields as get_item_details) for every item
+              the call returned. Items missing from the response are left out, so the caller
+              can fall back to get_item_details for them. Returns an empty dict on error.
+    """
+    if not access_token or not item_ids:
+        return {}
+    if len(item_ids) > ITEMS_BATCH_SIZE:
+        raise ValueError(f"getItems accepts at most {ITEMS_BATCH_SIZE} item IDs, got {len(item_ids)}")
+
+    headers = {
+        'X-EBAY-C-MARKETPLACE-ID': marketplace_id,
+        'X-EBAY-C-ENDUSERCTX': enduser_context(marketplace_id),
+        'Accept': 'application/json',
+    }
+    params = {
+        'item_ids': ','.join(item_ids)
+    }
+
+    print(f"  Fetching details for {len(item_ids)} items in one batch...")
+
+    try:
+        response = _browse_get(ITEM_DETAILS_BASE_URL, access_token, headers, params, timeout=20)
+        response.raise_for_status()
+        items = response.json().get('items', [])
+        return {item['itemId']: extract_item_details(item) for item in items if item.get('itemId')}
+    except requests.exceptions.RequestException as e:
+        print(f"  Error fetching batch of {len(item_ids)} items: {e}")
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"  Response status code: {e.response.status_code}")
+        return {}
+    except ValueError as e:
+        print(f"  Invalid JSON in batch response: {e}")
+        return {}
 
 # Removes HTML tags and unnecessary characters from the input text.
 def sanitize_text(text):
+    if not text:
+        return text
     # Remove HTML tags
     clean_text = re.sub(r"<[^>]*>", "", text)
     # Remove extra spaces
@@ -279,6 +353,16 @@ def sanitize_text(text):
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    # Pipeline stages are only needed when running this module directly; importing them
+    # at module level would load the classifier models into every scraper import.
+    from app.scraper import scrape_listings
+    from app.detail_cache import print_cache_stats
+    from app.rate_limit import print_rate_limit_stats
+    from app.zero_shot_classifier import update_gold_column # Import the zero-shot classifier function
+    from app.extract_metadata import extract_metadata # Import the metadata extraction function
+    from app.calculate_profit import update_profit_column # Import the profit calculation function
+    from app.scam_risk_score import update_scam_risk_score_column # Import the scam risk score function
+
     access_token = get_access_token(CLIENT_ID, CLIENT_SECRET, TOKEN_URL)
     if not access_token:
         exit("Failed to get access token. Exiting.")
@@ -295,126 +379,24 @@ if __name__ == "__main__":
     if not conn:
         exit("Failed to connect to the database. Exiting.")
 
-    # Batch processing configuration
-    BATCH_SIZE = 100
-    batch_items = []
-    total_items_processed = 0
+    items_per_keyword = 5  # Limit per keyword
 
-    # Loop through each search keyword
-    for keyword_index, search_keyword in enumerate(SEARCH_KEYWORDS):
-        print(f"\n{'='*60}")
-        print(f"Processing keyword {keyword_index + 1}/{len(SEARCH_KEYWORDS)}: '{search_keyword}'")
-        print(f"{'='*60}")
-        
-        total_fetched = 0
-        page_number = 1
-        items_per_keyword = 5  # Limit per keyword
-
-        while page_number <= MAX_PAGES:
-            # Calculate offset for pagination
-            offset = (page_number - 1) * RESULTS_PER_PAGE
-
-            item_summaries, total_listings = search_ebay_listings(
-                access_token=access_token,
-                search_query=search_keyword,  # Use current keyword
-                category_ids=CATEGORY_IDS,
-                limit=RESULTS_PER_PAGE,
-                marketplace_id=MARKETPLACE_ID,
-                filter_str=FILTER_STRING,
-                offset=offset  # Pass offset for pagination
-            )
-
-            if total_listings == 0 or not item_summaries:
-                print(f"No more listings found for '{search_keyword}'. Moving to next keyword.")
-                break
-
-            items_processed_this_keyword = 0
-            for summary in item_summaries:
-                if total_items_processed >= items_per_keyword:
-                    break
-                    
-                seller_info = summary.get('seller', {})
-                item_id = summary.get('itemId')
-                
-                # # Skip if we already have this item (avoid duplicates across keywords)
-                # if any(item['item_id'] == item_id for item in all_item_data):
-                #     print(f"  Skipping duplicate item: {item_id}")
-                #     continue
-
-                # Check for duplicates in database instead of memory
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM ebay_listings WHERE item_id = %s", (item_id,))
-                if cursor.fetchone()[0] > 0:
-                    print(f"  Skipping duplicate item: {item_id}")
-                    cursor.close()
-                    continue
-                cursor.close()
-                
-                item_details = get_item_details(access_token, item_id, MARKETPLACE_ID)
-                
-                if item_details:  # Only add if we got details successfully
-                    item_data = {
-                        'item_id': summary.get('itemId'),
-                        'title': summary.get('title'),
-                        'price': summary.get('price', {}).get('value'),
-                        'currency': summary.get('price', {}).get('currency'),
-                        'seller_username': seller_info.get('username'),
-                        'seller_feedback_score': seller_info.get('feedbackScore'),
-                        'feedback_percent': seller_info.get('feedbackPercentage'),
-                        'image_url': summary.get('image', {}).get('imageUrl'),
-                        'item_url': summary.get('itemWebUrl'),
-                        'shipping_options': summary.get('shippingOptions', None),
-                        'top_rated_buying_experience': summary.get('topRatedBuyingExperience'),
-                        'description': item_details.get('description', None),
-                        'returns_accepted': item_details.get('returns_accepted', None),
-                        'metal': item_details.get('metal', None),
-                        'total_carat_weight': item_details.get('total_carat_weight', None),
-                        'metal_purity': item_details.get('metal_purity', None),
-                        'item_specifics': item_details.get('item_specifics', {}),
-                        'search_keyword': search_keyword  # Track which keyword found this item
-                    }
-
-                    batch_items.append(item_data)
-                    items_processed_this_page += 1
-                    total_items_processed += 1
-
-                    # Process batch when it reaches BATCH_SIZE
-                    if len(batch_items) >= BATCH_SIZE:
-                        print(f"  Processing batch of {len(batch_items)} items...")
-                        successful_inserts = 0
-                        for item in batch_items:
-                            if insert_data(conn, "ebay_listings", item):
-                                successful_inserts += 1
-                        print(f"  Successfully inserted {successful_inserts}/{len(batch_items)} items")
-                        batch_items = []  # Clear the batch
-
-            print(f"  Found {items_processed_this_page} new items for '{search_keyword}' on page {page_number}")
-            
-            # Break if we've hit our limit for this keyword
-            if total_items_processed >= items_per_keyword:
-                print(f"Reached limit of {items_per_keyword} items for '{search_keyword}'.")
-                break
-
-            total_fetched += len(item_summaries)
-            if total_fetched >= total_listings or page_number >= MAX_PAGES:
-                break
-            page_number += 1
-
-        print(f"Completed '{search_keyword}': processed items up to {total_items_processed}")
-
-    # Process any remaining items in the final batch
-    if batch_items:
-        print(f"\nProcessing final batch of {len(batch_items)} items...")
-        successful_inserts = 0
-        for item in batch_items:
-            if insert_data(conn, "ebay_listings", item):
-                successful_inserts += 1
-        print(f"Successfully inserted {successful_inserts}/{len(batch_items)} items")
+    scrape_stats = scrape_listings(
+        conn, access_token, SEARCH_KEYWORDS, MARKETPLACE_IDS,
+        max_items_per_keyword=items_per_keyword,
+        filter_str=FILTER_STRING
+    )
+    total_items_processed = scrape_stats['items_processed']
 
     print(f"\n{'='*60}")
     print(f"TOTAL UNIQUE ITEMS FOUND: {total_items_processed}")
     print(f"{'='*60}")
 
+    print("HTTP connection reuse:")
+    print_connection_stats()
+    print_rate_limit_stats()
+    print_cache_stats()
+
     # # --- Insert data into PostgreSQL database ---
     # if all_item_data:
     #     print(f"\nInserting {len(all_item_data)} items into the database...")
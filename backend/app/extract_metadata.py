@@ -42,6 +42,7 @@
 
 import re
 import spacy
+from app.database import bulk_update_listings, stream_rows, STAGE_CHUNK_SIZE
 
 # Load spaCy's NLP model
 nlp = spacy.load("en_core_web_sm")
@@ -153,8 +154,39 @@ def extract_with_spacy(text):
 
     return {"weight": weight, "purity": purity}
 
-def extract_metadata(conn):
-    cursor = conn.cursor()
+def extract_weight_and_purity(row):
+    """
+    Extracts weight (grams) and purity (karats) for one listing, preferring item_specifics,
+    then regex over the title and description, then spaCy.
+
+    Args:
+        row (tuple): (item_id, title, description, metal, total_carat_weight, metal_purity)
+
+    Returns:
+        tuple: (weight, purity); either may be None if it couldn't be found.
+    """
+    # Extract from item_specifics first
+    item_specifics_data = extract_from_item_specifics(row)
+    
+    # If missing, try text blob extraction
+    text_blob_data = extract_from_text_blob(row)
+    
+    # Combine results (prioritize item_specifics)
+    weight = item_specifics_data.get("weight") or text_blob_data.get("weight")
+    purity = item_specifics_data.get("purity") or text_blob_data.get("purity")
+
+    print(f"Item {row[0]} - weight: {weight} purity: {purity}")
+
+    # Use spaCy as a fallback if weight or purity is still missing
+    if not weight or not purity:
+        spacy_data = extract_with_spacy(f"{row[1]} {row[2]}")
+        print("spacy_data: " + str(spacy_data))
+        weight = weight or normalize_weight(spacy_data.get("weight"))
+        purity = purity or normalize_purity(spacy_data.get("purity"))
+
+    return weight, purity
+
+def extract_metadata(conn, chunk_size=STAGE_CHUNK_SIZE):
     successful_updates = 0
     failed_updates = 0
     
@@ -166,38 +198,17 @@ def extract_metadata(conn):
         WHERE is_gold = TRUE
             AND (weight IS NULL OR purity IS NULL);
         """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        
-        for row in rows:
+        updates = []
+        for row in stream_rows(conn, query, chunk_size=chunk_size):
+            if len(updates) >= chunk_size:
+                bulk_update_listings(conn, ['weight', 'purity'], updates)
+                updates = []
             try:
-                # Extract from item_specifics first
-                item_specifics_data = extract_from_item_specifics(row)
-                
-                # If missing, try text blob extraction
-                text_blob_data = extract_from_text_blob(row)
-                
-                # Combine results (prioritize item_specifics)
-                weight = item_specifics_data.get("weight") or text_blob_data.get("weight")
-                purity = item_specifics_data.get("purity") or text_blob_data.get("purity")
-
-                print(f"Item {row[0]} - weight: {weight} purity: {purity}")
-
-                # Use spaCy as a fallback if weight or purity is still missing
-                if not weight or not purity:
-                    spacy_data = extract_with_spacy(f"{row[1]} {row[2]}")
-                    print("spacy_data: " + str(spacy_data))
-                    weight = weight or normalize_weight(spacy_data.get("weight"))
-                    purity = purity or normalize_purity(spacy_data.get("purity"))
+                weight, purity = extract_weight_and_purity(row)
 
                 # Update the database if both weight and purity are found and valid
                 if weight and purity and weight > 0 and 0 < purity <= 24:
-                    update_query = """
-                        UPDATE ebay_listings
-                        SET weight = %s, purity = %s
-                        WHERE item_id = %s;
-                    """
-                    cursor.execute(update_query, (weight, purity, row[0]))
+                    updates.append((row[0], weight, purity))
                     successful_updates += 1
                 else:
                     print(f"Skipped row {row[0]}: Missing or invalid weight ({weight}) or purity ({purity})")
@@ -208,11 +219,10 @@ def extract_metadata(conn):
                 failed_updates += 1
                 continue  # Continue with next item
 
-        conn.commit()
+        bulk_update_listings(conn, ['weight', 'purity'], updates)
+        conn.commit()  # Ends the read transaction even when there was nothing to update
         print(f"Metadata extraction complete: {successful_updates} successful, {failed_updates} failed")
         
     except Exception as e:
         conn.rollback()
-        print(f"Error in extract_metadata: {e}")
-    finally:
-        cursor.close()
\ No newline at end of file
+        raise Exception(f"Error in extract_metadata: {e}")
\ No newline at end of file
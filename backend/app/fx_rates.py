@@ -0,0 +1,130 @@
+import os # for .env file
+import json # for the on-disk rate cache
+import threading
+import time
+import requests # for HTTP request exceptions
+from decimal import Decimal, ROUND_HALF_UP
+from dotenv import load_dotenv
+from app.http_client import http_get
+
+load_dotenv()
+
+# --- Configuration ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_CURRENCY = 'USD' # Prices are stored in this currency (the gold spot price is quoted in it too)
+FX_RATES_URL = os.getenv('FX_RATES_URL', f"https://open.er-api.com/v6/latest/{BASE_CURRENCY}")
+FX_CACHE_PATH = os.getenv('FX_CACHE_PATH', os.path.join(BACKEND_DIR, '.fx_rates_cache.json'))
+FX_CACHE_TTL_SECONDS = 12 * 3600 # Rates are refreshed after this long
+FX_STALE_MAX_SECONDS = 7 * 24 * 3600 # An older table is still used when a refresh fails, up to this age
+FX_RETRY_SECONDS = 300 # Don't retry a failed download for every price that needs converting
+
+# Shared by every worker thread in the process; the disk cache shares it across runs
+_lock = threading.Lock()
+_table = None # {'base': str, 'rates': {currency: units per base}, 'fetched_at': float}
+_failed_at = 0 # When the last download failed
+
+
+def request_fx_rates():
+    """
+    Downloads the current exchange rate table.
+
+    Returns:
+        dict: {'base', 'rates', 'fetched_at'}, or None on failure.
+    """
+    print("Requesting exchange rates...")
+    try:
+        response = http_get(FX_RATES_URL, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        rates = data.get('rates')
+        if not rates:
+            print(f"Error: no rates in exchange rate response: {response.text[:200]}")
+            return None
+        return {'base': data.get('base_code', BASE_CURRENCY), 'rates': rates, 'fetched_at': time.time()}
+    except requests.exceptions.RequestException as e:
+        print(f"Error getting exchange rates: {e}")
+        return None
+    except ValueError as e:
+        print(f"Error: Invalid JSON in exchange rate response: {e}")
+        return None
+
+
+def _age(table):
+    return time.time() - table.get('fetched_at', 0)
+
+
+def _load_cached_table():
+    try:
+        with open(FX_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_table(table):
+    try:
+        tmp_path = f"{FX_CACHE_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(table, f)
+        os.replace(tmp_path, FX_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: could not write exchange rate cache '{FX_CACHE_PATH}': {e}")
+
+
+def get_fx_rates():
+    """
+    Returns the exchange rate table, reusing the in-memory or on-disk copy until it is
+    FX_CACHE_TTL_SECONDS old. If a refresh fails, a table up to FX_STALE_MAX_SECONDS old
+    is used instead.
+
+    Returns:
+        dict: {'base', 'rates', 'fetched_at'}, or None if no usable table is available.
+    """
+    global _table, _failed_at
+    with _lock:
+        if _table is not None and _age(_table) < FX_CACHE_TTL_SECONDS:
+            return _table
+
+        cached = _load_cached_table()
+        if cached is not None and cached.get('base') == BASE_CURRENCY and _age(cached) < FX_CACHE_TTL_SECONDS:
+            _table = cached
+            return _table
+
+        if time.time() - _failed_at >= FX_RETRY_SECONDS:
+            fresh = request_fx_rates()
+            if fresh is not None and fresh['base'] == BASE_CURRENCY:
+                _table = fresh
+                _save_cached_table(_table)
+                return _table
+            _failed_at = time.time()
+
+        fallback = _table or cached
+        if fallback is not None and fallback.get('base') == BASE_CURRENCY and _age(fallback) < FX_STALE_MAX_SECONDS:
+            if fallback is not _table:
+                print(f"Warning: using exchange rates from {_age(fallback) / 3600:.1f} hours ago.")
+            _table = fallback
+            return _table
+        return None
+
+
+def to_base_currency(amount, currency):
+    """
+    Converts an amount (number or numeric string) into BASE_CURRENCY.
+
+    Returns:
+        str: The converted amount with 2 decimals, or None if it can't be converted.
+    """
+    if amount is None or not currency:
+        return None
+    try:
+        value = Decimal(str(amount))
+    except ArithmeticError:
+        return None
+    if currency == BASE_CURRENCY:
+        return str(value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+    table = get_fx_rates()
+    rate = table['rates'].get(currency) if table else None
+    if not rate:
+        return None
+    return str((value / Decimal(str(rate))).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
@@ -0,0 +1,272 @@
+"""
+Listing generations: a full pipeline run builds the next generation of the listing tables in a
+shadow schema and swaps it in atomically once every step succeeded, instead of truncating the
+live tables first. The API keeps serving the current generation for the whole run, and the one
+it replaced is kept for rollback.
+
+    public              the live generation (ebay_listings, gated_listings, listing_feed)
+    listings_next       the generation a full run is building
+    listings_previous   the generation the last swap replaced, with its scrape watermarks
+
+A run writes to the shadow schema through search_path, so the scraper, the pipeline and the
+enrichment stages use their usual unqualified table names.
+
+Run from the backend directory:
+    python -m app.generations status      # listings in each generation
+    python -m app.generations rollback    # swap the previous generation back in
+"""
+import argparse
+import psycopg2
+from app.database import connect_to_db
+from app.checkpoints import MARK_STEP_COMPLETED_SQL
+
+SHADOW_SCHEMA = 'listings_next'
+PREVIOUS_SCHEMA = 'listings_previous'
+GENERATION_TABLES = ['ebay_listings', 'gated_listings'] # Rebuilt by every full run
+FEED_VIEW = 'listing_feed'
+WATERMARKS_TABLE = 'scrape_watermarks' # Describes the live generation; kept with it when it is replaced
+SWAP_LOCK_ID = 727_002 # pg_advisory_xact_lock key held while generations are swapped
+SWAP_LOCK_TIMEOUT = '10s' # Give up (and fail the step) rather than queue readers behind a long transaction
+
+
+def _schema_exists(cursor, schema):
+    cursor.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s;", (schema,))
+    return cursor.fetchone() is not None
+
+
+def _columns(cursor, schema, table):
+    cursor.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position;
+    """, (schema, table))
+    return cursor.fetchall()
+
+
+def _move_generation(cursor, from_schema, to_schema):
+    """Moves the generation's tables and feed view between schemas; their indexes move along."""
+    for table in GENERATION_TABLES:
+        cursor.execute(f"ALTER TABLE {from_schema}.{table} SET SCHEMA {to_schema};")
+    cursor.execute(f"ALTER MATERIALIZED VIEW {from_schema}.{FEED_VIEW} SET SCHEMA {to_schema};")
+
+
+def _exchange_watermarks(cursor, schema):
+    """
+    Swaps the live watermarks with the ones saved in schema, along with the generation coming
+    back from there. Without saved watermarks the live ones are still moved out, since they don't
+    describe that generation; the next incremental run then starts from scratch.
+    """
+    cursor.execute("SELECT 1 FROM pg_tables WHERE schemaname = %s AND tablename = %s;", (schema, WATERMARKS_TABLE))
+    saved = cursor.fetchone() is not None
+    if saved:
+        cursor.execute(f"ALTER TABLE {schema}.{WATERMARKS_TABLE} RENAME TO {WATERMARKS_TABLE}_restore;")
+    cursor.execute(f"CREATE TABLE {schema}.{WATERMARKS_TABLE} AS TABLE public.{WATERMARKS_TABLE};")
+    cursor.execute(f"DELETE FROM public.{WATERMARKS_TABLE};")
+    if saved:
+        cursor.execute(f"INSERT INTO public.{WATERMARKS_TABLE} SELECT * FROM {schema}.{WATERMARKS_TABLE}_restore;")
+        cursor.execute(f"DROP TABLE {schema}.{WATERMARKS_TABLE}_restore;")
+
+
+def shadow_generation_exists(conn):
+    """True if a full run has started building a generation that hasn't been swapped in yet."""
+    cursor = conn.cursor()
+    try:
+        exists = _schema_exists(cursor, SHADOW_SCHEMA)
+        conn.commit()
+        return exists
+    finally:
+        cursor.close()
+
+
+def create_shadow_generation(conn):
+    """
+    Starts an empty generation in the shadow schema, with the live tables' columns, defaults,
+    constraints and indexes. A shadow left by an abandoned run is dropped.
+
+    Raises:
+        Exception: If the shadow tables can't be created.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE;")
+        cursor.execute(f"CREATE SCHEMA {SHADOW_SCHEMA};")
+        for table in GENERATION_TABLES:
+            cursor.execute(f"CREATE TABLE {SHADOW_SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL);")
+        conn.commit()
+        print(f"Shadow generation created in schema '{SHADOW_SCHEMA}'.")
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error creating shadow generation: {e}")
+    finally:
+        cursor.close()
+
+
+def use_shadow_generation(conn):
+    """Points the connection's unqualified table names at the shadow generation (other tables stay in public)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SET search_path TO {SHADOW_SCHEMA}, public;")
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def use_live_generation(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET search_path TO DEFAULT;")
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def build_shadow_feed(conn):
+    """
+    Builds the shadow generation's listing_feed with the live view's definition and indexes
+    (whatever the migrations made them), so the swap only has to rename.
+
+    Raises:
+        Exception: If the view can't be built.
+    """
+    cursor = conn.cursor()
+    try:
+        # With only public on the path the definition names ebay_listings unqualified,
+        # so it binds to the shadow table below
+        cursor.execute("SET LOCAL search_path TO public;")
+        cursor.execute("SELECT pg_get_viewdef(%s::regclass);", (f"public.{FEED_VIEW}",))
+        definition = cursor.fetchone()[0].strip().rstrip(';')
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s;", (FEED_VIEW,))
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"SET LOCAL search_path TO {SHADOW_SCHEMA}, public;")
+        cursor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {SHADOW_SCHEMA}.{FEED_VIEW};")
+        cursor.execute(f"CREATE MATERIALIZED VIEW {SHADOW_SCHEMA}.{FEED_VIEW} AS {definition};")
+        for index_definition in index_definitions:
+            cursor.execute(index_definition.replace(f" ON public.{FEED_VIEW} ", f" ON {SHADOW_SCHEMA}.{FEED_VIEW} "))
+        cursor.execute(f"ANALYZE {SHADOW_SCHEMA}.{FEED_VIEW};")
+        conn.commit()
+        print(f"Materialized view '{FEED_VIEW}' built for the shadow generation.")
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error building shadow listing feed: {e}")
+    finally:
+        cursor.close()
+
+
+def swap_in_shadow_generation(conn, run_id=None):
+    """
+    Makes the shadow generation live in one transaction: the live tables and feed move to the
+    previous schema (replacing the generation kept there), the shadow ones move to public.
+    Readers see either the old generation or the new one, never a mix.
+
+    The incremental scrape watermarks move to the previous schema in the same transaction: they
+    describe the generation being replaced (and come back with it on rollback), and a failed or
+    abandoned run leaves them untouched.
+
+    Args:
+        conn: The database connection object.
+        run_id (str): Pipeline run to mark the 'swap' step completed for, in the same transaction,
+                      so a resumed run never swaps twice.
+
+    Raises:
+        Exception: If there is no complete shadow generation, its tables don't match the live
+                   schema (a migration ran mid-run), or the swap fails; nothing changes then.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}';")
+        cursor.execute("SELECT pg_advisory_xact_lock(%s);", (SWAP_LOCK_ID,))
+        if not _schema_exists(cursor, SHADOW_SCHEMA):
+            raise Exception(f"no shadow generation in schema '{SHADOW_SCHEMA}'")
+        for table in GENERATION_TABLES:
+            if _columns(cursor, SHADOW_SCHEMA, table) != _columns(cursor, 'public', table):
+                raise Exception(f"shadow {table} doesn't match the live table; start a new full run")
+        cursor.execute("SELECT 1 FROM pg_matviews WHERE schemaname = %s AND matviewname = %s;", (SHADOW_SCHEMA, FEED_VIEW))
+        if cursor.fetchone() is None:
+            raise Exception(f"shadow generation has no {FEED_VIEW}; build it first")
+
+        # Nothing references the listing tables (migration 5), so CASCADE only takes the discarded generation
+        cursor.execute(f"DROP SCHEMA IF EXISTS {PREVIOUS_SCHEMA} CASCADE;")
+        cursor.execute(f"CREATE SCHEMA {PREVIOUS_SCHEMA};")
+        _move_generation(cursor, 'public', PREVIOUS_SCHEMA)
+        _move_generation(cursor, SHADOW_SCHEMA, 'public')
+        cursor.execute(f"DROP SCHEMA {SHADOW_SCHEMA};")
+        # Saved with the replaced generation; the next incremental run starts from the new one
+        cursor.execute(f"CREATE TABLE {PREVIOUS_SCHEMA}.{WATERMARKS_TABLE} AS TABLE public.{WATERMARKS_TABLE};")
+        cursor.execute(f"DELETE FROM public.{WATERMARKS_TABLE};")
+        if run_id is not None:
+            cursor.execute(MARK_STEP_COMPLETED_SQL, ('swap', run_id, 'swap'))
+        conn.commit()
+        print(f"Swapped in the new listing generation; the previous one is kept in schema '{PREVIOUS_SCHEMA}'.")
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Error swapping listing generations: {e}")
+    finally:
+        cursor.close()
+
+
+def rollback_generation(conn):
+    """
+    Swaps the previous generation, and the watermarks saved with it, back in. The generation it
+    replaces becomes the previous one, so running this again rolls forward.
+
+    Raises:
+        Exception: If there is no previous generation or the swap fails.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}';")
+        cursor.execute("SELECT pg_advisory_xact_lock(%s);", (SWAP_LOCK_ID,))
+        if not _schema_exists(cursor, PREVIOUS_SCHEMA):
+            raise Exception(f"no previous generation in schema '{PREVIOUS_SCHEMA}'")
+        cursor.execute("CREATE SCHEMA listings_swap;")
+        _move_generation(cursor, 'public', 'listings_swap')
+        _move_generation(cursor, PREVIOUS_SCHEMA, 'public')
+        _move_generation(cursor, 'listings_swap', PREVIOUS_SCHEMA)
+        cursor.execute("DROP SCHEMA listings_swap;")
+        _exchange_watermarks(cursor, PREVIOUS_SCHEMA)
+        conn.commit()
+        print("Rolled back to the previous listing generation.")
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Error rolling back listing generation: {e}")
+    finally:
+        cursor.close()
+
+
+def get_generation_counts(conn):
+    """
+    Returns:
+        dict: schema -> number of listings, for each generation that exists.
+    """
+    counts = {}
+    cursor = conn.cursor()
+    try:
+        for schema in ['public', SHADOW_SCHEMA, PREVIOUS_SCHEMA]:
+            if _schema_exists(cursor, schema):
+                cursor.execute(f"SELECT COUNT(*) FROM {schema}.ebay_listings;")
+                counts[schema] = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        cursor.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Listing generations")
+    parser.add_argument('command', choices=['status', 'rollback'])
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    if conn is None:
+        exit(1)
+    try:
+        if args.command == 'rollback':
+            rollback_generation(conn)
+        labels = {'public': 'live', SHADOW_SCHEMA: 'building', PREVIOUS_SCHEMA: 'previous'}
+        for schema, count in get_generation_counts(conn).items():
+            print(f"  {labels[schema]:9} {schema:18} {count} listings")
+    except Exception as e:
+        print(e)
+        exit(1)
+    finally:
+        conn.close()
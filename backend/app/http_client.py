@@ -0,0 +1,120 @@
+import os # for .env file
+import threading
+from urllib.parse import urlparse
+import requests # for HTTP requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+# Pool size per host; sized to the item detail fetch concurrency of every marketplace scraped at once,
+# so every worker can keep its own connection open
+_MARKETPLACE_COUNT = len([m for m in os.getenv('EBAY_MARKETPLACES', 'EBAY_US').split(',') if m.strip()]) or 1
+POOL_MAXSIZE = int(os.getenv('DETAIL_FETCH_CONCURRENCY', '8')) * _MARKETPLACE_COUNT
+POOL_CONNECTIONS = 10 # Number of distinct hosts to keep pools for (eBay API, spot price feed, ...)
+CONNECT_TIMEOUT = 5 # seconds to establish a TCP+TLS connection
+READ_TIMEOUT = 20 # seconds to wait for a response once connected
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Per-host counters: requests sent and new connections opened (requests - connections = reused)
+_stats_lock = threading.Lock()
+_host_stats = {}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _record(host, key):
+    with _stats_lock:
+        stats = _host_stats.setdefault(host, {'requests': 0, 'connections': 0})
+        stats[key] += 1
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _record(self.host, 'connections')
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _record(self.host, 'connections')
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count every new connection they open."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+def _record_response(response, *args, **kwargs):
+    _record(urlparse(response.url).hostname, 'requests')
+
+
+def get_session():
+    """
+    Returns the process-wide keep-alive session, creating it on first use.
+    requests.Session is safe to share between the detail fetcher threads.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = PooledAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.hooks['response'].append(_record_response)
+                _session = session
+    return _session
+
+
+def http_get(url, **kwargs):
+    """GET through the shared session, with the default timeouts unless overridden."""
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    return get_session().get(url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    """POST through the shared session, with the default timeouts unless overridden."""
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    return get_session().post(url, **kwargs)
+
+
+def get_connection_stats():
+    """
+    Returns per-host connection reuse statistics.
+
+    Returns:
+        dict: host -> {'requests', 'connections', 'reused'} where 'reused' is the
+              number of requests that did not need a new TCP+TLS handshake.
+    """
+    with _stats_lock:
+        return {
+            host: {
+                'requests': stats['requests'],
+                'connections': stats['connections'],
+                'reused': max(stats['requests'] - stats['connections'], 0),
+            }
+            for host, stats in _host_stats.items()
+        }
+
+
+def print_connection_stats():
+    """Prints the per-host connection reuse statistics."""
+    stats = get_connection_stats()
+    if not stats:
+        print("No HTTP requests made.")
+        return
+    for host, host_stats in sorted(stats.items()):
+        reuse_percent = (host_stats['reused'] / host_stats['requests'] * 100) if host_stats['requests'] else 0
+        print(f"  {host}: {host_stats['requests']} requests, {host_stats['connections']} connections opened, "
+              f"{reuse_percent:.1f}% reused")
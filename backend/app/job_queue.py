@@ -0,0 +1,274 @@
+import psycopg2
+from psycopg2.extras import Json
+
+# --- Configuration ---
+JOB_MAX_ATTEMPTS = 5 # A job that failed this many times stays 'failed'
+JOB_RETRY_BASE_DELAY = 30 # seconds before the first retry; doubled on every further attempt
+JOB_RETRY_MAX_DELAY = 900 # seconds; cap for a single retry delay
+JOB_STALE_AFTER_SECONDS = 120 # A running job without a heartbeat for this long is handed to another worker
+JOB_HEARTBEAT_SECONDS = 20 # How often workers heartbeat the job they are working on
+JOB_RETENTION_DAYS = 14 # Jobs of a run are deleted this long after its last job finished
+
+# Job lifecycle: pending -> running -> done, or back to pending (retry / stale) until max_attempts, then failed
+
+
+def enqueue_jobs(conn, run_id, kind, jobs, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Adds jobs to the queue. Jobs whose dedupe_key is already queued (by any worker or run)
+    are skipped, so the same search page or item is never queued twice.
+
+    Args:
+        conn: The database connection object.
+        run_id (str): Scrape run the jobs belong to.
+        kind (str): Job type, e.g. 'search' or 'details'.
+        jobs (list): (dedupe_key, payload) tuples; dedupe_key may be None.
+        max_attempts (int): Attempts before a job is marked failed.
+
+    Returns:
+        int: Number of jobs actually added.
+    """
+    if conn is None or not jobs:
+        return 0
+
+    cursor = conn.cursor()
+    try:
+        added = 0
+        for dedupe_key, payload in jobs:
+            cursor.execute("""
+                INSERT INTO scrape_jobs (run_id, kind, dedupe_key, payload, max_attempts)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (dedupe_key) DO NOTHING;
+            """, (run_id, kind, dedupe_key, Json(payload), max_attempts))
+            added += cursor.rowcount
+        conn.commit()
+        return added
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error enqueuing {kind} jobs: {e}")
+    finally:
+        cursor.close()
+
+
+def reserve_items(conn, run_id, item_ids, search_job_key, gate_version):
+    """
+    Reserves items for a detail fetch in this run. Items already stored, already gated by the
+    current rules (gate_version) or already reserved by another search job are left out, so each
+    item is fetched once per run even when several search pages (keywords, bands, marketplaces)
+    return it. Items reserved by the same search job are returned again, so a retried job picks
+    up where it failed.
+
+    Returns:
+        set: The item IDs this call reserved.
+    """
+    if conn is None or not item_ids:
+        return set()
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO scrape_job_items (run_id, item_id, search_job_key)
+            SELECT %s, candidate.item_id, %s FROM unnest(%s::text[]) AS candidate(item_id)
+            WHERE NOT EXISTS (SELECT 1 FROM ebay_listings WHERE ebay_listings.item_id = candidate.item_id)
+                AND NOT EXISTS (SELECT 1 FROM gated_listings WHERE gated_listings.item_id = candidate.item_id
+                                AND gated_listings.gate_version = %s)
+            ON CONFLICT (run_id, item_id) DO UPDATE SET search_job_key = EXCLUDED.search_job_key
+                WHERE scrape_job_items.search_job_key = EXCLUDED.search_job_key
+            RETURNING item_id;
+        """, (run_id, search_job_key, list(item_ids), gate_version))
+        reserved = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+        return reserved
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error reserving items: {e}")
+    finally:
+        cursor.close()
+
+
+def claim_job(conn, worker_id, kinds=None):
+    """
+    Claims the oldest available pending job. Rows locked by other workers are skipped
+    (FOR UPDATE SKIP LOCKED), so any number of workers can claim concurrently without
+    blocking each other or getting the same job.
+
+    Args:
+        conn: The database connection object.
+        worker_id (str): Identifies the claiming worker (host:pid).
+        kinds (list): Only claim jobs of these kinds; None for any.
+
+    Returns:
+        tuple: (job_id, run_id, kind, payload, attempts), or None if nothing is available.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE scrape_jobs
+            SET status = 'running', worker_id = %s, attempts = attempts + 1,
+                heartbeat_at = NOW(), updated_at = NOW()
+            WHERE job_id = (
+                SELECT job_id FROM scrape_jobs
+                WHERE status = 'pending' AND available_at <= NOW()
+                    AND (%s::text[] IS NULL OR kind = ANY(%s::text[]))
+                ORDER BY job_id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING job_id, run_id, kind, payload, attempts;
+        """, (worker_id, kinds, kinds))
+        job = cursor.fetchone()
+        conn.commit()
+        return job
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error claiming job: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def heartbeat_job(conn, job_id, worker_id):
+    """
+    Marks a running job as still alive.
+
+    Returns:
+        bool: False if the job is no longer ours (it went stale and was handed to another worker).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE scrape_jobs SET heartbeat_at = NOW()
+            WHERE job_id = %s AND worker_id = %s AND status = 'running';
+        """, (job_id, worker_id))
+        conn.commit()
+        return cursor.rowcount == 1
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error heartbeating job {job_id}: {e}")
+        return True # Can't tell; keep working
+    finally:
+        cursor.close()
+
+
+def complete_job(conn, job_id, worker_id):
+    """Marks a job done."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE scrape_jobs SET status = 'done', last_error = NULL, updated_at = NOW()
+            WHERE job_id = %s AND worker_id = %s;
+        """, (job_id, worker_id))
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error completing job {job_id}: {e}")
+    finally:
+        cursor.close()
+
+
+def fail_job(conn, job_id, worker_id, error):
+    """
+    Records a failed attempt. The job is retried after an exponential delay, or marked
+    failed once it has used up its attempts.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE scrape_jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                available_at = NOW() + LEAST(%s * POWER(2, attempts - 1), %s) * INTERVAL '1 second',
+                last_error = %s, worker_id = NULL, updated_at = NOW()
+            WHERE job_id = %s AND worker_id = %s;
+        """, (JOB_RETRY_BASE_DELAY, JOB_RETRY_MAX_DELAY, str(error)[:2000], job_id, worker_id))
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error recording failure of job {job_id}: {e}")
+    finally:
+        cursor.close()
+
+
+def requeue_stale_jobs(conn, stale_after=JOB_STALE_AFTER_SECONDS):
+    """
+    Hands running jobs whose worker stopped heartbeating (crashed, killed, lost its network)
+    back to the queue, or marks them failed once they have used up their attempts.
+
+    Returns:
+        int: Number of jobs requeued or failed.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE scrape_jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                last_error = 'worker ' || COALESCE(worker_id, '?') || ' stopped heartbeating',
+                worker_id = NULL, available_at = NOW(), updated_at = NOW()
+            WHERE status = 'running' AND heartbeat_at < NOW() - %s * INTERVAL '1 second';
+        """, (stale_after,))
+        conn.commit()
+        if cursor.rowcount:
+            print(f"Requeued {cursor.rowcount} stale jobs")
+        return cursor.rowcount
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error requeuing stale jobs: {e}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def get_job_counts(conn, run_id=None):
+    """
+    Returns job counts per kind and status, e.g. {('search', 'done'): 120, ...}.
+
+    Args:
+        conn: The database connection object.
+        run_id (str): Only count jobs of this run; None for all runs.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT kind, status, COUNT(*) FROM scrape_jobs
+            WHERE %s::text IS NULL OR run_id = %s
+            GROUP BY kind, status;
+        """, (run_id, run_id))
+        return {(kind, status): count for kind, status, count in cursor.fetchall()}
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error counting jobs: {e}")
+        return {}
+    finally:
+        cursor.close()
+
+
+def prune_jobs(conn, older_than_days=JOB_RETENTION_DAYS):
+    """
+    Deletes the jobs and item reservations of runs that finished (no job pending or running)
+    more than older_than_days ago, so scrape_jobs and scrape_job_items don't grow forever.
+
+    Returns:
+        int: Number of jobs deleted.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            WITH finished_runs AS (
+                SELECT run_id FROM scrape_jobs
+                GROUP BY run_id
+                HAVING BOOL_AND(status IN ('done', 'failed'))
+                    AND MAX(updated_at) < NOW() - %s * INTERVAL '1 day'
+            ), deleted_items AS (
+                DELETE FROM scrape_job_items WHERE run_id IN (SELECT run_id FROM finished_runs)
+            )
+            DELETE FROM scrape_jobs WHERE run_id IN (SELECT run_id FROM finished_runs);
+        """, (older_than_days,))
+        deleted = cursor.rowcount
+        conn.commit()
+        if deleted:
+            print(f"Pruned {deleted} jobs of runs finished over {older_than_days} days ago")
+        return deleted
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error pruning jobs: {e}")
+        return 0
+    finally:
+        cursor.close()
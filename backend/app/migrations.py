@@ -0,0 +1,306 @@
+"""
+Versioned schema migrations, applied on top of the tables create_tables() sets up.
+
+Each migration runs once, in its own transaction, and is recorded in schema_migrations.
+A Postgres advisory lock serializes runners, so several processes starting at once
+(run.py, scrape workers) apply each migration exactly once. Never edit a migration that
+has shipped; add a new one instead.
+
+Run from the backend directory:
+    python -m app.migrations             # apply pending migrations
+    python -m app.migrations status      # list applied and pending migrations
+    python -m app.migrations explain     # check the listings feed queries use the feed indexes
+"""
+import argparse
+import json
+import psycopg2
+from app.database import connect_to_db, create_tables, LISTING_SORT_ORDERS, build_listings_query, build_keyset_query
+
+MIGRATIONS_LOCK_ID = 727_001 # pg_advisory_lock key held while migrations are applied
+
+# (version, name, statements). Statements run in order inside one transaction.
+MIGRATIONS = [
+    (1, 'listings_profit_pct', [
+        # Profit as a percentage of price, stored so the feed filter and its indexes don't
+        # recompute it per row (and a zero price yields NULL instead of a division error)
+        """
+        ALTER TABLE ebay_listings ADD COLUMN IF NOT EXISTS profit_pct DECIMAL
+            GENERATED ALWAYS AS (CASE WHEN price > 0 THEN profit / price * 100 END) STORED
+        """,
+    ]),
+    (2, 'listing_feed_view', [
+        # Denormalized feed the API reads: only the rows it can show, with profit_pct and the
+        # frontend's listing JSON precomputed. Refreshed at the end of every pipeline run
+        # (refresh_listing_feed), concurrently, so readers never block.
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS listing_feed AS
+        SELECT
+            item_id, price, profit, melt_value, scam_risk_score, seller_feedback_score,
+            profit_pct, returns_accepted,
+            jsonb_build_object(
+                'id', item_id,
+                'title', title,
+                'description', COALESCE(description, ''),
+                'images', jsonb_build_array(COALESCE(image_url, 'https://via.placeholder.com/300x200')),
+                'price', price::float8,
+                'currency', currency,
+                'sellerUsername', seller_username,
+                'sellerFeedbackScore', seller_feedback_score,
+                'feedbackPercent', COALESCE(feedback_percent, 0)::float8,
+                'ebayUrl', item_url,
+                'topRatedBuyingExperience', top_rated_buying_experience,
+                'returnsAccepted', returns_accepted,
+                'weight', COALESCE(weight, 0)::float8,
+                'purity', COALESCE(purity, 0),
+                'meltValue', COALESCE(melt_value, 0)::float8,
+                'profit', COALESCE(profit, 0)::float8,
+                'profitPct', profit_pct::float8,
+                'scamRisk', COALESCE(NULLIF(scam_risk_score, 0), 5),
+                'scamRiskExplanation', COALESCE(scam_risk_score_explanation, '')
+            ) AS listing
+        FROM ebay_listings
+        WHERE is_gold = TRUE AND weight IS NOT NULL AND purity IS NOT NULL AND melt_value IS NOT NULL
+            AND profit IS NOT NULL AND profit_pct <= 10
+        """,
+        # REFRESH ... CONCURRENTLY needs a unique index
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_listing_feed_item_id ON listing_feed (item_id)",
+        "CREATE INDEX IF NOT EXISTS idx_listing_feed_profit ON listing_feed (profit, item_id)",
+        "CREATE INDEX IF NOT EXISTS idx_listing_feed_price ON listing_feed (price, item_id)",
+        "CREATE INDEX IF NOT EXISTS idx_listing_feed_melt_value ON listing_feed (melt_value, item_id)",
+        "CREATE INDEX IF NOT EXISTS idx_listing_feed_scam_risk ON listing_feed (scam_risk_score, item_id)",
+        "CREATE INDEX IF NOT EXISTS idx_listing_feed_seller_feedback ON listing_feed (seller_feedback_score, item_id)",
+    ]),
+    (3, 'jsonb_specifics_and_shipping', [
+        # JSONB is stored parsed, so it can be indexed and filtered without re-parsing every row
+        "ALTER TABLE ebay_listings ALTER COLUMN item_specifics TYPE JSONB USING item_specifics::jsonb",
+        "ALTER TABLE ebay_listings ALTER COLUMN shipping_options TYPE JSONB USING shipping_options::jsonb",
+        # The feed gains item_specifics and the cheapest shipping option in the listing's currency
+        # (options quoted in the marketplace currency are converted at the listing's own rate)
+        "DROP MATERIALIZED VIEW IF EXISTS listing_feed",
+        """
+        CREATE MATERIALIZED VIEW listing_feed AS
+        SELECT
+            item_id, price, profit, melt_value, scam_risk_score, seller_feedback_score,
+            profit_pct, returns_accepted, item_specifics, shipping_cost,
+            jsonb_build_object(
+                'id', item_id,
+                'title', title,
+                'description', COALESCE(description, ''),
+                'images', jsonb_build_array(COALESCE(image_url, 'https://via.placeholder.com/300x200')),
+                'price', price::float8,
+                'currency', currency,
+                'shippingCost', shipping_cost::float8,
+                'sellerUsername', seller_username,
+                'sellerFeedbackScore', seller_feedback_score,
+                'feedbackPercent', COALESCE(feedback_percent, 0)::float8,
+                'ebayUrl', item_url,
+                'topRatedBuyingExperience', top_rated_buying_experience,
+                'returnsAccepted', returns_accepted,
+                'weight', COALESCE(weight, 0)::float8,
+                'purity', COALESCE(purity, 0),
+                'meltValue', COALESCE(melt_value, 0)::float8,
+                'profit', COALESCE(profit, 0)::float8,
+                'profitPct', profit_pct::float8,
+                'scamRisk', COALESCE(NULLIF(scam_risk_score, 0), 5),
+                'scamRiskExplanation', COALESCE(scam_risk_score_explanation, '')
+            ) AS listing
+        FROM (
+            SELECT
+                ebay_listings.*,
+                (
+                    SELECT MIN(CASE
+                        WHEN shipping_option->'shippingCost'->>'currency' = currency
+                            THEN (shipping_option->'shippingCost'->>'value')::numeric
+                        WHEN shipping_option->'shippingCost'->>'currency' = original_currency AND original_price > 0
+                            THEN (shipping_option->'shippingCost'->>'value')::numeric * price / original_price
+                    END)
+                    FROM jsonb_array_elements(
+                        CASE WHEN jsonb_typeof(shipping_options) = 'array' THEN shipping_options ELSE '[]'::jsonb END
+                    ) AS shipping_option
+                ) AS shipping_cost
+            FROM ebay_listings
+        ) AS listing_row
+        WHERE is_gold = TRUE AND weight IS NOT NULL AND purity IS NOT NULL AND melt_value IS NOT NULL
+            AND profit IS NOT NULL AND profit_pct <= 10
+        """,
+        "CREATE UNIQUE INDEX idx_listing_feed_item_id ON listing_feed (item_id)",
+        "CREATE INDEX idx_listing_feed_profit ON listing_feed (profit, item_id)",
+        "CREATE INDEX idx_listing_feed_price ON listing_feed (price, item_id)",
+        "CREATE INDEX idx_listing_feed_melt_value ON listing_feed (melt_value, item_id)",
+        "CREATE INDEX idx_listing_feed_scam_risk ON listing_feed (scam_risk_score, item_id)",
+        "CREATE INDEX idx_listing_feed_seller_feedback ON listing_feed (seller_feedback_score, item_id)",
+        # jsonb_ops (not jsonb_path_ops) so key-only filters (?) can use it as well as @>
+        "CREATE INDEX idx_listing_feed_item_specifics ON listing_feed USING GIN (item_specifics)",
+        "CREATE INDEX idx_listing_feed_shipping_cost ON listing_feed (shipping_cost)",
+    ]),
+    (4, 'listing_snapshots', [
+        # Append-only price history, one row per listing per capture (app/snapshots.py). Monthly
+        # partitions are created ahead of each capture and dropped whole once past retention.
+        """
+        CREATE TABLE IF NOT EXISTS listing_snapshots (
+            item_id VARCHAR(255) NOT NULL,
+            captured_at TIMESTAMPTZ NOT NULL,
+            run_id TEXT,
+            price DECIMAL NOT NULL,
+            currency VARCHAR(10) NOT NULL,
+            original_price DECIMAL,
+            original_currency VARCHAR(10),
+            melt_value DECIMAL,
+            profit DECIMAL,
+            scam_risk_score INTEGER
+        ) PARTITION BY RANGE (captured_at)
+        """,
+        # Created on every partition; serves an item's timeline and its latest snapshot
+        "CREATE INDEX IF NOT EXISTS idx_listing_snapshots_item ON listing_snapshots (item_id, captured_at)",
+    ]),
+    (5, 'ai_processed_listings_without_fk', [
+        # Full runs swap ebay_listings for a new table (app/generations.py); the foreign key would
+        # follow the replaced table into listings_previous and be dropped with it by a later swap
+        "ALTER TABLE ai_processed_listings DROP CONSTRAINT IF EXISTS ai_processed_listings_ebay_item_id_fkey",
+    ]),
+]
+
+# Index each sort order of the feed is expected to use
+FEED_SORT_INDEXES = {
+    'profit': 'idx_listing_feed_profit',
+    'price': 'idx_listing_feed_price',
+    'melt_value': 'idx_listing_feed_melt_value',
+    'scam_risk_score': 'idx_listing_feed_scam_risk',
+    'seller_feedback_score': 'idx_listing_feed_seller_feedback',
+}
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def get_applied_versions(conn):
+    """Returns the set of migration versions already applied."""
+    cursor = conn.cursor()
+    try:
+        _ensure_migrations_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations;")
+        versions = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+        return versions
+    finally:
+        cursor.close()
+
+
+def apply_migrations(conn):
+    """
+    Applies pending migrations in version order. Stops at the first failing migration,
+    which is rolled back, and raises.
+
+    Returns:
+        list: Versions applied by this call.
+    """
+    applied_now = []
+    cursor = conn.cursor()
+    try:
+        _ensure_migrations_table(cursor)
+        conn.commit()
+        cursor.execute("SELECT pg_advisory_lock(%s);", (MIGRATIONS_LOCK_ID,))
+        try:
+            cursor.execute("SELECT version FROM schema_migrations;")
+            applied = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+            for version, name, statements in sorted(MIGRATIONS):
+                if version in applied:
+                    continue
+                try:
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+                    conn.commit()
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    raise Exception(f"Migration {version} ({name}) failed: {e}")
+                applied_now.append(version)
+                print(f"Applied migration {version}: {name}")
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s);", (MIGRATIONS_LOCK_ID,))
+            conn.commit()
+    finally:
+        cursor.close()
+    return applied_now
+
+
+def _index_names(plan):
+    """Names of every index a JSON EXPLAIN plan node (or its children) scans."""
+    names = set()
+    if plan.get('Index Name'):
+        names.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        names |= _index_names(child)
+    return names
+
+
+def check_feed_index_usage(conn, force=True):
+    """
+    EXPLAINs the listings feed queries (offset page and keyset page after a cursor) for every
+    sort order and checks they scan the expected feed index.
+
+    Args:
+        conn: The database connection object.
+        force (bool): Disable sequential scans while explaining. On a small table the planner
+                      rightly prefers a sequential scan, which would hide a missing or unusable
+                      index; forcing checks that the index can serve the query.
+
+    Returns:
+        dict: (sort_by, 'offset' or 'keyset') -> (expected index, indexes used, ok)
+    """
+    results = {}
+    cursor = conn.cursor()
+    try:
+        if force:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+        for sort_by, order_clause in LISTING_SORT_ORDERS.items():
+            column, direction = order_clause.split()
+            expected = FEED_SORT_INDEXES[column]
+            _, offset_query, params = build_listings_query(sort_by=sort_by)
+            keyset_query, keyset_params = build_keyset_query(column, direction, "", after=('0', ''))
+            for mode, query, query_params in [('offset', offset_query, params + [20, 0]), ('keyset', keyset_query, keyset_params + [21])]:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", query_params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used = _index_names(plan[0]['Plan'])
+                results[(sort_by, mode)] = (expected, used, expected in used)
+    finally:
+        conn.rollback() # Drops the SET LOCAL
+        cursor.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schema migrations")
+    parser.add_argument('command', nargs='?', default='apply', choices=['apply', 'status', 'explain'])
+    parser.add_argument('--no-force', action='store_true', help="explain: let the planner choose sequential scans")
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    if conn is None:
+        exit(1)
+    if args.command == 'apply':
+        create_tables(conn)
+        applied = apply_migrations(conn)
+        print(f"{len(applied)} migrations applied" if applied else "Schema is up to date")
+    elif args.command == 'status':
+        applied = get_applied_versions(conn)
+        for version, name, _ in sorted(MIGRATIONS):
+            print(f"  {version:4} {name:30} {'applied' if version in applied else 'pending'}")
+    else:
+        failed = 0
+        for (sort_by, mode), (expected, used, ok) in check_feed_index_usage(conn, force=not args.no_force).items():
+            failed += not ok
+            print(f"  {'OK  ' if ok else 'FAIL'} {sort_by:22} {mode:7} expected {expected}, plan uses {', '.join(sorted(used)) or 'no index'}")
+        conn.close()
+        exit(1 if failed else 0)
+    conn.close()
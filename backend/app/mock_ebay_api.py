@@ -0,0 +1,282 @@
+"""
+Local stand-in for the eBay OAuth token and Browse API endpoints, for offline benchmarks and load tests.
+
+Modes:
+    mock    Generates deterministic listings (default).
+    record  Proxies requests to the real eBay API and saves every response as a fixture.
+    replay  Serves previously recorded fixtures without touching the network.
+
+Point the scraper at it with EBAY_API_BASE_URL (and FX_RATES_URL for other marketplaces), e.g.:
+    python -m app.mock_ebay_api --port 8089 --latency 0.2 --error-rate 0.05 --results 2000
+    EBAY_API_BASE_URL=http://127.0.0.1:8089 FX_RATES_URL=http://127.0.0.1:8089/fx/latest python run.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+TOKEN_PATH = '/identity/v1/oauth2/token'
+SEARCH_PATH = '/buy/browse/v1/item_summary/search'
+ITEM_PATH = '/buy/browse/v1/item/'
+FX_PATH = '/fx/latest' # Stand-in for the exchange rate feed, so multi-marketplace runs stay offline
+MOCK_FX_RATES = {'USD': 1.0, 'GBP': 0.79, 'EUR': 0.92, 'AUD': 1.52, 'CAD': 1.36}
+UPSTREAM_BASE_URL = 'https://api.ebay.com'
+FORWARDED_HEADERS = ('Authorization', 'Content-Type', 'Accept', 'X-EBAY-C-MARKETPLACE-ID', 'X-EBAY-C-ENDUSERCTX')
+
+PURITIES = ['10k', '14k', '18k', '22k']
+ITEM_TYPES = ['ring', 'chain', 'bracelet', 'earrings', 'pendant', 'scrap lot']
+NON_SOLID = ['gold plated', 'gold filled', 'gold tone', 'GF'] # Titles the summary gate should reject
+NON_SOLID_SHARE = 0.25
+OFFSET_CAP = 10000 # Like eBay, refuse to page past this many results
+PRICE_FILTER = re.compile(r"price:\[([\d.]*)\.\.([\d.]*)\]")
+
+
+def mock_price(query, index):
+    """Deterministic price of result number index for a search query (mostly cheap, a long tail of expensive)."""
+    return round(min(random.Random(f"{query}|{index}|price").lognormvariate(5, 1.2), 100000), 2)
+
+
+@lru_cache(maxsize=32)
+def mock_result_prices(query, results):
+    """Prices of every result for a query, so price filters can be applied without building summaries."""
+    return [mock_price(query, index) for index in range(results)]
+
+
+def mock_summary(query, index, newest, currency='USD'):
+    """Deterministic item summary number index (0 = newest) for a search query."""
+    rng = random.Random(f"{query}|{index}")
+    query_id = int(hashlib.sha1(query.encode()).hexdigest(), 16) % 10**6
+    item_id = f"v1|{query_id:06d}{index:06d}|0"
+    purity = rng.choice(PURITIES)
+    material = rng.choice(NON_SOLID) if rng.random() < NON_SOLID_SHARE else 'yellow gold'
+    return {
+        'itemId': item_id,
+        'title': f"{purity} {material} {rng.choice(ITEM_TYPES)} {rng.randint(1, 30)}g",
+        'price': {'value': f"{mock_price(query, index):.2f}", 'currency': currency},
+        'seller': {'username': f"seller_{rng.randint(1, 500)}", 'feedbackScore': rng.randint(0, 20000),
+                   'feedbackPercentage': f"{rng.uniform(90, 100):.1f}"},
+        'image': {'imageUrl': f"https://i.ebayimg.example/{index}.jpg"},
+        'itemWebUrl': f"https://www.ebay.com/itm/{index}",
+        'shippingOptions': [{'shippingCostType': 'FIXED', 'shippingCost': {'value': '5.00', 'currency': 'USD'}}],
+        'topRatedBuyingExperience': rng.random() < 0.3,
+        'itemCreationDate': (newest - timedelta(minutes=7 * index)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+    }
+
+
+def mock_item(item_id):
+    """Deterministic getItem payload for an item ID."""
+    rng = random.Random(item_id)
+    purity = rng.choice(PURITIES)
+    return {
+        'itemId': item_id,
+        'description': f"<p>Solid {purity} gold, {rng.randint(1, 30)} grams. Not plated.</p>",
+        'returnTerms': {'returnsAccepted': rng.random() < 0.5},
+        'localizedAspects': [
+            {'name': 'Metal', 'value': 'Yellow Gold'},
+            {'name': 'Metal Purity', 'value': purity},
+            {'name': 'Total Carat Weight', 'value': f"{rng.uniform(1, 30):.1f} g"},
+            {'name': 'Type', 'value': rng.choice(ITEM_TYPES)},
+        ],
+    }
+
+
+def fixture_key(method, path, query):
+    """Stable fixture file name for a request, ignoring credentials."""
+    canonical = json.dumps([method, path, sorted((k, v) for k, values in query.items() for v in values)])
+    return hashlib.sha1(canonical.encode()).hexdigest() + '.json'
+
+
+def make_handler(config, stats):
+    class MockEbayHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive, like the real API
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def count(self, endpoint):
+            with stats['lock']:
+                stats[endpoint] = stats.get(endpoint, 0) + 1
+
+        def simulate_network(self):
+            """Sleeps for the configured latency; returns True if this request should fail."""
+            if config['latency']:
+                time.sleep(max(0, random.gauss(config['latency'], config['latency'] * 0.1)))
+            if config['error_rate'] and random.random() < config['error_rate']:
+                self.count('errors')
+                if random.random() < 0.5:
+                    self.send_json(429, {'errors': [{'message': 'Too many requests'}]}, {'Retry-After': '1'})
+                else:
+                    self.send_json(503, {'errors': [{'message': 'Service unavailable'}]})
+                return True
+            return False
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            url = urlparse(self.path)
+            if url.path != TOKEN_PATH:
+                return self.send_json(404, {'errors': [{'message': 'Not found'}]})
+            self.count('token')
+            if config['mode'] == 'record':
+                # Real tokens are passed through but never written to fixtures
+                return self.proxy('POST', url, save=False, body=body)
+            self.send_json(200, {'access_token': f"mock-token-{int(time.time())}",
+                                 'expires_in': config['token_ttl'], 'token_type': 'Application Access Token'})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == FX_PATH:
+                self.count('fx')
+                return self.send_json(200, {'result': 'success', 'base_code': 'USD', 'rates': MOCK_FX_RATES})
+            endpoint = 'search' if url.path == SEARCH_PATH else 'items' if 'item_ids' in query else 'item'
+            self.count(endpoint)
+
+            if config['mode'] == 'record':
+                return self.proxy('GET', url, save=True)
+            if config['mode'] == 'replay':
+                return self.replay('GET', url, query)
+            if self.simulate_network():
+                return
+
+            if url.path == SEARCH_PATH:
+                return self.search(query)
+            if url.path.startswith(ITEM_PATH):
+                if 'item_ids' in query:
+                    item_ids = query['item_ids'][0].split(',')
+                    return self.send_json(200, {'items': [mock_item(item_id) for item_id in item_ids]})
+                return self.send_json(200, mock_item(unquote(url.path[len(ITEM_PATH):])))
+            self.send_json(404, {'errors': [{'message': 'Not found'}]})
+
+        def search(self, query):
+            from app.ebay_search import MARKETPLACES, MARKETPLACE_ID
+            marketplace_id = self.headers.get('X-EBAY-C-MARKETPLACE-ID') or MARKETPLACE_ID
+            currency = MARKETPLACES.get(marketplace_id, MARKETPLACES[MARKETPLACE_ID])['currency']
+            # Each marketplace has its own listings
+            q = query.get('q', [''])[0]
+            if marketplace_id != MARKETPLACE_ID:
+                q = f"{marketplace_id}|{q}"
+            limit = int(query.get('limit', ['50'])[0])
+            offset = int(query.get('offset', ['0'])[0])
+            if offset + limit > config['offset_cap']:
+                return self.send_json(400, {'errors': [{'errorId': 12023, 'message': f"offset + limit must not exceed {config['offset_cap']}"}]})
+
+            # Results are ordered newest first; a price filter keeps that order
+            indexes = range(config['results'])
+            band = PRICE_FILTER.search(query.get('filter', [''])[0])
+            if band:
+                low = float(band.group(1)) if band.group(1) else 0
+                high = float(band.group(2)) if band.group(2) else float('inf')
+                prices = mock_result_prices(q, config['results'])
+                indexes = [index for index in indexes if low <= prices[index] <= high]
+            total = len(indexes)
+            summaries = [mock_summary(q, index, config['newest'], currency) for index in indexes[offset:offset + limit]]
+            self.send_json(200, {'total': total, 'limit': limit, 'offset': offset, 'itemSummaries': summaries})
+
+        def proxy(self, method, url, save, body=None):
+            from app.http_client import get_session
+            headers = {name: self.headers[name] for name in FORWARDED_HEADERS if self.headers.get(name)}
+            upstream = get_session().request(method, config['upstream'] + url.path + ('?' + url.query if url.query else ''),
+                                             headers=headers, data=body, timeout=30)
+            try:
+                payload = upstream.json()
+            except ValueError:
+                payload = {'errors': [{'message': upstream.text}]}
+            if save and upstream.status_code == 200:
+                path = os.path.join(config['fixtures'], fixture_key(method, url.path, parse_qs(url.query)))
+                with open(path, 'w') as f:
+                    json.dump({'status': upstream.status_code, 'body': payload}, f)
+            self.send_json(upstream.status_code, payload)
+
+        def replay(self, method, url, query):
+            path = os.path.join(config['fixtures'], fixture_key(method, url.path, query))
+            if not os.path.exists(path):
+                self.count('replay_misses')
+                return self.send_json(404, {'errors': [{'message': f"No recorded fixture for {url.path}?{url.query}"}]})
+            if config['latency']:
+                time.sleep(config['latency'])
+            with open(path) as f:
+                fixture = json.load(f)
+            self.send_json(fixture['status'], fixture['body'])
+
+        def log_message(self, format, *args):
+            if config['verbose']:
+                super().log_message(format, *args)
+
+    return MockEbayHandler
+
+
+def start_mock_server(port=0, mode='mock', latency=0.0, error_rate=0.0, results=1000, token_ttl=7200,
+                      fixtures='fixtures', upstream=UPSTREAM_BASE_URL, verbose=False, offset_cap=OFFSET_CAP):
+    """
+    Starts the mock API on a background thread.
+
+    Returns:
+        tuple: (server, base_url, stats). stats counts requests per endpoint; call
+               server.shutdown() to stop it.
+    """
+    if mode in ('record', 'replay'):
+        os.makedirs(fixtures, exist_ok=True)
+    config = {
+        'mode': mode, 'latency': latency, 'error_rate': error_rate, 'results': results, 'token_ttl': token_ttl,
+        'fixtures': fixtures, 'upstream': upstream.rstrip('/'), 'verbose': verbose, 'offset_cap': offset_cap,
+        'newest': datetime.now(timezone.utc).replace(microsecond=0),
+    }
+    stats = {'lock': threading.Lock()}
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(config, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", stats
+
+
+def point_scraper_at(base_url):
+    """Redirects the already-imported ebay_search and fx_rates URLs to base_url (for in-process benchmarks)."""
+    import app.ebay_search as ebay_search
+    import app.fx_rates as fx_rates
+    fx_rates.FX_RATES_URL = base_url + FX_PATH
+    ebay_search.TOKEN_URL = base_url + TOKEN_PATH
+    ebay_search.SEARCH_API_URL = base_url + SEARCH_PATH
+    ebay_search.ITEM_DETAILS_BASE_URL = base_url + ITEM_PATH
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the eBay token and Browse API endpoints")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--mode', choices=['mock', 'record', 'replay'], default='mock')
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 429/503")
+    parser.add_argument('--results', type=int, default=1000, help="Total search results per keyword")
+    parser.add_argument('--offset-cap', type=int, default=OFFSET_CAP, help="Deepest offset + limit a search may page to")
+    parser.add_argument('--token-ttl', type=int, default=7200, help="expires_in of issued tokens, in seconds")
+    parser.add_argument('--fixtures', default='fixtures', help="Fixture directory for record/replay")
+    parser.add_argument('--upstream', default=UPSTREAM_BASE_URL, help="Real API base URL for record mode")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args()
+
+    server, base_url, stats = start_mock_server(
+        port=args.port, mode=args.mode, latency=args.latency, error_rate=args.error_rate, results=args.results,
+        token_ttl=args.token_ttl, fixtures=args.fixtures, upstream=args.upstream, verbose=args.verbose,
+        offset_cap=args.offset_cap
+    )
+    print(f"Mock eBay API ({args.mode}) listening on {base_url}")
+    print(f"Run the scraper with EBAY_API_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("Requests served:", {k: v for k, v in stats.items() if k != 'lock'})
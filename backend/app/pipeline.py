@@ -0,0 +1,304 @@
+import queue
+import threading
+import time
+from app.database import connect_to_db, insert_listings_bulk
+from app.generations import use_shadow_generation
+from app.scraper import scrape_listings
+from app.checkpoints import save_scrape_checkpoints
+from app.zero_shot_classifier import classify_listing
+from app.extract_metadata import extract_weight_and_purity
+from app.calculate_profit import calculate_profit, get_gold_price_per_gram
+
+# --- Configuration ---
+PIPELINE_QUEUE_SIZE = 200 # Max listings waiting in front of each stage; a full queue blocks the stage before it
+WRITE_BATCH_SIZE = 100 # Listings written per batch (or fewer when the write queue runs dry)
+STOP_POLL_SECONDS = 0.5 # How often a blocked queue operation checks whether a stage has died
+
+# Stage order: each stage reads its own queue and feeds the next one
+STAGES = ['classify', 'extract', 'profit', 'write']
+_DONE = object() # End-of-stream marker passed down the stages
+
+
+class _PipelineStopped(Exception):
+    """Raised in place of a queue operation that would block forever because a stage died."""
+
+
+class _Checkpoint:
+    """Scrape checkpoint passed down the stages behind the listings it covers; saved once they are written."""
+    def __init__(self, data):
+        self.data = data
+
+
+def _listing_row(item):
+    """The (item_id, title, description, metal, total_carat_weight, metal_purity) row the classifier and extractor expect."""
+    return (item['item_id'], item['title'], item.get('description') or '', item.get('metal'),
+            item.get('total_carat_weight'), item.get('metal_purity'))
+
+
+def classify_item(item):
+    item['is_gold'] = classify_listing(_listing_row(item))
+
+
+def extract_item(item):
+    if not item.get('is_gold'):
+        return
+    weight, purity = extract_weight_and_purity(_listing_row(item))
+    if weight and purity and weight > 0 and 0 < purity <= 24:
+        item['weight'], item['purity'] = weight, purity
+
+
+def make_profit_stage(gold_price):
+    def profit_item(item):
+        if gold_price is None or not item.get('is_gold') or not item.get('weight') or not item.get('purity'):
+            return
+        melt_value, profit = calculate_profit((item['item_id'], item['price'], item['weight'], item['purity']), gold_price)
+        if melt_value is not None and profit is not None:
+            item['melt_value'], item['profit'] = melt_value, profit
+    return profit_item
+
+
+class _StageStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def sample_depth(self, depth):
+        with self.lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def record(self, items, seconds):
+        with self.lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+
+def run_pipeline(conn, access_token, keywords, marketplace_ids, max_items_per_keyword, filter_str=None, incremental=False, run_id=None, shadow=False):
+    """
+    Scrapes listings and streams them through classification, metadata extraction and profit
+    calculation as they arrive, instead of running each stage over the whole table afterwards.
+
+    The scraper (this thread) feeds a bounded queue per stage; each stage runs on its own thread
+    and hands listings to the next, and the last stage writes them in batches on a separate
+    database connection. Full queues block the stage in front of them, so memory stays bounded.
+    Scam risk scoring still runs afterwards, since it batches listings into LLM prompts.
+
+    If a stage thread dies (e.g. the writer loses its database connection), the scraper and
+    the other stages stop instead of blocking on its queue, and the stage's error is raised.
+
+    Args:
+        conn: The database connection object (used by the scraper for dedupe and watermarks).
+        access_token (str): eBay OAuth access token.
+        keywords (list): Search keywords to scrape.
+        marketplace_ids (str or list): eBay marketplace ID(s) to scrape concurrently.
+        max_items_per_keyword (int): Stop a keyword after this many new items; None for no cap.
+        filter_str (str): Optional Browse API filter string.
+        incremental (bool): Only scrape listings newer than each keyword's watermark.
+        run_id (str): Pipeline run to checkpoint scrape progress under; checkpoints are saved
+                      only after the listings before them have been written, and not at all
+                      for a keyword whose listings failed to insert.
+        shadow (bool): Write into the shadow generation a full run is building (see
+                       app/generations.py); conn must already be pointed at it.
+
+    Returns:
+        dict: Scraper statistics plus 'items_written', 'deals_found', 'time_to_first_deal'
+              (seconds, or None) and per-stage statistics under 'stages'.
+    """
+    write_conn = connect_to_db()
+    if write_conn is None:
+        raise Exception("Pipeline writer could not connect to the database")
+    if shadow:
+        use_shadow_generation(write_conn)
+
+    gold_price = get_gold_price_per_gram()
+    if gold_price is None:
+        print("Warning: no gold price available; profit will be calculated after the pipeline.")
+
+    queues = {name: queue.Queue(maxsize=PIPELINE_QUEUE_SIZE) for name in STAGES}
+    stage_stats = {name: _StageStats() for name in STAGES}
+    processors = {'classify': classify_item, 'extract': extract_item, 'profit': make_profit_stage(gold_price)}
+    result = {'items_written': 0, 'deals_found': 0, 'time_to_first_deal': None}
+    pipeline_start = time.perf_counter()
+
+    stop = threading.Event() # Set when a stage dies; every blocked queue operation gives up
+    unstored_lock = threading.Lock()
+    unstored_item_ids = set() # Listings the writer couldn't store, reported by flush()
+    errors = [] # (stage name, exception) of the stages that died
+
+    def put(name, item):
+        """Hands item to a stage's queue, unless a stage has died and the queue would never drain."""
+        while True:
+            if stop.is_set():
+                raise _PipelineStopped("a pipeline stage failed")
+            try:
+                queues[name].put(item, timeout=STOP_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def get(name):
+        """Takes the next item from a stage's queue, unless a stage has died."""
+        while True:
+            try:
+                return queues[name].get(timeout=STOP_POLL_SECONDS)
+            except queue.Empty:
+                if stop.is_set():
+                    raise _PipelineStopped("a pipeline stage failed")
+
+    def guarded(name, loop):
+        """Runs a stage loop, recording its exception and stopping the other stages if it dies."""
+        def run():
+            try:
+                loop()
+            except _PipelineStopped:
+                pass
+            except Exception as e:
+                print(f"  Pipeline stage '{name}' died: {e}")
+                errors.append((name, e))
+                stop.set()
+        return run
+
+    def run_stage(name, next_name):
+        in_queue, stats = queues[name], stage_stats[name]
+        while True:
+            item = get(name)
+            if item is _DONE or isinstance(item, _Checkpoint):
+                put(next_name, item)
+                in_queue.task_done()
+                if item is _DONE:
+                    return
+                continue
+            stats.sample_depth(in_queue.qsize())
+            start = time.perf_counter()
+            try:
+                processors[name](item)
+            except Exception as e:
+                print(f"  Pipeline stage '{name}' failed for item {item.get('item_id')}: {e}")
+            stats.record(1, time.perf_counter() - start)
+            put(next_name, item)
+            in_queue.task_done()
+
+    def run_writer():
+        in_queue, stats = queues['write'], stage_stats['write']
+        batch = []
+        failed_searches = set() # (marketplace_id, search_keyword) with listings that couldn't be stored
+        while True:
+            item = get('write')
+            done = item is _DONE
+            checkpoint = item if isinstance(item, _Checkpoint) else None
+            if not done and not checkpoint:
+                stats.sample_depth(in_queue.qsize())
+                batch.append(item)
+
+            # Write when the batch is full or nothing else is waiting, so listings never sit unwritten
+            if batch and (done or checkpoint or len(batch) >= WRITE_BATCH_SIZE or in_queue.empty()):
+                start = time.perf_counter()
+                failed_item_ids = set(insert_listings_bulk(write_conn, batch)['failed_item_ids'])
+                if failed_item_ids:
+                    with unstored_lock:
+                        unstored_item_ids.update(failed_item_ids)
+                for listing in batch:
+                    if listing['item_id'] in failed_item_ids:
+                        failed_searches.add((listing.get('marketplace_id'), listing.get('search_keyword')))
+                        continue
+                    result['items_written'] += 1
+                    if listing.get('profit') is not None and listing['profit'] > 0:
+                        result['deals_found'] += 1
+                        if result['time_to_first_deal'] is None:
+                            result['time_to_first_deal'] = time.perf_counter() - pipeline_start
+                stats.record(len(batch), time.perf_counter() - start)
+                for _ in batch:
+                    in_queue.task_done()
+                batch = []
+
+            if checkpoint:
+                # A checkpoint past a listing that wasn't stored would make --resume skip it
+                marketplace_id, search_keyword = checkpoint.data[0], checkpoint.data[1]
+                if (marketplace_id, search_keyword) in failed_searches:
+                    print(f"  Not checkpointing '{search_keyword}' on {marketplace_id}: some of its listings weren't stored")
+                else:
+                    save_scrape_checkpoints(write_conn, run_id, [checkpoint.data])
+                in_queue.task_done()
+            if done:
+                in_queue.task_done()
+                return
+
+    def flush():
+        """
+        Blocks until every listing handed to the pipeline so far has been written, and returns
+        the IDs of the listings that couldn't be stored (so the scraper holds its watermark).
+        """
+        for name in STAGES:
+            stage_queue = queues[name]
+            with stage_queue.all_tasks_done:
+                while stage_queue.unfinished_tasks:
+                    if stop.is_set():
+                        raise _PipelineStopped("a pipeline stage failed")
+                    stage_queue.all_tasks_done.wait(STOP_POLL_SECONDS)
+        with unstored_lock:
+            return set(unstored_item_ids)
+
+    threads = [threading.Thread(target=guarded(name, lambda name=name, index=index: run_stage(name, STAGES[index + 1])),
+                                name=f"pipeline-{name}", daemon=True)
+               for index, name in enumerate(STAGES[:-1])]
+    threads.append(threading.Thread(target=guarded('write', run_writer), name="pipeline-write", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        scrape_stats = scrape_listings(
+            conn, access_token, keywords, marketplace_ids,
+            max_items_per_keyword=max_items_per_keyword,
+            filter_str=filter_str,
+            incremental=incremental,
+            on_item=lambda item: put('classify', item),
+            on_flush=flush,
+            run_id=run_id,
+            on_checkpoint=lambda checkpoint_data: put('classify', _Checkpoint(checkpoint_data))
+        )
+    except _PipelineStopped:
+        pass # The stage's own error is raised below
+    finally:
+        # Let the stages drain whatever is queued, then stop (at once, if one of them died)
+        try:
+            put('classify', _DONE)
+        except _PipelineStopped:
+            pass
+        for thread in threads:
+            thread.join()
+        write_conn.close()
+
+    if errors:
+        name, error = errors[0]
+        raise Exception(f"Pipeline stage '{name}' failed: {error}") from error
+
+    total_seconds = time.perf_counter() - pipeline_start
+    result.update(scrape_stats)
+    result['total_seconds'] = total_seconds
+    result['stages'] = {
+        name: {
+            'items': stats.items,
+            'busy_seconds': stats.busy_seconds,
+            'items_per_second': stats.items / stats.busy_seconds if stats.busy_seconds else 0,
+            'avg_queue_depth': stats.depth_total / stats.depth_samples if stats.depth_samples else 0,
+            'max_queue_depth': stats.max_depth,
+        }
+        for name, stats in stage_stats.items()
+    }
+    return result
+
+
+def print_pipeline_stats(result):
+    """Prints per-stage throughput and queue depths for a run_pipeline result."""
+    print(f"  Pipeline: {result['items_written']} listings written, {result['deals_found']} deals, "
+          f"total {result['total_seconds']:.2f} s")
+    if result['time_to_first_deal'] is not None:
+        print(f"  Time to first deal: {result['time_to_first_deal']:.2f} s")
+    for name, stats in result['stages'].items():
+        print(f"  Stage '{name}': {stats['items']} items, {stats['items_per_second']:.1f} items/s while busy, "
+              f"queue depth avg {stats['avg_queue_depth']:.1f} / max {stats['max_queue_depth']}")
@@ -0,0 +1,174 @@
+import os # for .env file
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+REQUESTS_PER_SECOND = float(os.getenv('EBAY_REQUESTS_PER_SECOND', '10')) # Sustained request rate across all workers
+BURST_SIZE = int(os.getenv('EBAY_BURST_SIZE', '10')) # Requests allowed back to back before the rate applies
+RETRY_MAX_ATTEMPTS = 5 # Retries after the first attempt for throttled or failed requests
+RETRY_BASE_DELAY = 1 # seconds; doubled on every retry
+RETRY_MAX_DELAY = 60 # seconds; cap for a single backoff
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+BREAKER_WINDOW_SECONDS = 30 # Error rate is measured over this sliding window
+BREAKER_MIN_REQUESTS = 20 # Don't trip on a handful of requests
+BREAKER_ERROR_RATE = 0.5 # Trip when at least this share of recent requests failed
+BREAKER_COOLDOWN_SECONDS = 30 # How long all workers pause once tripped
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Shared throttle for one API budget: a token bucket for the request rate, plus a circuit
+    breaker that pauses every worker when the recent error rate spikes or the API asks us
+    to back off (429 with Retry-After).
+    """
+
+    def __init__(self, name, requests_per_second=REQUESTS_PER_SECOND, burst_size=BURST_SIZE):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_second, burst_size)
+        self.lock = threading.Lock()
+        self.outcomes = deque() # (monotonic time, succeeded)
+        self.paused_until = 0
+        self.stats = {'requests': 0, 'errors': 0, 'retries': 0, 'breaker_trips': 0}
+
+    def wait(self):
+        """Blocks until the breaker is closed and the bucket has a token."""
+        while True:
+            with self.lock:
+                pause = self.paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            time.sleep(pause)
+        self.bucket.acquire()
+
+    def record(self, succeeded):
+        """Records a request outcome and trips the breaker if the error rate is too high."""
+        with self.lock:
+            now = time.monotonic()
+            self.stats['requests'] += 1
+            if not succeeded:
+                self.stats['errors'] += 1
+            self.outcomes.append((now, succeeded))
+            while self.outcomes and self.outcomes[0][0] < now - BREAKER_WINDOW_SECONDS:
+                self.outcomes.popleft()
+
+            if len(self.outcomes) >= BREAKER_MIN_REQUESTS and now >= self.paused_until:
+                errors = sum(1 for _, ok in self.outcomes if not ok)
+                if errors / len(self.outcomes) >= BREAKER_ERROR_RATE:
+                    print(f"  Circuit breaker '{self.name}' tripped: {errors}/{len(self.outcomes)} recent requests failed. "
+                          f"Pausing all workers for {BREAKER_COOLDOWN_SECONDS} seconds...")
+                    self.paused_until = now + BREAKER_COOLDOWN_SECONDS
+                    self.stats['breaker_trips'] += 1
+                    self.outcomes.clear()
+
+    def pause(self, seconds):
+        """Pauses all workers sharing this limiter, e.g. when the API returned Retry-After."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def record_retry(self):
+        with self.lock:
+            self.stats['retries'] += 1
+
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (delay in seconds or an HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Returns how long to wait before retry number attempt (0-based): exponential backoff with
+    full jitter, or the server's Retry-After when it asks for longer.
+    """
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+    server_delay = parse_retry_after(retry_after)
+    if server_delay is not None:
+        delay = max(delay, min(server_delay, RETRY_MAX_DELAY))
+    return delay
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_rate_overrides = {} # name -> (requests_per_second, burst_size) set through set_rate_limit
+
+
+def _covers(name, limiter_name):
+    """True if settings for name apply to limiter_name ('ebay' covers 'ebay:EBAY_GB')."""
+    return limiter_name == name or limiter_name.startswith(f"{name}:")
+
+
+def get_rate_limiter(name='ebay'):
+    """
+    Returns the process-wide limiter for the named API budget, creating it on first use.
+    Budgets can be split per marketplace by name, e.g. 'ebay:EBAY_GB'.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            limiter = RateLimiter(name)
+            for prefix, (requests_per_second, burst_size) in _rate_overrides.items():
+                if _covers(prefix, name):
+                    limiter.bucket = TokenBucket(requests_per_second, burst_size)
+            _limiters[name] = limiter
+        return _limiters[name]
+
+
+def set_rate_limit(name, requests_per_second, burst_size=BURST_SIZE):
+    """
+    Changes the request rate of the named limiter and of every limiter under it, including
+    ones created later (e.g. 'ebay' for a mock API without quota covers 'ebay:EBAY_GB').
+    """
+    with _limiters_lock:
+        _rate_overrides[name] = (requests_per_second, burst_size)
+        for limiter_name, limiter in _limiters.items():
+            if _covers(name, limiter_name):
+                limiter.bucket = TokenBucket(requests_per_second, burst_size)
+
+
+def print_rate_limit_stats():
+    """Prints request, error, retry and breaker counters for every limiter."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        stats = limiter.stats
+        print(f"  Rate limiter '{limiter.name}': {stats['requests']} requests, {stats['errors']} errors, "
+              f"{stats['retries']} retries, {stats['breaker_trips']} breaker trips")
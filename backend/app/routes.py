@@ -3,7 +3,9 @@ from flask import Blueprint, request, jsonify
 import os
 from dotenv import load_dotenv
 from flask import send_from_directory, current_app
-from .database import connect_to_db, get_listings_with_filters
+from .database import get_listings_with_filters, get_listings_after_cursor
+from .db_pool import get_db, get_pool
+from .snapshots import get_listing_history
 
 load_dotenv()
 
@@ -31,6 +33,12 @@ def get_listings():
     - sort_by: sort order (optional)
     - page: page number (default: 1)
     - per_page: items per page (default: 20)
+    - cursor: keyset pagination instead of page; empty for the first page, then the
+      previous response's pagination.nextCursor (optional)
+    - total: with cursor, 'true' to also return the (cached) total count (optional)
+    - specific: item specific the listing must have, 'Name:Value' or just 'Name'; repeat
+      for several (optional)
+    - shipping_max: maximum cost of the cheapest shipping option (optional)
     """
     try:
         # Get query parameters
@@ -40,6 +48,17 @@ def get_listings():
         sort_by = request.args.get('sort_by', default='profit_desc')
         page = request.args.get('page', default=1, type=int)
         per_page = request.args.get('per_page', default=20, type=int)
+        cursor_token = request.args.get('cursor')
+        include_total = request.args.get('total', default='false').lower() == 'true'
+        shipping_max = request.args.get('shipping_max', type=float)
+
+        # 'Name:Value' requires that value, a bare 'Name' only requires the item specific
+        specifics = {}
+        for specific in request.args.getlist('specific'):
+            name, separator, value = specific.partition(':')
+            if not name.strip():
+                return jsonify({'error': f"Invalid item specific filter: '{specific}'"}), 400
+            specifics[name.strip()] = value.strip() if separator else None
 
 
         # Convert returns_accepted string to boolean
@@ -47,23 +66,40 @@ def get_listings():
         if returns_accepted is not None:
             returns_accepted = returns_accepted.lower() == 'true'
         
-        # Connect to database
-        conn = connect_to_db()
+        # Borrow the request's pooled connection; it goes back to the pool when the request ends
+        conn = get_db()
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
         
         # Fetch listings with filters
-        result = get_listings_with_filters(
-            conn, 
-            profit_min=profit_min,
-            scam_risk_max=scam_risk_max,
-            returns_accepted=returns_accepted,
-            sort_by=sort_by,
-            page=page,
-            per_page=per_page
-        )
-        
-        conn.close()
+        if cursor_token is not None:
+            try:
+                result = get_listings_after_cursor(
+                    conn,
+                    profit_min=profit_min,
+                    scam_risk_max=scam_risk_max,
+                    returns_accepted=returns_accepted,
+                    sort_by=sort_by,
+                    cursor_token=cursor_token or None,
+                    per_page=per_page,
+                    include_total=include_total,
+                    specifics=specifics,
+                    shipping_max=shipping_max
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            result = get_listings_with_filters(
+                conn, 
+                profit_min=profit_min,
+                scam_risk_max=scam_risk_max,
+                returns_accepted=returns_accepted,
+                sort_by=sort_by,
+                page=page,
+                per_page=per_page,
+                specifics=specifics,
+                shipping_max=shipping_max
+            )
         
         return jsonify({
             'listings': result['listings'],
@@ -72,6 +108,8 @@ def get_listings():
                 'profit_min': profit_min,
                 'scam_risk_max': scam_risk_max,
                 'returns_accepted': returns_accepted,
+                'specifics': specifics,
+                'shipping_max': shipping_max,
                 'sort_by': sort_by
             }
         }), 200
@@ -80,6 +118,46 @@ def get_listings():
         print(f"Error in get_listings endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
     
+@notifications_bp.route('/listings/<item_id>/history', methods=['GET'])
+def get_listing_timeline(item_id):
+    """
+    Price and profit timeline of one listing, from the snapshot every pipeline run takes
+    Query parameters:
+    - days: only the last N days (optional)
+    """
+    days = request.args.get('days', type=int)
+    if days is not None and days <= 0:
+        return jsonify({'error': 'days must be positive'}), 400
+
+    conn = get_db()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    snapshots = get_listing_history(conn, item_id, days)
+    if snapshots is None:
+        return jsonify({'error': 'Internal server error'}), 500
+    if not snapshots:
+        return jsonify({'error': f"No history for item '{item_id}'"}), 404
+    return jsonify({'itemId': item_id, 'snapshots': snapshots}), 200
+
+@notifications_bp.route('/health', methods=['GET'])
+def health_check():
+    """
+    Health check for load balancers and monitoring: runs SELECT 1 on a pooled connection.
+    Returns 200 when the database answers, 503 otherwise, with this worker's pool metrics.
+    """
+    healthy, error = get_pool().check_health()
+    response = {'status': 'ok' if healthy else 'unavailable', 'database': 'ok' if healthy else error,
+                'pool': get_pool().get_stats()}
+    return jsonify(response), 200 if healthy else 503
+
+@notifications_bp.route('/metrics/db-pool', methods=['GET'])
+def db_pool_metrics():
+    """
+    Connection pool utilization of the worker process that serves the request: open, idle and
+    in-use connections, peak usage, check-out waits/timeouts and discarded connections.
+    """
+    return jsonify(get_pool().get_stats()), 200
+
 @notifications_bp.route('/contact', methods=['POST'])
 def contact_form():
     """
@@ -4,6 +4,7 @@ import json
 import os
 from dotenv import load_dotenv
 import re
+from app.database import bulk_update_listings, stream_rows, STAGE_CHUNK_SIZE
 
 # Load environment variables
 load_dotenv()
@@ -94,11 +95,65 @@ def get_scam_scores_from_chatgpt(prompt):
 
     return response.output_text
 
-def update_scam_risk_score_column(conn):
-    cursor = conn.cursor()
+def score_batch(conn, batch):
+    """
+    Scores one batch of formatted listings with ChatGPT and writes the scores in one statement.
 
+    Returns:
+        bool: False if ChatGPT gave no usable response (request failed, not JSON, or not a list
+              of scores); the batch's listings stay unscored.
+    """
+    # Call the ChatGPT API
     try:
-        # Fetch all rows from the ebay_listings table
+        response = get_scam_scores_from_chatgpt(SYSTEM_PROMPT + batch)
+    except Exception as e:
+        print(f"ChatGPT request failed: {e}")
+        return False
+    # Parse the JSON response
+
+    if not response:
+        print("No response from ChatGPT.")
+        return False
+    try:
+        # Attempt to parse the response as JSON
+        cleaned_response = clean_gpt_json_response(response)
+        scam_scores = json.loads(cleaned_response)
+    except json.JSONDecodeError:
+        print(f"Failed to decode JSON response: {response}")
+        return False
+
+    # Valid JSON can still have the wrong shape (an object, missing keys, a non-numeric score)
+    try:
+        if not isinstance(scam_scores, list):
+            raise TypeError(f"expected a list, got {type(scam_scores).__name__}")
+        scores = [(str(item['item_id']), int(item['scam_risk_score']), str(item['explanation'])) for item in scam_scores]
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"Unexpected JSON structure in response ({e}): {response}")
+        return False
+
+    # Update the 'scam_risk_score' column for the batch's items in one statement, committed
+    # per batch so an interrupted run only re-scores the batches it lost
+    bulk_update_listings(conn, ['scam_risk_score', 'scam_risk_score_explanation'], scores)
+    return True
+
+def update_scam_risk_score_column(conn, only_unscored=False, chunk_size=STAGE_CHUNK_SIZE):
+    """
+    Scores gold listings with a profit using ChatGPT and updates the 'scam_risk_score' column.
+
+    Args:
+        conn: The database connection object.
+        only_unscored: If True, only score rows without a scam_risk_score yet (new listings).
+        chunk_size: Rows fetched from the database per round trip.
+
+    Batches ChatGPT gives no usable response for are logged and left unscored, without
+    failing the step; the next run with only_unscored picks them up.
+
+    Raises:
+        Exception: If the rows can't be read or updated.
+    """
+    failed_batches = 0
+    try:
+        # Stream the rows from the ebay_listings table
         query = """
         SELECT 
         
@@ -108,58 +163,34 @@ def update_scam_risk_score_column(conn):
         FROM ebay_listings
         WHERE is_gold = TRUE
             AND profit IS NOT NULL
-            AND melt_value IS NOT NULL;
+            AND melt_value IS NOT NULL
         """
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        if only_unscored:
+            query += " AND scam_risk_score IS NULL"
 
-        # generate batches of prompts for processing with GPT
-        batches = []
+        # Build prompts up to TARGET_TOKENS_PER_BATCH and score each one as soon as it is full,
+        # so only the current batch is held in memory
         current_batch = ""
 
-        for row in rows:
+        for row in stream_rows(conn, query + ";", chunk_size=chunk_size):
             current_listing = format_listing_for_prompt(row)
             if count_tokens(current_batch + current_listing) < TARGET_TOKENS_PER_BATCH:
                 current_batch += current_listing
             else:
-                batches.append(current_batch)
+                if not score_batch(conn, current_batch):
+                    failed_batches += 1
                 current_batch = current_listing
         
-        # Add the last batch if it has listings
-        if len(current_batch) > 0:
-            batches.append(current_batch)
-
-        # Process each batch with ChatGPT
-        for batch in batches:
-            # Call the ChatGPT API
-            response = get_scam_scores_from_chatgpt(SYSTEM_PROMPT + batch)
-            # Parse the JSON response
-            
-            if not response:
-                print("No response from ChatGPT.")
-            else:
-                try:
-                    # Attempt to parse the response as JSON
-                    cleaned_response = clean_gpt_json_response(response)
-                    scam_scores = json.loads(cleaned_response)
-
-                    # Update the 'scam_risk_score' column for each item
-                    for item in scam_scores:
-                        update_query = """
-                            UPDATE ebay_listings
-                            SET scam_risk_score = %s,
-                                scam_risk_score_explanation = %s
-                            WHERE item_id = %s;
-                        """
-                        cursor.execute(update_query, (item['scam_risk_score'], item['explanation'], item['item_id']))
-                except json.JSONDecodeError:
-                    print(f"Failed to decode JSON response: {response}")
+        # Score the last batch if it has listings
+        if len(current_batch) > 0 and not score_batch(conn, current_batch):
+            failed_batches += 1
                                 
         # Commit the changes to the database
         conn.commit()
 
     except Exception as e:
         conn.rollback()
-        print(f"Error updating 'scam_risk_score' column: {e}")
-    finally:
-        cursor.close()
\ No newline at end of file
+        raise Exception(f"Error updating 'scam_risk_score' column: {e}")
+
+    if failed_batches:
+        print(f"Warning: {failed_batches} batches couldn't be scored; their listings stay unscored until the next run")
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Distributed scraping through the scrape_jobs table (see app/job_queue.py).
+
+A run is planned once: one 'search' job per marketplace x keyword x price band. Any number of
+workers, on any number of hosts, then claim jobs until the queue is empty:
+    search   fetches one results page, gates and reserves its new items, queues 'details'
+             jobs of up to ITEMS_BATCH_SIZE items and the band's next page.
+    details  fetches details for its items and inserts the listings.
+Workers heartbeat the job they hold; jobs of a crashed worker go back to the queue once their
+heartbeat is stale, and failed jobs are retried with backoff. A worker whose job was handed to
+another worker stops it before writing anything more. Listings are stored unenriched in the
+live ebay_listings table; once the queue is drained, `python run.py --enrich-only` classifies,
+extracts, prices and scores them and refreshes the listing feed.
+
+Run from the backend directory:
+    python -m app.scrape_worker plan            # prints the run ID
+    python -m app.scrape_worker work            # on as many machines as you like
+    python -m app.scrape_worker status --run-id <run ID>
+    python -m app.scrape_worker prune --days 14 # also done by every plan
+    python run.py --enrich-only                 # once no job is pending or running
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+from app.database import connect_to_db, create_tables, insert_listings_bulk, insert_gate_verdicts
+from app.ebay_search import (
+    get_access_token, search_ebay_listings, CLIENT_ID, CLIENT_SECRET, TOKEN_URL, SEARCH_KEYWORDS,
+    MARKETPLACE_IDS, CATEGORY_IDS, RESULTS_PER_PAGE, MAX_PAGES, SEARCH_OFFSET_CAP, ITEMS_BATCH_SIZE,
+    USE_PRICE_PARTITIONING, marketplace_currency
+)
+from app.detail_fetcher import fetch_item_details_concurrently
+from app.search_partition import partition_price_bands, band_filter
+from app.summary_gate import gate_summary, GATE_RULES_VERSION
+from app.scraper import build_item_data, gate_verdict
+from app.migrations import apply_migrations
+from app.job_queue import (
+    enqueue_jobs, reserve_items, claim_job, heartbeat_job, complete_job, fail_job,
+    requeue_stale_jobs, get_job_counts, prune_jobs, JOB_HEARTBEAT_SECONDS, JOB_RETENTION_DAYS
+)
+
+WORKER_POLL_SECONDS = 5 # Wait this long before asking again when no job is available
+
+
+def search_job(run_id, marketplace_id, keyword, search_filter, offset):
+    """(dedupe_key, payload) of the search job for one results page."""
+    payload = {'marketplace_id': marketplace_id, 'keyword': keyword, 'filter': search_filter, 'offset': offset}
+    return f"{run_id}|search|{marketplace_id}|{keyword}|{search_filter or ''}|{offset}", payload
+
+
+def plan_scrape(conn, access_token, run_id, keywords, marketplace_ids, filter_str=None):
+    """
+    Queues the first results page of every marketplace x keyword x price band for a run.
+    Later pages are queued by the search jobs themselves.
+
+    Returns:
+        int: Number of search jobs queued.
+    """
+    queued = 0
+    for marketplace_id in marketplace_ids:
+        currency = marketplace_currency(marketplace_id)
+        for keyword in keywords:
+            bands = partition_price_bands(access_token, keyword, marketplace_id, filter_str) if USE_PRICE_PARTITIONING else [(None, None, 0)]
+            jobs = [
+                search_job(run_id, marketplace_id, keyword, filter_str if low is None else band_filter(filter_str, (low, high), currency), 0)
+                for low, high, _ in bands
+            ]
+            queued += enqueue_jobs(conn, run_id, 'search', jobs)
+    print(f"Planned run {run_id}: {queued} search jobs")
+    return queued
+
+
+def check_job_lost(lost):
+    """Raises if the heartbeat found the job handed to another worker, so it stops before writing."""
+    if lost is not None and lost.is_set():
+        raise Exception("job was handed to another worker")
+
+
+def process_search_job(conn, access_token, run_id, payload, lost=None):
+    """Fetches one results page and queues detail jobs for its new items, plus the next page."""
+    marketplace_id, keyword, search_filter, offset = payload['marketplace_id'], payload['keyword'], payload['filter'], payload['offset']
+    job_key, _ = search_job(run_id, marketplace_id, keyword, search_filter, offset)
+    item_summaries, total_listings = search_ebay_listings(
+        access_token=access_token,
+        search_query=keyword,
+        category_ids=CATEGORY_IDS,
+        limit=RESULTS_PER_PAGE,
+        marketplace_id=marketplace_id,
+        filter_str=search_filter,
+        offset=offset
+    )
+    if item_summaries is None:
+        raise Exception(f"Search failed for '{keyword}' on {marketplace_id} at offset {offset}")
+
+    check_job_lost(lost)
+    reserved = reserve_items(conn, run_id, [summary.get('itemId') for summary in item_summaries if summary.get('itemId')],
+                             job_key, GATE_RULES_VERSION)
+    new_summaries = [summary for summary in item_summaries if summary.get('itemId') in reserved]
+
+    gate_verdicts = []
+    to_fetch = []
+    for summary in new_summaries:
+        reason = gate_summary(summary)
+        if reason:
+            gate_verdicts.append(gate_verdict(summary, keyword, reason))
+        else:
+            to_fetch.append(summary)
+    check_job_lost(lost)
+    insert_gate_verdicts(conn, gate_verdicts)
+
+    detail_jobs = []
+    for i in range(0, len(to_fetch), ITEMS_BATCH_SIZE):
+        chunk = to_fetch[i:i + ITEMS_BATCH_SIZE]
+        detail_jobs.append((
+            f"{run_id}|details|{chunk[0].get('itemId')}",
+            {'marketplace_id': marketplace_id, 'keyword': keyword, 'summaries': chunk}
+        ))
+    enqueue_jobs(conn, run_id, 'details', detail_jobs)
+
+    next_offset = offset + RESULTS_PER_PAGE
+    if (item_summaries and next_offset < total_listings and next_offset // RESULTS_PER_PAGE < MAX_PAGES
+            and next_offset + RESULTS_PER_PAGE <= SEARCH_OFFSET_CAP):
+        enqueue_jobs(conn, run_id, 'search', [search_job(run_id, marketplace_id, keyword, search_filter, next_offset)])
+
+    print(f"  '{keyword}' on {marketplace_id} offset {offset}: {len(item_summaries)} results, "
+          f"{len(new_summaries)} new, {len(gate_verdicts)} gated, {len(detail_jobs)} detail jobs queued")
+
+
+def process_details_job(conn, access_token, payload, lost=None):
+    """
+    Fetches details for a job's items and inserts them. Raises if any item couldn't be fetched
+    or stored. Items whose price can't be converted to BASE_CURRENCY are gated instead, since
+    retrying the job wouldn't change that.
+    """
+    marketplace_id, keyword = payload['marketplace_id'], payload['keyword']
+    missing = []
+    listings = []
+    gate_verdicts = []
+    for summary, item_details in fetch_item_details_concurrently(access_token, payload['summaries'], marketplace_id):
+        if not item_details:
+            missing.append(summary.get('itemId'))
+            continue
+        item_data = build_item_data(summary, item_details, keyword, marketplace_id)
+        if item_data is None:
+            gate_verdicts.append(gate_verdict(summary, keyword, 'price_unconverted'))
+        else:
+            listings.append(item_data)
+    check_job_lost(lost)
+    insert_gate_verdicts(conn, gate_verdicts)
+    missing.extend(insert_listings_bulk(conn, listings)['failed_item_ids'])
+    if missing:
+        # Stored items are skipped by ON CONFLICT on the retry (and served from the detail cache)
+        raise Exception(f"{len(missing)} of {len(payload['summaries'])} items not stored: {', '.join(missing[:5])}")
+
+
+def _heartbeat(conn, job_id, worker_id, stop, lost):
+    """Heartbeats a job on the worker's heartbeat connection until stop is set; sets lost if the job is no longer ours."""
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        if not heartbeat_job(conn, job_id, worker_id):
+            print(f"  Job {job_id} was handed to another worker; stopping it")
+            lost.set()
+            return
+
+
+def run_worker(worker_id=None, kinds=None, exit_when_idle=True):
+    """
+    Claims and processes jobs until the queue has nothing left (or forever, without exit_when_idle).
+
+    Args:
+        worker_id (str): Worker name stored on claimed jobs; defaults to host:pid.
+        kinds (list): Only process these job kinds (e.g. ['details']); None for all.
+        exit_when_idle (bool): Return once no job is pending or running.
+
+    Returns:
+        dict: Number of jobs done, failed and lost to another worker by this worker.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect_to_db()
+    if conn is None:
+        raise Exception("Worker could not connect to the database")
+    access_token = get_access_token(CLIENT_ID, CLIENT_SECRET, TOKEN_URL)
+    if not access_token:
+        raise Exception("Worker could not get an access token")
+    heartbeat_conn = None # Opened once and reused for every job; the job's own work runs on conn
+
+    stats = {'done': 0, 'failed': 0, 'lost': 0}
+    print(f"Worker {worker_id} started")
+    try:
+        while True:
+            requeue_stale_jobs(conn)
+            job = claim_job(conn, worker_id, kinds)
+            if job is None:
+                counts = get_job_counts(conn)
+                active = sum(count for (kind, status), count in counts.items()
+                             if status in ('pending', 'running') and (kinds is None or kind in kinds))
+                if exit_when_idle and active == 0:
+                    break
+                time.sleep(WORKER_POLL_SECONDS)
+                continue
+
+            job_id, run_id, kind, payload, attempts = job
+            print(f"Job {job_id} ({kind}, attempt {attempts}) claimed by {worker_id}")
+            if heartbeat_conn is None or heartbeat_conn.closed:
+                heartbeat_conn = connect_to_db()
+            if heartbeat_conn is None:
+                # Unheartbeated, the job would go stale and be run twice; give it back instead
+                print(f"Job {job_id} aborted: no heartbeat connection")
+                fail_job(conn, job_id, worker_id, Exception("worker could not open its heartbeat connection"))
+                stats['failed'] += 1
+                time.sleep(WORKER_POLL_SECONDS)
+                continue
+
+            stop = threading.Event()
+            lost = threading.Event()
+            heartbeat = threading.Thread(target=_heartbeat, args=(heartbeat_conn, job_id, worker_id, stop, lost), daemon=True)
+            heartbeat.start()
+            try:
+                if kind == 'search':
+                    process_search_job(conn, access_token, run_id, payload, lost)
+                elif kind == 'details':
+                    process_details_job(conn, access_token, payload, lost)
+                else:
+                    raise Exception(f"Unknown job kind '{kind}'")
+                complete_job(conn, job_id, worker_id)
+                stats['done'] += 1
+            except Exception as e:
+                if lost.is_set():
+                    # The job's new worker owns its status now
+                    print(f"Job {job_id} stopped: {e}")
+                    stats['lost'] += 1
+                else:
+                    print(f"Job {job_id} failed: {e}")
+                    fail_job(conn, job_id, worker_id, e)
+                    stats['failed'] += 1
+            finally:
+                stop.set()
+                heartbeat.join()
+    finally:
+        conn.close()
+        if heartbeat_conn is not None:
+            heartbeat_conn.close()
+
+    print(f"Worker {worker_id} finished: {stats['done']} jobs done, {stats['failed']} failed attempts, "
+          f"{stats['lost']} lost to other workers")
+    return stats
+
+
+def print_job_counts(conn, run_id=None):
+    """Prints job counts per kind and status."""
+    counts = get_job_counts(conn, run_id)
+    for (kind, status), count in sorted(counts.items()):
+        print(f"  {kind:8} {status:8} {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed scrape planning and workers")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    plan_parser = subparsers.add_parser('plan', help="Queue the search jobs of a new run")
+    plan_parser.add_argument('--run-id', help="Run ID (default: a new random ID)")
+    work_parser = subparsers.add_parser('work', help="Claim and process jobs")
+    work_parser.add_argument('--kinds', help="Comma-separated job kinds to process (default: all)")
+    work_parser.add_argument('--forever', action='store_true', help="Keep polling when the queue is empty")
+    status_parser = subparsers.add_parser('status', help="Show job counts")
+    status_parser.add_argument('--run-id', help="Only count jobs of this run")
+    prune_parser = subparsers.add_parser('prune', help="Delete the jobs of long-finished runs")
+    prune_parser.add_argument('--days', type=int, default=JOB_RETENTION_DAYS, help="Keep runs finished within this many days")
+    args = parser.parse_args()
+
+    if args.command == 'work':
+        run_worker(kinds=args.kinds.split(',') if args.kinds else None, exit_when_idle=not args.forever)
+        exit(0)
+
+    conn = connect_to_db()
+    if conn is None:
+        exit(1)
+    if args.command == 'plan':
+        create_tables(conn)
+        apply_migrations(conn)
+        prune_jobs(conn)
+        run_id = args.run_id or uuid.uuid4().hex[:12]
+        access_token = get_access_token(CLIENT_ID, CLIENT_SECRET, TOKEN_URL)
+        plan_scrape(conn, access_token, run_id, SEARCH_KEYWORDS, MARKETPLACE_IDS)
+        print(run_id)
+    elif args.command == 'prune':
+        prune_jobs(conn, args.days)
+    else:
+        print_job_counts(conn, args.run_id)
+    conn.close()
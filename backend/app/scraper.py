@@ -0,0 +1,424 @@
+import threading
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app.database import (
+    insert_listings_bulk, load_existing_item_ids, get_watermark, update_watermark,
+    load_gated_item_ids, insert_gate_verdicts
+)
+from app.ebay_search import (
+    search_ebay_listings, RESULTS_PER_PAGE, MAX_PAGES, CATEGORY_IDS, SEARCH_OFFSET_CAP,
+    USE_PRICE_PARTITIONING, PARTITION_CONCURRENCY, DETAIL_FETCH_CONCURRENCY, MARKETPLACE_ID,
+    marketplace_currency
+)
+from app.detail_fetcher import fetch_item_details_concurrently
+from app.summary_gate import gate_summary, GATE_RULES_VERSION
+from app.search_partition import partition_price_bands, band_filter
+from app.fx_rates import to_base_currency, BASE_CURRENCY
+from app.checkpoints import get_scrape_checkpoints, save_scrape_checkpoints
+
+BATCH_SIZE = 100 # Listings inserted per batch
+INCREMENTAL_SORT_ORDER = 'newlyListed' # Newest listings first, so a scrape can stop at the watermark
+
+
+def parse_item_creation_date(summary):
+    """Parses a summary's itemCreationDate (e.g. '2024-05-01T12:34:56.000Z'), or returns None."""
+    created = summary.get('itemCreationDate')
+    if not created:
+        return None
+    try:
+        return datetime.fromisoformat(created.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def build_item_data(summary, item_details, search_keyword, marketplace_id=MARKETPLACE_ID):
+    """
+    Combines a search summary and its fetched details into an ebay_listings row dict, with the
+    price converted into BASE_CURRENCY. Returns None if the price can't be converted.
+    """
+    seller_info = summary.get('seller', {})
+    original_price = summary.get('price', {}).get('value')
+    original_currency = summary.get('price', {}).get('currency') or marketplace_currency(marketplace_id)
+    price = to_base_currency(original_price, original_currency)
+    if price is None:
+        print(f"  Could not convert price {original_price} {original_currency} of item {summary.get('itemId')}; skipping it")
+        return None
+    return {
+        'item_id': summary.get('itemId'),
+        'title': summary.get('title'),
+        'price': price,
+        'currency': BASE_CURRENCY,
+        'marketplace_id': marketplace_id,
+        'original_price': original_price,
+        'original_currency': original_currency,
+        'seller_username': seller_info.get('username'),
+        'seller_feedback_score': seller_info.get('feedbackScore'),
+        'feedback_percent': seller_info.get('feedbackPercentage'),
+        'image_url': summary.get('image', {}).get('imageUrl'),
+        'item_url': summary.get('itemWebUrl'),
+        'shipping_options': summary.get('shippingOptions', None),
+        'top_rated_buying_experience': summary.get('topRatedBuyingExperience'),
+        'description': item_details.get('description', None),
+        'returns_accepted': item_details.get('returns_accepted', None),
+        'metal': item_details.get('metal', None),
+        'total_carat_weight': item_details.get('total_carat_weight', None),
+        'metal_purity': item_details.get('metal_purity', None),
+        'item_specifics': item_details.get('item_specifics', {}),
+        'search_keyword': search_keyword  # Track which keyword found this item
+    }
+
+
+def gate_verdict(summary, search_keyword, reason):
+    """Builds a gated_listings row for a summary rejected by the current gate rules."""
+    try:
+        price = float(summary.get('price', {}).get('value'))
+    except (TypeError, ValueError):
+        price = None
+    return (summary.get('itemId'), search_keyword, summary.get('title'), price, reason, GATE_RULES_VERSION)
+
+
+def insert_batch(conn, batch_items):
+    """Inserts a batch of listings in one transaction and returns (stored count, IDs that couldn't be stored)."""
+    print(f"  Processing batch of {len(batch_items)} items...")
+    result = insert_listings_bulk(conn, batch_items)
+    successful_inserts = result['inserted'] + result['duplicates']
+    print(f"  Successfully inserted {successful_inserts}/{len(batch_items)} items ({result['duplicates']} already stored)")
+    return successful_inserts, result['failed_item_ids']
+
+
+def scrape_listings(conn, access_token, keywords, marketplace_ids, max_items_per_keyword, filter_str=None, incremental=False, on_item=None, on_flush=None, run_id=None, on_checkpoint=None):
+    """
+    Searches eBay for each keyword, fetches details for new listings and inserts them.
+    New listings rejected by the summary gate are recorded in gated_listings instead, without
+    fetching their details.
+
+    Item IDs already in ebay_listings are loaded once up front; every item queued for a detail
+    fetch is added to the same in-memory set, so an item found by several keywords or pages is
+    fetched and inserted exactly once.
+
+    Marketplaces are scraped concurrently, each through its own rate limiter, and prices are
+    converted into BASE_CURRENCY with the cached exchange rate table. A keyword with more
+    results than pagination can reach (eBay caps the offset) is split into disjoint price
+    bands, which are crawled in parallel.
+
+    In incremental mode each keyword (or band) is searched newest first and pagination stops
+    at the first listing older than the keyword's watermark (the newest listing the previous
+    incremental run saw). The watermark then moves to the newest listing seen this run, but only
+    if every search of the keyword reached the old watermark or ran out of results; a crawl cut
+    short by max_items_per_keyword, the offset cap or a failed request keeps the old watermark
+    (or none, on a keyword's first run), so the next run scans the skipped listings again.
+    Likewise, if a new listing's details couldn't be fetched, its price couldn't be converted or
+    it couldn't be stored, the watermark moves only as far as the oldest such listing, so the
+    next run retries it.
+
+    With a run_id, the next results page of every search is checkpointed once the listings
+    before it are stored; calling again with the same run_id resumes from those checkpoints
+    and reuses the run's price bands.
+
+    Args:
+        conn: The database connection object.
+        access_token (str): eBay OAuth access token.
+        keywords (list): Search keywords to scrape.
+        marketplace_ids (str or list): eBay marketplace ID(s) (e.g. 'EBAY_US' or ['EBAY_US', 'EBAY_GB']).
+        max_items_per_keyword (int): Stop a keyword after this many new items (per marketplace);
+                                     None for no cap.
+        filter_str (str): Optional Browse API filter string.
+        incremental (bool): Only scrape listings newer than each keyword's watermark.
+        on_item (callable): If given, each new listing dict is handed to on_item (e.g. the
+                            streaming pipeline) instead of being inserted here.
+        on_flush (callable): Called before a watermark is stored; must return once every item
+                             handed to on_item so far has been written, with the set of item
+                             IDs that couldn't be written.
+        run_id (str): Pipeline run to checkpoint progress under (see app/checkpoints.py).
+        on_checkpoint (callable): With on_item, receives each checkpoint tuple and must save it
+                                  with save_scrape_checkpoints once the items handed to on_item
+                                  before it have been written.
+
+    Returns:
+        dict: Run statistics ('items_processed', 'items_inserted', 'duplicates_skipped', 'gated',
+              'gate_reasons' counting rejections per reason, and 'unconverted' for listings
+              skipped because their price couldn't be converted).
+              items_inserted only counts listings inserted here, not ones handed to on_item.
+    """
+    if isinstance(marketplace_ids, str):
+        marketplace_ids = [marketplace_ids]
+
+    seen_item_ids = load_existing_item_ids(conn)
+    print(f"Loaded {len(seen_item_ids)} existing item IDs for deduplication.")
+    gated_item_ids = load_gated_item_ids(conn, GATE_RULES_VERSION)
+    seen_item_ids |= gated_item_ids
+    print(f"Loaded {len(gated_item_ids)} previously gated item IDs.")
+
+    stats = {'items_processed': 0, 'items_inserted': 0, 'duplicates_skipped': 0, 'gated': 0, 'gate_reasons': Counter(), 'unconverted': 0}
+    batch_items = []
+    pending_checkpoints = [] # Checkpoints waiting for batch_items to be inserted
+    unstored_item_ids = set() # Listings insert_batch couldn't store
+    lock = threading.Lock() # Guards seen_item_ids, stats, batch_items and conn across marketplace and price band workers
+
+    def flush_batch():
+        """Inserts batch_items, then saves the checkpoints that were waiting for them. Caller must hold lock."""
+        nonlocal batch_items, pending_checkpoints
+        if batch_items:
+            stored, failed_item_ids = insert_batch(conn, batch_items)
+            stats['items_inserted'] += stored
+            unstored_item_ids.update(failed_item_ids)
+            batch_items = []
+        save_scrape_checkpoints(conn, run_id, pending_checkpoints)
+        pending_checkpoints = []
+
+    def checkpoint(marketplace_id, search_keyword, search_filter, next_offset, completed):
+        """
+        Checkpoints a search once the listings handed on so far are stored. Caller must hold lock.
+        With on_item, returns the checkpoint instead, for the caller to pass to hand_on.
+        """
+        if run_id is None:
+            return None
+        checkpoint_data = (marketplace_id, search_keyword, search_filter, next_offset, completed)
+        if on_item:
+            return checkpoint_data
+        if batch_items:
+            pending_checkpoints.append(checkpoint_data)
+        else:
+            save_scrape_checkpoints(conn, run_id, [checkpoint_data])
+        return None
+
+    def hand_on(items, checkpoint_data=None):
+        """
+        Hands a page's listings, then its checkpoint, to on_item and on_checkpoint. Caller must
+        not hold lock: a full pipeline queue blocks here, and would stall every other search.
+        """
+        for item_data in items:
+            on_item(item_data)
+        if checkpoint_data and on_checkpoint:
+            on_checkpoint(checkpoint_data)
+
+    def keyword_capped(progress):
+        """True once a keyword has queued max_items_per_keyword new items. Caller must hold lock."""
+        return max_items_per_keyword is not None and progress['queued'] >= max_items_per_keyword
+
+    def watermark_after(progress, failed_inserts, newest_seen):
+        """
+        Where a keyword's watermark can move: newest_seen, or back to the oldest listing of this
+        run that wasn't stored, so the next run scans down to it again. None if such a listing
+        has no creation date.
+        """
+        unstored = progress['unstored'] | (failed_inserts & progress['created'].keys())
+        if not unstored:
+            return newest_seen
+        held = [(progress['created'].get(item_id), item_id) for item_id in unstored]
+        if any(created is None for created, _ in held):
+            return None
+        return min(held)
+
+    def crawl_search(marketplace_id, search_keyword, search_filter, watermark, progress, max_in_flight, start_offset=0):
+        """
+        Pages through one search (a whole keyword, or one of its price bands) and hands new
+        listings on, starting at start_offset. Returns (newest_seen, reached_watermark, exhausted,
+        failed); failed means a search request errored, so pages after it were never scanned.
+        """
+        page_number = start_offset // RESULTS_PER_PAGE + 1
+        total_fetched = start_offset
+        newest_seen = None # (creation date, item ID) of the newest listing seen in this search
+        reached_watermark = False
+        exhausted = False
+        failed = False
+
+        while page_number <= MAX_PAGES:
+            # Calculate offset for pagination; eBay refuses offsets past SEARCH_OFFSET_CAP
+            offset = (page_number - 1) * RESULTS_PER_PAGE
+            if offset + RESULTS_PER_PAGE > SEARCH_OFFSET_CAP:
+                break
+            with lock:
+                if keyword_capped(progress):
+                    break
+
+            item_summaries, total_listings = search_ebay_listings(
+                access_token=access_token,
+                search_query=search_keyword,
+                category_ids=CATEGORY_IDS,
+                limit=RESULTS_PER_PAGE,
+                marketplace_id=marketplace_id,
+                filter_str=search_filter,
+                sort_order=INCREMENTAL_SORT_ORDER if incremental else None,
+                offset=offset
+            )
+
+            if item_summaries is None:
+                # The request failed: the rest of the search is unscanned, not empty. No checkpoint,
+                # so a resumed run retries this page
+                print(f"Search for '{search_keyword}' ({search_filter or 'no filter'}) failed at page {page_number}; stopping it here.")
+                failed = True
+                break
+            if total_listings == 0 or not item_summaries:
+                print(f"No more listings found for '{search_keyword}' ({search_filter or 'no filter'}).")
+                exhausted = True
+                with lock:
+                    checkpoint_data = checkpoint(marketplace_id, search_keyword, search_filter, offset, True)
+                hand_on([], checkpoint_data)
+                break
+
+            new_summaries = []
+            gate_verdicts = []
+            with lock:
+                for summary in item_summaries:
+                    if keyword_capped(progress):
+                        break
+
+                    item_id = summary.get('itemId')
+                    if incremental:
+                        created = parse_item_creation_date(summary)
+                        if watermark and created and created < watermark[0]:
+                            reached_watermark = True
+                            break
+                        if created and (newest_seen is None or created > newest_seen[0]):
+                            newest_seen = (created, item_id)
+
+                    if item_id in seen_item_ids:
+                        stats['duplicates_skipped'] += 1
+                        continue
+                    seen_item_ids.add(item_id)
+
+                    # Skip the detail fetch for listings that can never become deals
+                    reason = gate_summary(summary)
+                    if reason:
+                        gate_verdicts.append(gate_verdict(summary, search_keyword, reason))
+                        stats['gate_reasons'][reason] += 1
+                        continue
+                    new_summaries.append(summary)
+                    progress['queued'] += 1
+                    if incremental:
+                        progress['created'][item_id] = created
+
+                if gate_verdicts:
+                    insert_gate_verdicts(conn, gate_verdicts)
+                    stats['gated'] += len(gate_verdicts)
+                    print(f"  Gated {len(gate_verdicts)} listings on page {page_number} without fetching details")
+
+            # Fetch details for the whole page concurrently
+            fetched = fetch_item_details_concurrently(access_token, new_summaries, marketplace_id, max_in_flight=max_in_flight)
+            items_processed_this_page = 0
+            streamed = [] # Handed to on_item once the lock is released
+            with lock:
+                for summary, item_details in fetched:
+                    if not item_details:
+                        progress['unstored'].add(summary.get('itemId'))
+                    else:  # Only add if we got details successfully
+                        item_data = build_item_data(summary, item_details, search_keyword, marketplace_id)
+                        if item_data is None:
+                            stats['unconverted'] += 1
+                            progress['unstored'].add(summary.get('itemId'))
+                            continue
+                        items_processed_this_page += 1
+                        if on_item:
+                            streamed.append(item_data)
+                            continue
+                        batch_items.append(item_data)
+
+                        # Process batch when it reaches BATCH_SIZE
+                        if len(batch_items) >= BATCH_SIZE:
+                            flush_batch()
+
+                progress['items'] += items_processed_this_page
+                stats['items_processed'] += items_processed_this_page
+
+                total_fetched += len(item_summaries)
+                exhausted = total_fetched >= total_listings
+                checkpoint_data = checkpoint(marketplace_id, search_keyword, search_filter, offset + RESULTS_PER_PAGE, reached_watermark or exhausted)
+            hand_on(streamed, checkpoint_data)
+            print(f"  Found {items_processed_this_page} new items for '{search_keyword}' on {marketplace_id} page {page_number}")
+
+            if reached_watermark:
+                print(f"Reached already-seen listings for '{search_keyword}' ({search_filter or 'no filter'}).")
+                break
+            if exhausted:
+                break
+            page_number += 1
+
+        return newest_seen, reached_watermark, exhausted, failed
+
+    def scrape_marketplace(marketplace_id, max_in_flight):
+        """Scrapes every keyword on one marketplace."""
+        for keyword_index, search_keyword in enumerate(keywords):
+            print(f"\n{'='*60}")
+            print(f"Processing keyword {keyword_index + 1}/{len(keywords)} on {marketplace_id}: '{search_keyword}'")
+            print(f"{'='*60}")
+
+            with lock:
+                watermark = get_watermark(conn, search_keyword, marketplace_id) if incremental else None
+                saved = get_scrape_checkpoints(conn, run_id, marketplace_id, search_keyword)
+            if watermark:
+                print(f"Watermark for '{search_keyword}' on {marketplace_id}: {watermark[0]} ({watermark[1]})")
+
+            if saved:
+                # Resuming: reuse the run's searches and skip the pages already stored
+                search_filters = [search_filter or None for search_filter in saved]
+                start_offsets = {search_filter or None: next_offset for search_filter, (next_offset, completed) in saved.items() if not completed}
+                print(f"Resuming '{search_keyword}' on {marketplace_id}: {len(start_offsets)}/{len(saved)} searches left")
+            else:
+                # Keywords with more results than pagination can reach are split into disjoint price bands
+                bands = partition_price_bands(access_token, search_keyword, marketplace_id, filter_str) if USE_PRICE_PARTITIONING else [(None, None, 0)]
+                currency = marketplace_currency(marketplace_id)
+                search_filters = [filter_str if low is None else band_filter(filter_str, (low, high), currency) for low, high, _ in bands]
+                start_offsets = {search_filter: 0 for search_filter in search_filters}
+                with lock:
+                    save_scrape_checkpoints(conn, run_id, [(marketplace_id, search_keyword, search_filter, 0, False) for search_filter in search_filters])
+            # created: creation date of every item queued for details (incremental only);
+            # unstored: items whose details or price conversion failed
+            progress = {'queued': 0, 'items': 0, 'created': {}, 'unstored': set()}
+
+            # Bands share the marketplace's detail fetch budget, so the number of requests in flight stays the same
+            workers = max(1, min(PARTITION_CONCURRENCY, len(start_offsets)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda search_filter: crawl_search(marketplace_id, search_keyword, search_filter, watermark, progress,
+                                                       max(1, max_in_flight // workers), start_offsets[search_filter]),
+                    list(start_offsets)
+                ))
+
+            print(f"Completed '{search_keyword}' on {marketplace_id}: {progress['items']} items processed across {len(search_filters)} searches")
+
+            newest_seen = max((result[0] for result in results if result[0]), default=None)
+            complete = all(reached or exhausted for _, reached, exhausted, _ in results)
+            failed = any(result[3] for result in results)
+            if incremental and failed:
+                print(f"Keeping the watermark for '{search_keyword}' on {marketplace_id}: a search request failed")
+
+            # Only move the watermark if nothing between it and the newest listing was left unscanned.
+            # That holds for a keyword's first incremental run too: a crawl cut short by
+            # max_items_per_keyword or the offset cap leaves older listings below the new watermark
+            if incremental and not failed and not complete:
+                print(f"Keeping the watermark for '{search_keyword}' on {marketplace_id}: the crawl was cut short")
+            if incremental and newest_seen and not failed and complete:
+                # Flush pending inserts first so the watermark never gets ahead of stored listings
+                with lock:
+                    flush_batch()
+                pipeline_unstored = on_flush() if on_flush else set()
+                with lock:
+                    new_watermark = watermark_after(progress, unstored_item_ids | (pipeline_unstored or set()), newest_seen)
+                    if new_watermark is None:
+                        print(f"Keeping the watermark for '{search_keyword}' on {marketplace_id}: "
+                              f"a listing that wasn't stored has no creation date")
+                    else:
+                        if new_watermark != newest_seen:
+                            print(f"Holding the watermark for '{search_keyword}' on {marketplace_id} at {new_watermark[0]}: "
+                                  f"some new listings weren't stored")
+                        update_watermark(conn, search_keyword, marketplace_id, new_watermark[0], new_watermark[1])
+
+    # Each marketplace has its own rate budget, so they run side by side rather than one after another
+    with ThreadPoolExecutor(max_workers=len(marketplace_ids)) as executor:
+        futures = [executor.submit(scrape_marketplace, marketplace_id, DETAIL_FETCH_CONCURRENCY) for marketplace_id in marketplace_ids]
+        for future in futures:
+            future.result()
+
+    # Process any remaining items in the final batch
+    with lock:
+        flush_batch()
+
+    print(f"Skipped {stats['duplicates_skipped']} duplicate items")
+    if stats['unconverted']:
+        print(f"Skipped {stats['unconverted']} items whose price couldn't be converted to {BASE_CURRENCY}")
+    print(f"Gated {stats['gated']} items before fetching details")
+    for reason, count in stats['gate_reasons'].most_common():
+        print(f"  {reason}: {count}")
+    return stats
@@ -0,0 +1,95 @@
+from decimal import Decimal, ROUND_DOWN
+from app.ebay_search import (
+    search_ebay_listings, CATEGORY_IDS, RESULTS_PER_PAGE, MAX_PAGES, SEARCH_OFFSET_CAP,
+    PRICE_PARTITION_CEILING, marketplace_currency
+)
+
+# A band is crawlable when all its results fit in the pages we are allowed to fetch
+MAX_RESULTS_PER_SEARCH = min(MAX_PAGES * RESULTS_PER_PAGE, SEARCH_OFFSET_CAP)
+PRICE_STEP = Decimal('0.01') # Bands are inclusive at both ends, so neighbours are one cent apart
+
+
+def band_filter(filter_str, band, currency):
+    """
+    Adds a price band to a Browse API filter string.
+
+    Args:
+        filter_str (str): The keyword's base filter string, or None.
+        band (tuple): (low, high) prices as Decimals; high is None for an open-ended band.
+        currency (str): Currency the band is expressed in (eBay requires priceCurrency with price).
+
+    Returns:
+        str: The combined filter string.
+    """
+    low, high = band
+    price_filter = f"price:[{low}..{high if high is not None else ''}],priceCurrency:{currency}"
+    return f"{filter_str},{price_filter}" if filter_str else price_filter
+
+
+def count_results(access_token, keyword, marketplace_id, filter_str):
+    """Returns the total number of results for a search, or None if the probe failed."""
+    item_summaries, total = search_ebay_listings(
+        access_token=access_token,
+        search_query=keyword,
+        category_ids=CATEGORY_IDS,
+        limit=1,
+        marketplace_id=marketplace_id,
+        filter_str=filter_str
+    )
+    if item_summaries is None:
+        return None
+    return total
+
+
+def partition_price_bands(access_token, keyword, marketplace_id, filter_str=None, max_results=MAX_RESULTS_PER_SEARCH):
+    """
+    Splits a keyword's search into disjoint price bands that each return no more than
+    max_results listings, so every listing can be reached despite eBay's offset cap.
+
+    Bands are in the marketplace's currency and cover [0, PRICE_PARTITION_CEILING] plus an
+    open-ended band above it. They are halved recursively while their total exceeds
+    max_results. A band that can't be split any further (a single price with too many
+    listings) is kept and will be truncated.
+
+    Args:
+        access_token (str): eBay OAuth access token.
+        keyword (str): The search keyword.
+        marketplace_id (str): eBay marketplace ID (e.g. 'EBAY_US').
+        filter_str (str): The keyword's base filter string, or None.
+        max_results (int): Largest total a band may have.
+
+    Returns:
+        list: (low, high, total) tuples in ascending price order (total is 0 when the band
+              couldn't be counted), or [(None, None, total)] when the unpartitioned search
+              already fits.
+    """
+    total = count_results(access_token, keyword, marketplace_id, filter_str)
+    if total is None or total <= max_results:
+        return [(None, None, total or 0)]
+
+    print(f"  '{keyword}' has {total} results, more than the {max_results} reachable; partitioning by price...")
+    currency = marketplace_currency(marketplace_id)
+    ceiling = Decimal(str(PRICE_PARTITION_CEILING))
+    pending = [(Decimal('0'), ceiling), (ceiling + PRICE_STEP, None)]
+    bands = []
+    while pending:
+        low, high = pending.pop()
+        band_total = count_results(access_token, keyword, marketplace_id, band_filter(filter_str, (low, high), currency))
+        if band_total is None:
+            print(f"  Probe failed for band {low}..{high}; crawling it whole")
+            bands.append((low, high, 0))
+            continue
+        if band_total == 0:
+            continue
+        if band_total <= max_results or high is None or high == low:
+            if band_total > max_results:
+                print(f"  Band {low}..{high} has {band_total} results and can't be split further; it will be truncated")
+            bands.append((low, high, band_total))
+            continue
+        middle = (low + (high - low) / 2).quantize(PRICE_STEP, rounding=ROUND_DOWN)
+        pending.append((middle + PRICE_STEP, high))
+        pending.append((low, middle))
+
+    bands.sort(key=lambda band: band[0])
+    print(f"  Partitioned '{keyword}' into {len(bands)} price bands covering {sum(band[2] for band in bands)} results")
+    return bands
@@ -0,0 +1,252 @@
+"""
+Listing price history: every pipeline run appends a snapshot of each listing's price, profit and
+scam score to listing_snapshots, so price drops and relistings stay visible after ebay_listings
+(which only holds the current state) is rebuilt.
+
+listing_snapshots is range-partitioned by month on captured_at (migration 4). The partitions a
+capture needs are created right before it, and partitions past the retention period are
+dropped whole, which is far cheaper than deleting old rows.
+
+Run from the backend directory:
+    python -m app.snapshots partitions    # create upcoming / drop expired partitions, list them
+"""
+import argparse
+import os
+import re
+from datetime import date
+import psycopg2
+from dotenv import load_dotenv
+from app.database import connect_to_db
+from app.checkpoints import MARK_STEP_COMPLETED_SQL
+
+load_dotenv()
+
+# --- Configuration ---
+SNAPSHOT_RETENTION_MONTHS = int(os.getenv('SNAPSHOT_RETENTION_MONTHS', '24')) # Monthly partitions older than this are dropped
+SNAPSHOT_PARTITIONS_AHEAD = 1 # Months of partitions created beyond the current one
+PARTITION_NAME = re.compile(r'^listing_snapshots_(\d{4})_(\d{2})$')
+
+
+def _add_months(month_start, months):
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month_start):
+    return f"listing_snapshots_{month_start:%Y_%m}"
+
+
+def _parent_schema(cursor):
+    # Partitions go next to the parent, whatever schema a shadow generation puts first on search_path
+    cursor.execute("SELECT relnamespace::regnamespace::text FROM pg_class WHERE oid = 'listing_snapshots'::regclass;")
+    return cursor.fetchone()[0]
+
+
+def _list_partitions(cursor):
+    cursor.execute("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'listing_snapshots'::regclass;
+    """)
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def get_snapshot_partitions(conn):
+    """
+    Returns:
+        list: (partition name, first day of its month) for each monthly partition, oldest first.
+    """
+    cursor = conn.cursor()
+    try:
+        partitions = _list_partitions(cursor)
+        conn.commit()
+        return partitions
+    finally:
+        cursor.close()
+
+
+def manage_snapshot_partitions(conn, retention_months=SNAPSHOT_RETENTION_MONTHS, months_ahead=SNAPSHOT_PARTITIONS_AHEAD):
+    """
+    Creates the partitions for the current month and months_ahead after it, and drops the
+    ones that ended more than retention_months ago. Months are UTC.
+
+    Returns:
+        tuple: (names of created partitions, names of dropped partitions)
+
+    Raises:
+        Exception: If a partition can't be created or dropped.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT (NOW() AT TIME ZONE 'UTC')::date;")
+        today = cursor.fetchone()[0]
+        current_month = date(today.year, today.month, 1)
+        schema = _parent_schema(cursor)
+        partitions = _list_partitions(cursor)
+        existing = {name for name, _ in partitions}
+
+        created = []
+        for offset in range(months_ahead + 1):
+            month_start = _add_months(current_month, offset)
+            name = _partition_name(month_start)
+            if name in existing:
+                continue
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.{name} PARTITION OF {schema}.listing_snapshots
+                FOR VALUES FROM ('{month_start} 00:00+00') TO ('{_add_months(month_start, 1)} 00:00+00');
+            """)
+            created.append(name)
+
+        cutoff = _add_months(current_month, -retention_months)
+        dropped = []
+        for name, month_start in partitions:
+            if _add_months(month_start, 1) <= cutoff:
+                cursor.execute(f"DROP TABLE IF EXISTS {schema}.{name};")
+                dropped.append(name)
+        conn.commit()
+        return created, dropped
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error managing listing snapshot partitions: {e}")
+    finally:
+        cursor.close()
+
+
+def capture_snapshots(conn, run_id=None, only_changed=False):
+    """
+    Appends a snapshot of every listing in ebay_listings with one INSERT ... SELECT, after
+    making sure its partition exists and dropping expired ones.
+
+    Args:
+        conn: The database connection object.
+        run_id (str): Pipeline run the snapshots belong to. Its 'snapshot' step is marked
+                      completed in the same transaction, so a resumed run never captures twice.
+        only_changed (bool): Skip listings whose price, profit and scam score are unchanged
+                             since their latest snapshot (incremental runs, which keep
+                             listings that weren't scraped again).
+
+    Returns:
+        int: Number of snapshots written.
+
+    Raises:
+        Exception: If the capture fails; nothing is written then.
+    """
+    created, dropped = manage_snapshot_partitions(conn)
+    for name in created:
+        print(f"Created partition '{name}'.")
+    for name in dropped:
+        print(f"Dropped expired partition '{name}'.")
+
+    query = """
+        INSERT INTO listing_snapshots (item_id, captured_at, run_id, price, currency, original_price,
+                                       original_currency, melt_value, profit, scam_risk_score)
+        SELECT item_id, NOW(), %s, price, currency, original_price, original_currency, melt_value, profit, scam_risk_score
+        FROM ebay_listings AS listing
+    """
+    if only_changed:
+        # The latest snapshot is one index probe per listing on (item_id, captured_at)
+        query += """
+        WHERE NOT EXISTS (
+            SELECT 1 FROM (
+                SELECT price, profit, scam_risk_score FROM listing_snapshots AS snapshot
+                WHERE snapshot.item_id = listing.item_id
+                ORDER BY captured_at DESC LIMIT 1
+            ) AS latest
+            WHERE latest.price = listing.price
+                AND latest.profit IS NOT DISTINCT FROM listing.profit
+                AND latest.scam_risk_score IS NOT DISTINCT FROM listing.scam_risk_score
+        )
+        """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, (run_id,))
+        captured = cursor.rowcount
+        if run_id is not None:
+            cursor.execute(MARK_STEP_COMPLETED_SQL, ('snapshot', run_id, 'snapshot'))
+        conn.commit()
+        print(f"Captured {captured} listing snapshots.")
+        return captured
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"Error capturing listing snapshots: {e}")
+    finally:
+        cursor.close()
+
+
+def get_listing_history(conn, item_id, days=None):
+    """
+    Returns an item's snapshots, oldest first, in the frontend's field names.
+
+    Args:
+        conn: The database connection object.
+        item_id (str): The eBay item ID.
+        days (int): Only return snapshots from the last days days; older partitions aren't scanned.
+
+    Returns:
+        list: Snapshot dicts, or None on error.
+    """
+    if conn is None:
+        return None
+    query = """
+        SELECT captured_at, price, currency, original_price, original_currency, melt_value, profit, scam_risk_score
+        FROM listing_snapshots
+        WHERE item_id = %s
+    """
+    params = [item_id]
+    if days is not None:
+        query += " AND captured_at >= NOW() - make_interval(days => %s)"
+        params.append(days)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query + " ORDER BY captured_at;", params)
+        rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error fetching history for item {item_id}: {e}")
+        return None
+    finally:
+        cursor.close()
+
+    def number(value):
+        return float(value) if value is not None else None
+
+    return [{
+        'capturedAt': captured_at.isoformat(),
+        'price': number(price),
+        'currency': currency,
+        'originalPrice': number(original_price),
+        'originalCurrency': original_currency,
+        'meltValue': number(melt_value),
+        'profit': number(profit),
+        'profitPct': number(profit / price * 100) if profit is not None and price else None,
+        'scamRisk': scam_risk_score,
+    } for captured_at, price, currency, original_price, original_currency, melt_value, profit, scam_risk_score in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Listing snapshot partitions")
+    parser.add_argument('command', choices=['partitions'])
+    parser.add_argument('--retention-months', type=int, default=SNAPSHOT_RETENTION_MONTHS)
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    if conn is None:
+        exit(1)
+    try:
+        created, dropped = manage_snapshot_partitions(conn, retention_months=args.retention_months)
+        for name in created:
+            print(f"  created {name}")
+        for name in dropped:
+            print(f"  dropped {name}")
+        for name, month_start in get_snapshot_partitions(conn):
+            print(f"  {name:28} {month_start:%Y-%m}")
+    except Exception as e:
+        print(e)
+        exit(1)
+    finally:
+        conn.close()
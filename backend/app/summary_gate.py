@@ -0,0 +1,98 @@
+import os # for .env file
+import re
+from dotenv import load_dotenv
+from app.fx_rates import to_base_currency
+
+load_dotenv()
+
+# --- Configuration ---
+# Rules applied to search result titles and prices before any item details are fetched.
+# A summary rejected here can never become a deal, so it costs no getItem call.
+GATE_ENABLED = os.getenv('SUMMARY_GATE_ENABLED', 'true').lower() != 'false'
+# Stored with every verdict in gated_listings; only verdicts of the current version make later runs
+# skip a listing, so bump this whenever the rules below change and the rejected listings get re-gated
+GATE_RULES_VERSION = 1
+# Title must mention gold or a karat/fineness mark; the Metal aspect can still say gold when the title
+# only says "14k", so karat marks count too
+GATE_REQUIRED_PATTERN = r"gold|\b(?:[1-9]|1\d|2[0-4])\s?(?:k|kt|karat|carat)\b|\b(?:375|417|585|750|916|999)\b"
+# Only gold-specific phrases: bare "plated" or "GF" also match "14K white gold rhodium plated" and
+# "10k GF (grandfather) ring"
+GATE_REJECT_TERMS = [
+    'gold plated', 'gold-plated', 'electroplated', 'gold filled', 'gold-filled', 'gold fill',
+    'gold tone', 'gold-tone', 'goldtone', 'vermeil', 'rolled gold', 'gold overlay', 'gold leaf',
+    'gold wash', 'gold finish', 'hge', 'rgp', 'faux', 'imitation',
+]
+# Testing kits, like the classifier's "test" check; "acid tested" gold is what scrap buyers want
+GATE_REJECT_PATTERN = r"\btest(?:s|er|ers|ing)?\b"
+GATE_NEGATIONS = ['not', 'no', 'non'] # "not plated" / "no gold filled" don't count as rejections
+GATE_NEGATION_WINDOW = 3 # Words before a term (in the same clause) searched for a negation: "not real gold plated"
+GATE_MIN_PRICE = float(os.getenv('SUMMARY_GATE_MIN_PRICE', '1')) # In BASE_CURRENCY; listings below this are bait or accessories
+GATE_MAX_PRICE = float(os.getenv('SUMMARY_GATE_MAX_PRICE', '0')) or None # 0 = no upper limit
+
+# Longest terms first, so "gold-filled" is decided before the shorter "gold fill" overlapping it is tried
+_reject_patterns = [
+    (term, re.compile(rf"(?<!\w){re.escape(term)}(?!\w)", re.IGNORECASE))
+    for term in sorted(GATE_REJECT_TERMS, key=len, reverse=True)
+]
+_required_pattern = re.compile(GATE_REQUIRED_PATTERN, re.IGNORECASE)
+_reject_pattern = re.compile(GATE_REJECT_PATTERN, re.IGNORECASE)
+_clause_break = re.compile(r"[,;|!]|\.(?:\s|$)")
+
+
+def _is_negated(title, start):
+    """True if a negation is among the last GATE_NEGATION_WINDOW words of the clause before start."""
+    clause = _clause_break.split(title[:start])[-1]
+    words = re.findall(r"\w+", clause.lower())
+    for index in range(max(0, len(words) - GATE_NEGATION_WINDOW), len(words)):
+        # "no reserve" is an auction term, not a negation
+        if words[index] in GATE_NEGATIONS and not (words[index] == 'no' and words[index + 1:index + 2] == ['reserve']):
+            return True
+    return False
+
+
+def _rejected_term(title):
+    """Returns the first reject term in the title that isn't negated, or None."""
+    claimed = [] # (start, end) of every term matched so far, negated or not
+    for term, pattern in _reject_patterns:
+        for match in pattern.finditer(title):
+            if any(start < match.end() and match.start() < end for start, end in claimed):
+                continue # Part of a longer term that was already decided
+            claimed.append(match.span())
+            if not _is_negated(title, match.start()):
+                return term
+    if _reject_pattern.search(title):
+        return 'test'
+    return None
+
+
+def gate_summary(summary):
+    """
+    Decides from a search result alone whether a listing is worth fetching details for.
+
+    Args:
+        summary (dict): An itemSummaries entry from search_ebay_listings.
+
+    Returns:
+        str: The rejection reason (e.g. 'reject_term:gold plated', 'missing_term', 'price_below_min'),
+             or None if the listing passes the gate.
+    """
+    if not GATE_ENABLED:
+        return None
+
+    title = summary.get('title') or ''
+    if not _required_pattern.search(title):
+        return 'missing_term'
+
+    term = _rejected_term(title)
+    if term:
+        return f"reject_term:{term}"
+
+    price = to_base_currency(summary.get('price', {}).get('value'), summary.get('price', {}).get('currency'))
+    if price is None:
+        return None # Let the details decide; the price may come back with them
+    price = float(price)
+    if price < GATE_MIN_PRICE:
+        return 'price_below_min'
+    if GATE_MAX_PRICE is not None and price > GATE_MAX_PRICE:
+        return 'price_above_max'
+    return None
@@ -0,0 +1,169 @@
+import os # for .env file
+import base64 # for base64 encoding OAuth credentials
+import json # for the on-disk token cache
+import threading
+import time
+import requests # for HTTP request exceptions
+from dotenv import load_dotenv
+from app.http_client import http_post
+
+load_dotenv()
+
+# --- Configuration ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN_CACHE_PATH = os.getenv('EBAY_TOKEN_CACHE_PATH', os.path.join(BACKEND_DIR, '.ebay_token_cache.json'))
+REFRESH_MARGIN_SECONDS = 300 # Refresh this long before the token actually expires
+OAUTH_SCOPE = 'https://api.ebay.com/oauth/api_scope'
+
+# Shared by every worker thread in the process; the disk cache shares it across processes and runs
+_lock = threading.Lock()
+_token = None # {'access_token': str, 'expires_at': float, 'client_id': str}
+_credentials = None # (client_id, client_secret, token_url) from the last get_access_token call
+
+
+def request_access_token(client_id, client_secret, token_url):
+    """
+    Obtains a new OAuth access token from eBay using Client Credentials Grant.
+
+    Returns:
+        dict: The token response ('access_token', 'expires_in', ...), or None on failure.
+    """
+    print("Requesting Access Token...")
+
+    try:
+        # Set the following HTTP request headers:
+            # Content-Type – Must be set to: application/x-www-form-urlencoded
+            # Authorization – The word "Basic " followed by your Base64-encoded OAuth credentials (<client_id>:<client_secret>).
+        credentials = f"{client_id}:{client_secret}"
+        encoded_credentials = base64.b64encode(credentials.encode()).decode()
+        headers = {
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Authorization': f'Basic {encoded_credentials}'
+        }
+
+        # Format the payload of your POST request with the following values:
+        # Set grant_type to client_credentials.
+            # Set scope to the URL-encoded space-separated list of the scopes needed for the
+            # interfaces you call with the access token.
+        payload = {
+                'grant_type': 'client_credentials',
+                'scope': OAUTH_SCOPE
+        }
+
+        response = http_post(token_url, headers=headers, data=payload)
+        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+
+        token_data = response.json()
+        if not token_data.get('access_token'):
+                print("Error: Could not retrieve access token.")
+                print("Response:", response.text)
+                return None
+
+        print(f"Access Token obtained successfully! Expires in {token_data.get('expires_in')} seconds")
+        return token_data
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error getting access token: {e}")
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"Response status code: {e.response.status_code}")
+            print(f"Response text: {e.response.text}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred during token retrieval: {e}")
+        return None
+
+
+def _is_fresh(token, client_id):
+    return (
+        token is not None
+        and token.get('client_id') == client_id
+        and token.get('expires_at', 0) - REFRESH_MARGIN_SECONDS > time.time()
+    )
+
+
+def _load_cached_token():
+    try:
+        with open(TOKEN_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_token(token):
+    try:
+        tmp_path = f"{TOKEN_CACHE_PATH}.tmp"
+        # Only the owner may read the token file
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(token, f)
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: could not write token cache '{TOKEN_CACHE_PATH}': {e}")
+
+
+def _refresh_locked(client_id, client_secret, token_url):
+    """Requests a new token and stores it in memory and on disk. Caller must hold _lock."""
+    global _token
+    token_data = request_access_token(client_id, client_secret, token_url)
+    if not token_data:
+        return None
+    _token = {
+        'access_token': token_data['access_token'],
+        'expires_at': time.time() + int(token_data.get('expires_in', 7200)),
+        'client_id': client_id,
+    }
+    _save_cached_token(_token)
+    return _token['access_token']
+
+
+def get_access_token(client_id, client_secret, token_url):
+    """
+    Returns a valid access token, reusing the in-memory or on-disk cached token until
+    shortly before it expires.
+
+    Returns:
+        str: The access token, or None if a new one could not be obtained.
+    """
+    global _token, _credentials
+    with _lock:
+        _credentials = (client_id, client_secret, token_url)
+        if _is_fresh(_token, client_id):
+            return _token['access_token']
+
+        cached = _load_cached_token()
+        if _is_fresh(cached, client_id):
+            print("Using cached access token.")
+            _token = cached
+            return _token['access_token']
+
+        return _refresh_locked(client_id, client_secret, token_url)
+
+
+def current_access_token(access_token):
+    """
+    Returns the token workers should send right now.
+
+    Once get_access_token has been called, this is the shared cached token, refreshed
+    proactively when it is about to expire. Before that, access_token is returned as is.
+    """
+    if _credentials is None:
+        return access_token
+    return get_access_token(*_credentials) or access_token
+
+
+def refresh_access_token(stale_token):
+    """
+    Refreshes the shared token after stale_token was rejected with a 401.
+
+    When several workers hit the 401 at once only the first one requests a new token;
+    the others get the token it obtained.
+
+    Returns:
+        str: The new access token, or None if no refresh was possible.
+    """
+    if _credentials is None:
+        return None
+    with _lock:
+        if _token is not None and _token['access_token'] != stale_token:
+            return _token['access_token'] # Another worker already refreshed it
+        return _refresh_locked(*_credentials)
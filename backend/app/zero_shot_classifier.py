@@ -1,5 +1,6 @@
 from transformers import pipeline
 import re
+from app.database import bulk_update_listings, stream_rows, STAGE_CHUNK_SIZE
 
 
 # Load the zero-shot classification pipeline
@@ -52,37 +53,38 @@ def classify_listing(row):
     return False
     
 
-def update_gold_column(conn):
+def update_gold_column(conn, only_unclassified=False, chunk_size=STAGE_CHUNK_SIZE):
     """
-    Fetches rows from the ebay_listings table, classifies each row, and updates the 'is_gold' column.
+    Streams rows from the ebay_listings table, classifies each row, and updates the 'is_gold' column.
 
     Args:
         conn: The database connection object.
-    """
-    cursor = conn.cursor()
+        only_unclassified: If True, only classify rows whose 'is_gold' is still NULL (new listings).
+        chunk_size: Rows fetched from the database per round trip, and written per bulk update.
 
+    Raises:
+        Exception: If the rows can't be read or updated; the chunk being written is rolled back.
+    """
     try:
-        # Fetch all rows from the ebay_listings table
-        query = "SELECT item_id, title, description, metal, total_carat_weight, metal_purity FROM ebay_listings;"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        # Classify each row and update the 'gold' column
-        for row in rows:
-            result = classify_listing(row)
-
-            # Update the 'gold' column for the current row
-            update_query = "UPDATE ebay_listings SET is_gold = %s WHERE item_id = %s;"
-            cursor.execute(update_query, (result, row[0]))
-
-        conn.commit()
+        # Stream the rows from the ebay_listings table rather than loading every description at once
+        query = "SELECT item_id, title, description, metal, total_carat_weight, metal_purity FROM ebay_listings"
+        if only_unclassified:
+            query += " WHERE is_gold IS NULL"
+
+        # Classify each row and update the 'gold' column, one chunk of streamed rows per statement
+        updates = []
+        for row in stream_rows(conn, query + ";", chunk_size=chunk_size):
+            updates.append((row[0], classify_listing(row)))
+            if len(updates) >= chunk_size:
+                bulk_update_listings(conn, ['is_gold'], updates)
+                updates = []
+        bulk_update_listings(conn, ['is_gold'], updates)
+        conn.commit()  # Ends the read transaction even when there was nothing to update
         print("Updated 'gold' column for all rows in the ebay_listings table.")
 
     except Exception as e:
         conn.rollback()
-        print(f"Error updating 'gold' column: {e}")
-    finally:
-        cursor.close()
+        raise Exception(f"Error updating 'gold' column: {e}")
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
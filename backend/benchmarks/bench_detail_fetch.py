@@ -0,0 +1,67 @@
+"""
+Throughput benchmark for the item detail fetcher.
+
+Starts the local mock Browse API (app/mock_ebay_api.py) with a fixed per-request latency,
+then compares fetching a page of items one at a time against fetch_item_details_concurrently
+with single getItem calls and with getItems batches.
+
+Run from the backend directory:
+    python -m benchmarks.bench_detail_fetch --items 100 --latency 0.2 --concurrency 8
+"""
+import argparse
+import time
+
+import app.ebay_search as ebay_search
+from app.detail_fetcher import fetch_item_details_concurrently
+from app.http_client import print_connection_stats
+from app.rate_limit import set_rate_limit
+from app.mock_ebay_api import start_mock_server, point_scraper_at
+
+
+def run_benchmark(items, latency, concurrency, rate):
+    server, base_url, stats = start_mock_server(latency=latency)
+    point_scraper_at(base_url)
+    set_rate_limit('ebay', rate, burst_size=max(1, int(rate)))
+
+    summaries = [{'itemId': f'v1|{100000 + i}|0'} for i in range(items)]
+
+    def api_calls():
+        return stats.get('item', 0) + stats.get('items', 0)
+
+    def timed(label, fetch):
+        calls_before = api_calls()
+        start = time.perf_counter()
+        details = fetch()
+        seconds = time.perf_counter() - start
+        print(f"{label:<20} {seconds:6.2f} s ({items / seconds:7.1f} items/s, {api_calls() - calls_before} API calls)")
+        return details, seconds
+
+    print("=" * 60)
+    print(f"Items: {items}, mock latency: {latency * 1000:.0f} ms, concurrency: {concurrency}")
+    sequential, sequential_seconds = timed("Sequential", lambda: [
+        ebay_search.get_item_details('mock-token', s['itemId'], 'EBAY_US') for s in summaries
+    ])
+    concurrent, concurrent_seconds = timed("Concurrent getItem", lambda: [
+        details for _, details in fetch_item_details_concurrently('mock-token', summaries, 'EBAY_US', max_in_flight=concurrency, use_batch=False, use_cache=False)
+    ])
+    batched, batched_seconds = timed("Concurrent getItems", lambda: [
+        details for _, details in fetch_item_details_concurrently('mock-token', summaries, 'EBAY_US', max_in_flight=concurrency, use_batch=True, use_cache=False)
+    ])
+    server.shutdown()
+
+    assert sequential == concurrent == batched, "Concurrent results differ from sequential results"
+
+    print(f"Speedup: {sequential_seconds / concurrent_seconds:.1f}x (getItem), {sequential_seconds / batched_seconds:.1f}x (getItems)")
+    print("Connection reuse:")
+    print_connection_stats()
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs concurrent item detail fetching")
+    parser.add_argument('--items', type=int, default=100, help="Number of items to fetch")
+    parser.add_argument('--latency', type=float, default=0.2, help="Mock API latency per request in seconds")
+    parser.add_argument('--concurrency', type=int, default=ebay_search.DETAIL_FETCH_CONCURRENCY, help="Max requests in flight")
+    parser.add_argument('--rate', type=float, default=1000, help="Rate limiter requests/second (the mock has no quota)")
+    args = parser.parse_args()
+    run_benchmark(args.items, args.latency, args.concurrency, args.rate)
@@ -0,0 +1,89 @@
+"""
+Listing insert throughput benchmark: one INSERT and commit per listing (insert_data) against
+insert_listings_bulk (multi-row INSERTs, one transaction per batch).
+
+Needs the database from .env. Everything is written to a throwaway schema that is dropped
+afterwards, so existing listings are not touched.
+
+Run from the backend directory:
+    python -m benchmarks.bench_insert --rows 5000 --batch-size 100
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from app.database import connect_to_db, create_tables, insert_data, insert_listings_bulk
+from app.migrations import apply_migrations
+
+
+def synthetic_listing(index):
+    return {
+        'item_id': f'v1|{index:09d}|0', 'title': f'14K yellow gold chain scrap lot #{index}',
+        'price': f'{100 + index % 900}.00', 'currency': 'USD', 'seller_username': f'seller{index % 50}',
+        'seller_feedback_score': 1000 + index % 500, 'feedback_percent': '99.5',
+        'image_url': 'https://i.ebayimg.com/images/g/bench/s-l1600.jpg',
+        'item_url': f'https://www.ebay.com/itm/{index}',
+        'shipping_options': [{'shippingCost': {'value': '0.00', 'currency': 'USD'}}],
+        'top_rated_buying_experience': index % 2 == 0, 'description': 'Broken 14K gold chain, 5.2 grams. ' * 20,
+        'returns_accepted': True, 'item_specifics': {'Metal': 'Yellow Gold', 'Metal Purity': '14k'},
+        'metal': 'Yellow Gold', 'marketplace_id': 'EBAY_US', 'original_price': f'{100 + index % 900}.00',
+        'original_currency': 'USD',
+    }
+
+
+def run_benchmark(rows, batch_size):
+    conn = connect_to_db()
+    if conn is None:
+        raise SystemExit("Could not connect to the database configured in .env")
+    schema = f"bench_insert_{os.getpid()}"
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE SCHEMA {schema}; SET search_path TO {schema};")
+    conn.commit()
+    cursor.close()
+
+    def reset():
+        with conn.cursor() as cursor:
+            cursor.execute("TRUNCATE TABLE ebay_listings CASCADE;")
+        conn.commit()
+
+    def timed(label, insert):
+        reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # insert_data prints a line per row
+            insert()
+        seconds = time.perf_counter() - start
+        print(f"{label:<28} {seconds:7.2f} s ({rows / seconds:9.1f} rows/s)")
+        return seconds
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_tables(conn)
+            apply_migrations(conn) # The feed indexes are part of the per-insert cost
+        listings = [synthetic_listing(i) for i in range(rows)]
+        batches = [listings[i:i + batch_size] for i in range(0, rows, batch_size)]
+
+        print("=" * 60)
+        print(f"Rows: {rows}, batch size: {batch_size}")
+        per_row = timed("insert_data (per row)", lambda: [insert_data(conn, "ebay_listings", listing) for listing in listings])
+        bulk = timed("insert_listings_bulk", lambda: [insert_listings_bulk(conn, batch) for batch in batches])
+        # Re-inserting the same batch measures the ON CONFLICT path of an incremental re-scrape
+        counts = insert_listings_bulk(conn, batches[0])
+        print(f"Re-inserted batch: {counts['inserted']} inserted, {counts['duplicates']} duplicates, {counts['failed']} failed")
+        print(f"Speedup: {per_row / bulk:.1f}x")
+        print("=" * 60)
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE;")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-row against bulk listing inserts")
+    parser.add_argument('--rows', type=int, default=5000, help="Synthetic listings to insert")
+    parser.add_argument('--batch-size', type=int, default=100, help="Listings per insert_listings_bulk call (the scraper's BATCH_SIZE)")
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.batch_size)
@@ -0,0 +1,64 @@
+"""
+End-to-end scraping throughput benchmark against the local mock eBay API.
+
+Runs scrape_listings (search + detail fetch) for a set of keywords with no database
+connection, so only the API side is measured. Latency, error rate and result counts are
+configurable, which makes runs reproducible on a laptop without spending API quota.
+
+Run from the backend directory:
+    python -m benchmarks.bench_scrape --keywords 3 --results 500 --latency 0.1 --error-rate 0.02
+    python -m benchmarks.bench_scrape --marketplaces EBAY_US,EBAY_GB,EBAY_DE
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# Throwaway caches, so every run measures the API instead of a previous run's cached details
+_cache_dir = tempfile.mkdtemp(prefix='bench_scrape_')
+os.environ['DETAIL_CACHE_PATH'] = os.path.join(_cache_dir, 'item_detail_cache.sqlite')
+os.environ['EBAY_TOKEN_CACHE_PATH'] = os.path.join(_cache_dir, 'token_cache.json')
+os.environ['FX_CACHE_PATH'] = os.path.join(_cache_dir, 'fx_rates_cache.json')
+
+from app.mock_ebay_api import start_mock_server, point_scraper_at
+from app.ebay_search import get_access_token, SEARCH_KEYWORDS
+from app.http_client import print_connection_stats
+from app.rate_limit import print_rate_limit_stats, set_rate_limit
+from app.scraper import scrape_listings
+import app.ebay_search as ebay_search
+
+
+def run_benchmark(keywords, results, latency, error_rate, max_items, rate, marketplaces):
+    server, base_url, stats = start_mock_server(latency=latency, error_rate=error_rate, results=results)
+    point_scraper_at(base_url)
+    set_rate_limit('ebay', rate, burst_size=max(1, int(rate)))
+
+    access_token = get_access_token('mock-client', 'mock-secret', ebay_search.TOKEN_URL)
+    start = time.perf_counter()
+    scrape_stats = scrape_listings(None, access_token, SEARCH_KEYWORDS[:keywords], marketplaces,
+                                   max_items_per_keyword=max_items)
+    seconds = time.perf_counter() - start
+    server.shutdown()
+
+    print("=" * 60)
+    print(f"Marketplaces: {', '.join(marketplaces)}")
+    print(f"Keywords: {keywords}, results per keyword: {results}, latency: {latency * 1000:.0f} ms, error rate: {error_rate:.0%}")
+    print(f"Scraped {scrape_stats['items_processed']} items in {seconds:.2f} s ({scrape_stats['items_processed'] / seconds:.1f} items/s)")
+    print("Mock API requests:", {k: v for k, v in stats.items() if k != 'lock'})
+    print_connection_stats()
+    print_rate_limit_stats()
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scraping throughput against the mock eBay API")
+    parser.add_argument('--keywords', type=int, default=3, help="Number of SEARCH_KEYWORDS to scrape")
+    parser.add_argument('--results', type=int, default=500, help="Mock search results per keyword")
+    parser.add_argument('--latency', type=float, default=0.1, help="Mock API latency per request in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of mock requests failing with 429/503")
+    parser.add_argument('--max-items', type=int, default=1000, help="max_items_per_keyword passed to the scraper")
+    parser.add_argument('--rate', type=float, default=1000, help="Rate limiter requests/second per marketplace (the mock has no quota)")
+    parser.add_argument('--marketplaces', default='EBAY_US', help="Comma-separated marketplace IDs scraped concurrently")
+    args = parser.parse_args()
+    run_benchmark(args.keywords, args.results, args.latency, args.error_rate, args.max_items, args.rate,
+                  args.marketplaces.split(','))
@@ -0,0 +1,82 @@
+"""
+Enrichment update throughput benchmark: one UPDATE per listing (how the enrichment stages used
+to write their results) against bulk_update_listings (UPDATE ... FROM (VALUES ...) per chunk).
+
+Needs the database from .env. Everything is written to a throwaway schema that is dropped
+afterwards, so existing listings are not touched.
+
+Run from the backend directory:
+    python -m benchmarks.bench_update --rows 10000,100000 --chunk-size 1000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+
+from app.database import connect_to_db, create_tables, insert_listings_bulk, bulk_update_listings
+from app.migrations import apply_migrations
+from benchmarks.bench_insert import synthetic_listing
+
+PER_ROW_COMMIT_EVERY = 100 # The per-row path commits as often as the stages used to
+
+
+def run_benchmark(row_counts, chunk_size):
+    conn = connect_to_db()
+    if conn is None:
+        raise SystemExit("Could not connect to the database configured in .env")
+    schema = f"bench_update_{os.getpid()}"
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}; SET search_path TO {schema};")
+    conn.commit()
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_tables(conn)
+            apply_migrations(conn)
+
+        print("=" * 60)
+        for rows in row_counts:
+            with conn.cursor() as cursor:
+                cursor.execute("TRUNCATE TABLE ebay_listings CASCADE;")
+            conn.commit()
+            listings = [synthetic_listing(i) for i in range(rows)]
+            for start in range(0, rows, 1000):
+                insert_listings_bulk(conn, listings[start:start + 1000])
+            updates = [(listing['item_id'], random.uniform(1, 20), random.choice([10, 14, 18]))
+                       for listing in listings]
+
+            start = time.perf_counter()
+            with conn.cursor() as cursor:
+                for index, (item_id, weight, purity) in enumerate(updates, start=1):
+                    cursor.execute("UPDATE ebay_listings SET weight = %s, purity = %s WHERE item_id = %s;",
+                                   (weight, purity, item_id))
+                    if index % PER_ROW_COMMIT_EVERY == 0:
+                        conn.commit()
+            conn.commit()
+            per_row = time.perf_counter() - start
+
+            start = time.perf_counter()
+            updated = bulk_update_listings(conn, ['weight', 'purity'], updates, chunk_size=chunk_size)
+            bulk = time.perf_counter() - start
+
+            print(f"Rows: {rows}")
+            print(f"  {'per-row UPDATE':<24} {per_row:7.2f} s ({rows / per_row:9.1f} rows/s)")
+            print(f"  {'bulk_update_listings':<24} {bulk:7.2f} s ({rows / bulk:9.1f} rows/s, {updated} updated, chunk {chunk_size})")
+            print(f"  Speedup: {per_row / bulk:.1f}x")
+        print("=" * 60)
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE;")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-row against bulk enrichment updates")
+    parser.add_argument('--rows', default='10000,100000', help="Comma-separated listing counts to benchmark")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per bulk UPDATE statement")
+    args = parser.parse_args()
+    run_benchmark([int(rows) for rows in args.rows.split(',')], args.chunk_size)
@@ -1,16 +1,26 @@
-import os
-import time
+import sys
+import argparse
+import resource
 from datetime import datetime
 from dotenv import load_dotenv
 
 # Import all the modules you need
-from app.database import connect_to_db, create_database, create_tables, clear_tables
+from app.database import connect_to_db, create_database, create_tables, refresh_listing_feed, STAGE_CHUNK_SIZE
 from app.ebay_search import (
-    get_access_token, search_ebay_listings, get_item_details,
-    CLIENT_ID, CLIENT_SECRET, TOKEN_URL, SEARCH_KEYWORDS, 
-    MARKETPLACE_ID, RESULTS_PER_PAGE, MAX_PAGES, SELLER_FEEDBACK_MIN
+    get_access_token, CLIENT_ID, CLIENT_SECRET, TOKEN_URL, SEARCH_KEYWORDS, 
+    MARKETPLACE_IDS, SELLER_FEEDBACK_MIN, MAX_ITEMS_PER_KEYWORD
 )
-from app.database import insert_data
+from app.pipeline import run_pipeline, print_pipeline_stats
+from app.migrations import apply_migrations
+from app.generations import (
+    create_shadow_generation, shadow_generation_exists, use_shadow_generation, use_live_generation,
+    build_shadow_feed, swap_in_shadow_generation, SHADOW_SCHEMA
+)
+from app.checkpoints import start_run, get_resumable_run, mark_step_completed, finish_run
+from app.snapshots import capture_snapshots
+from app.http_client import print_connection_stats
+from app.detail_cache import print_cache_stats
+from app.rate_limit import print_rate_limit_stats
 from app.zero_shot_classifier import update_gold_column
 from app.extract_metadata import extract_metadata
 from app.calculate_profit import update_profit_column
@@ -18,21 +28,68 @@ from app.scam_risk_score import update_scam_risk_score_column
 
 load_dotenv()
 
+def reset_peak_rss():
+    """Starts a new peak RSS measurement; only Linux can reset the peak, elsewhere it covers the whole process."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    """Peak resident memory since the last reset_peak_rss, in MB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KB elsewhere
+
 def log_step(step_name, start_time=None):
-    """Helper function to log each step with timing"""
+    """Helper function to log each step with timing and peak memory"""
     current_time = datetime.now()
     if start_time:
         duration = current_time - start_time
-        print(f"✅ {step_name} completed in {duration.total_seconds():.2f} seconds")
+        print(f"✅ {step_name} completed in {duration.total_seconds():.2f} seconds (peak RSS {peak_rss_mb():.0f} MB)")
     else:
+        reset_peak_rss()
         print(f"🔄 Starting {step_name}...")
     return current_time
 
-def main():
-    """Main pipeline function that orchestrates the entire process"""
+def skip_step(step, completed_steps):
+    """True (after saying so) if a resumed run already completed this step."""
+    if step in completed_steps:
+        print(f"⏭️  Skipping {step}: completed before the run was interrupted")
+        return True
+    return False
+
+def main(incremental=False, resume=False, chunk_size=STAGE_CHUNK_SIZE, enrich_only=False):
+    """
+    Main pipeline function that orchestrates the entire process.
+
+    Every run is recorded in pipeline_runs with the steps it completed, and the scrape step
+    checkpoints each search's next results page. Enrichment steps commit as they go and only
+    pick up rows that are still missing their column.
+
+    A full run builds a new generation of the listings in a shadow schema and swaps it in as
+    its last step (see app/generations.py), so the API serves the previous listings until then.
+
+    Args:
+        incremental: Keep existing listings and only scrape and enrich listings newer than
+                     each keyword's watermark, instead of building a new generation from scratch.
+        resume: Continue the last run if it didn't complete: keep the data, skip completed
+                steps and continue scraping from the saved checkpoints. The resumed run's
+                mode is used instead of incremental and enrich_only.
+        chunk_size: Rows the enrichment steps stream from the database per round trip.
+        enrich_only: Skip scraping and only enrich, refresh the feed and snapshot the live
+                     listings, e.g. the unenriched rows written by app/scrape_worker.py.
+    """
     pipeline_start = datetime.now()
     print(f"🚀 Starting eBay Gold Scraper Pipeline at {pipeline_start.strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
+    print(f"   Marketplaces: {', '.join(MARKETPLACE_IDS)}")
 
     # Define multiple search keywords
     SEARCH_KEYWORDS_LIST = [
@@ -53,183 +110,171 @@ def main():
             raise Exception("Failed to connect to database")
         
         create_tables(conn)  # Ensure tables exist
-        clear_tables(conn)   # Clear existing data
+        apply_migrations(conn)  # Bring the schema up to date (columns, indexes)
+
+        resumable = get_resumable_run(conn) if resume else None
+        resumed = resumable is not None
+        if resume and not resumed:
+            print("   Nothing to resume: the last run completed or was abandoned. Starting a new run.")
+        if resumed:
+            run_id, mode, completed_steps = resumable
+            incremental = mode == 'incremental'
+            enrich_only = mode == 'enrich'
+            print(f"   Resuming run {run_id} (completed: {', '.join(completed_steps) or 'nothing'})")
+        else:
+            mode = 'enrich' if enrich_only else 'incremental' if incremental else 'full'
+            if mode == 'full':
+                # Built next to the live listings, which stay untouched (and keep their watermarks) until the swap
+                create_shadow_generation(conn)
+            run_id = start_run(conn, mode)
+            completed_steps = []
+
+        # Until the swap, a full run reads and writes the shadow generation's tables
+        build_shadow = mode == 'full' and 'swap' not in completed_steps
+        if build_shadow:
+            if not shadow_generation_exists(conn):
+                raise Exception(f"Run {run_id} has no shadow generation to continue; start a new run")
+            use_shadow_generation(conn)
+        print(f"   Run: {run_id}, mode: {mode}")
+        print("=" * 60)
         log_step("Database setup", step_start)
     except Exception as e:
         print(f"❌ Database setup failed: {e}")
         return False
 
-    # Step 2: eBay API Authentication
-    step_start = log_step("eBay API authentication")
-    try:
-        access_token = get_access_token(CLIENT_ID, CLIENT_SECRET, TOKEN_URL)
-        if not access_token:
-            raise Exception("Failed to get access token")
-        log_step("eBay API authentication", step_start)
-    except Exception as e:
-        print(f"❌ eBay API authentication failed: {e}")
+    def fail(step_name, error):
+        print(f"❌ {step_name} failed: {error}")
+        use_live_generation(conn)  # pipeline_runs and later statements go to the live schema again
+        if build_shadow:
+            print(f"   The shadow generation in '{SHADOW_SCHEMA}' is kept; continue it with --resume")
+        finish_run(conn, run_id, error)
         conn.close()
         return False
 
-    # Step 3: Scrape eBay Listings with Batch Processing
-    step_start = log_step("eBay listings scraping")
-    try:
-        # Construct search filters
-        search_filters = []
-        if SELLER_FEEDBACK_MIN > 0:
-            search_filters.append(f"feedbackScoreMin:[{SELLER_FEEDBACK_MIN}]")
-        filter_string = ",".join(search_filters) if search_filters else None
-
-        # Batch processing configuration
-        BATCH_SIZE = 100
-        batch_items = []
-        total_items_processed = 0
-        max_items_per_keyword = 1000  # Increased for large-scale scraping
-
-        for keyword_index, search_keyword in enumerate(SEARCH_KEYWORDS_LIST):
-            print(f"\n  🔍 Keyword {keyword_index + 1}/{len(SEARCH_KEYWORDS_LIST)}: '{search_keyword}'")
-            
-            page_number = 1
-            items_for_this_keyword = 0
-            
-            while page_number <= MAX_PAGES and items_for_this_keyword < max_items_per_keyword:
-                print(f"    📄 Processing page {page_number} for '{search_keyword}'...")
-                
-                # Calculate offset for pagination
-                offset = (page_number - 1) * RESULTS_PER_PAGE
-
-                item_summaries, total_listings = search_ebay_listings(
-                    access_token=access_token,
-                    search_query=search_keyword,
-                    category_ids=None,
-                    limit=RESULTS_PER_PAGE,
-                    marketplace_id=MARKETPLACE_ID,
-                    filter_str=filter_string,
-                    offset=offset
-                )
-
-                if total_listings == 0 or not item_summaries:
-                    print(f"    ℹ️ No more listings found for '{search_keyword}'")
-                    break
-
-                items_processed_this_page = 0
-                for summary in item_summaries:
-                    if items_for_this_keyword >= max_items_per_keyword:
-                        break
-                        
-                    item_id = summary.get('itemId')
-                    
-                    # Check for duplicates in database instead of memory
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT COUNT(*) FROM ebay_listings WHERE item_id = %s", (item_id,))
-                    if cursor.fetchone()[0] > 0:
-                        print(f"      ⏭️ Skipping duplicate item: {item_id}")
-                        cursor.close()
-                        continue
-                    cursor.close()
-                    
-                    seller_info = summary.get('seller', {})
-                    item_details = get_item_details(access_token, item_id, MARKETPLACE_ID)
-                    
-                    if item_details:
-                        item_data = {
-                            'item_id': item_id,
-                            'title': summary.get('title'),
-                            'price': summary.get('price', {}).get('value'),
-                            'currency': summary.get('price', {}).get('currency'),
-                            'seller_username': seller_info.get('username'),
-                            'seller_feedback_score': seller_info.get('feedbackScore'),
-                            'feedback_percent': seller_info.get('feedbackPercentage'),
-                            'image_url': summary.get('image', {}).get('imageUrl'),
-                            'item_url': summary.get('itemWebUrl'),
-                            'shipping_options': summary.get('shippingOptions', None),
-                            'top_rated_buying_experience': summary.get('topRatedBuyingExperience'),
-                            'description': item_details.get('description', None),
-                            'returns_accepted': item_details.get('returns_accepted', None),
-                            'metal': item_details.get('metal', None),
-                            'total_carat_weight': item_details.get('total_carat_weight', None),
-                            'metal_purity': item_details.get('metal_purity', None),
-                            'item_specifics': item_details.get('item_specifics', {}),
-                            'search_keyword': search_keyword
-                        }
-                        
-                        batch_items.append(item_data)
-                        items_processed_this_page += 1
-                        items_for_this_keyword += 1
-                        total_items_processed += 1
-
-                        # Process batch when it reaches BATCH_SIZE
-                        if len(batch_items) >= BATCH_SIZE:
-                            print(f"      📦 Processing batch of {len(batch_items)} items...")
-                            successful_inserts = 0
-                            for item in batch_items:
-                                if insert_data(conn, "ebay_listings", item):
-                                    successful_inserts += 1
-                            print(f"      ✅ Successfully inserted {successful_inserts}/{len(batch_items)} items")
-                            batch_items = []  # Clear the batch
-
-                print(f"    📊 Found {items_processed_this_page} new items for '{search_keyword}' on page {page_number}")
-                page_number += 1
-            
-            print(f"    ✅ Completed '{search_keyword}': {items_for_this_keyword} items processed")
-
-        # Process any remaining items in the final batch
-        if batch_items:
-            print(f"\n  📦 Processing final batch of {len(batch_items)} items...")
-            successful_inserts = 0
-            for item in batch_items:
-                if insert_data(conn, "ebay_listings", item):
-                    successful_inserts += 1
-            print(f"  ✅ Successfully inserted {successful_inserts}/{len(batch_items)} items")
-
-        print(f"  📊 Total items processed: {total_items_processed}")
-        log_step("eBay listings scraping (multiple keywords)", step_start)
-    except Exception as e:
-        print(f"❌ eBay scraping failed: {e}")
-        conn.close()
-        return False
+    # Step 2: eBay API Authentication
+    if not enrich_only:
+        step_start = log_step("eBay API authentication")
+        try:
+            access_token = get_access_token(CLIENT_ID, CLIENT_SECRET, TOKEN_URL)
+            if not access_token:
+                raise Exception("Failed to get access token")
+            log_step("eBay API authentication", step_start)
+        except Exception as e:
+            return fail("eBay API authentication", e)
+
+    # Step 3: Scrape eBay Listings, classifying and pricing them as they stream in
+    total_items_processed = 0
+    if not enrich_only and not skip_step('scrape', completed_steps):
+        step_start = log_step("eBay listings scraping and enrichment")
+        try:
+            # Construct search filters
+            search_filters = []
+            if SELLER_FEEDBACK_MIN > 0:
+                search_filters.append(f"feedbackScoreMin:[{SELLER_FEEDBACK_MIN}]")
+            filter_string = ",".join(search_filters) if search_filters else None
+
+            scrape_stats = run_pipeline(
+                conn, access_token, SEARCH_KEYWORDS_LIST, MARKETPLACE_IDS,
+                max_items_per_keyword=MAX_ITEMS_PER_KEYWORD,
+                filter_str=filter_string,
+                incremental=incremental,
+                run_id=run_id,
+                shadow=build_shadow
+            )
+            total_items_processed = scrape_stats['items_processed']
+
+            print(f"  📊 Total items processed: {total_items_processed}")
+            print_pipeline_stats(scrape_stats)
+            print("  🔌 HTTP connection reuse:")
+            print_connection_stats()
+            print_rate_limit_stats()
+            print_cache_stats()
+            log_step("eBay listings scraping and enrichment (multiple keywords)", step_start)
+            mark_step_completed(conn, run_id, 'scrape')
+        except Exception as e:
+            return fail("eBay scraping", e)
+
+    # Steps 4-6 only pick up listings the pipeline couldn't finish (e.g. a stage error or no gold price),
+    # or with --enrich-only, the listings scrape workers stored unenriched
 
     # Step 4: Gold Classification
-    step_start = log_step("Gold classification (AI)")
-    try:
-        update_gold_column(conn)
-        log_step("Gold classification", step_start)
-    except Exception as e:
-        print(f"❌ Gold classification failed: {e}")
-        conn.close()
-        return False
+    if not skip_step('classify', completed_steps):
+        step_start = log_step("Gold classification (AI)")
+        try:
+            update_gold_column(conn, only_unclassified=True, chunk_size=chunk_size)
+            log_step("Gold classification", step_start)
+            mark_step_completed(conn, run_id, 'classify')
+        except Exception as e:
+            return fail("Gold classification", e)
 
     # Step 5: Metadata Extraction
-    step_start = log_step("Metadata extraction")
-    try:
-        extract_metadata(conn)
-        log_step("Metadata extraction", step_start)
-    except Exception as e:
-        print(f"❌ Metadata extraction failed: {e}")
-        conn.close()
-        return False
+    if not skip_step('extract', completed_steps):
+        step_start = log_step("Metadata extraction")
+        try:
+            extract_metadata(conn, chunk_size=chunk_size)
+            log_step("Metadata extraction", step_start)
+            mark_step_completed(conn, run_id, 'extract')
+        except Exception as e:
+            return fail("Metadata extraction", e)
 
     # Step 6: Profit Calculation
-    step_start = log_step("Profit calculation")
-    try:
-        update_profit_column(conn)
-        log_step("Profit calculation", step_start)
-    except Exception as e:
-        print(f"❌ Profit calculation failed: {e}")
-        conn.close()
-        return False
+    if not skip_step('profit', completed_steps):
+        step_start = log_step("Profit calculation")
+        try:
+            update_profit_column(conn, chunk_size=chunk_size)
+            log_step("Profit calculation", step_start)
+            mark_step_completed(conn, run_id, 'profit')
+        except Exception as e:
+            return fail("Profit calculation", e)
 
     # Step 7: Scam Risk Assessment
-    step_start = log_step("Scam risk assessment (AI)")
-    try:
-        update_scam_risk_score_column(conn)
-        log_step("Scam risk assessment", step_start)
-    except Exception as e:
-        print(f"❌ Scam risk assessment failed: {e}")
-        conn.close()
-        return False
+    if not skip_step('scam', completed_steps):
+        step_start = log_step("Scam risk assessment (AI)")
+        try:
+            # A resumed run keeps the scores from before the interruption
+            update_scam_risk_score_column(conn, only_unscored=incremental or enrich_only or resumed, chunk_size=chunk_size)
+            log_step("Scam risk assessment", step_start)
+            mark_step_completed(conn, run_id, 'scam')
+        except Exception as e:
+            return fail("Scam risk assessment", e)
+
+    # Step 8: Listing Feed Refresh - the API serves the previous feed until this completes
+    if not skip_step('feed', completed_steps):
+        step_start = log_step("Listing feed refresh")
+        try:
+            if build_shadow:
+                build_shadow_feed(conn)  # The live feed keeps serving until the swap
+            else:
+                refresh_listing_feed(conn)
+            log_step("Listing feed refresh", step_start)
+            mark_step_completed(conn, run_id, 'feed')
+        except Exception as e:
+            return fail("Listing feed refresh", e)
+
+    # Step 9: Generation Swap - a full run's listings and feed replace the live ones in one transaction
+    if build_shadow:
+        step_start = log_step("Generation swap")
+        try:
+            swap_in_shadow_generation(conn, run_id)  # Also marks the 'swap' step completed
+            use_live_generation(conn)
+            build_shadow = False  # Nothing is left in the shadow schema for a resumed run
+            log_step("Generation swap", step_start)
+        except Exception as e:
+            return fail("Generation swap", e)
+
+    # Step 10: Price History Snapshot - appended to listing_snapshots, which outlives the listing tables.
+    # Taken from the live listings, after a full run's swap, so only generations that went live are recorded
+    if not skip_step('snapshot', completed_steps):
+        step_start = log_step("Price history snapshot")
+        try:
+            # Incremental runs keep listings they didn't scrape again; only record what changed
+            capture_snapshots(conn, run_id, only_changed=incremental or enrich_only)  # Also marks the 'snapshot' step completed
+            log_step("Price history snapshot", step_start)
+        except Exception as e:
+            return fail("Price history snapshot", e)
 
     # Cleanup
+    finish_run(conn, run_id)
     conn.close()
     
     # Final Summary
@@ -244,7 +289,19 @@ def main():
     return True
 
 if __name__ == "__main__":
-    success = main()
+    parser = argparse.ArgumentParser(description="eBay Gold Scraper pipeline")
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument('--incremental', action='store_true',
+                            help="Only scrape listings newer than the last incremental run instead of starting over")
+    mode_group.add_argument('--enrich-only', action='store_true',
+                            help="Don't scrape; enrich the live listings (e.g. written by scrape workers) and refresh the feed")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the last run from its checkpoints if it was interrupted or failed")
+    parser.add_argument('--chunk-size', type=int, default=STAGE_CHUNK_SIZE,
+                        help="Rows the enrichment steps stream from the database at a time (memory vs. round trips)")
+    args = parser.parse_args()
+
+    success = main(incremental=args.incremental, resume=args.resume, chunk_size=args.chunk_size, enrich_only=args.enrich_only)
     if not success:
         print("\n❌ Pipeline failed. Check the logs above for details.")
         exit(1)
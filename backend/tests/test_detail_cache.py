@@ -0,0 +1,59 @@
+import pytest
+from app import detail_cache
+from app.detail_cache import get_cache_stats, get_cached_details, store_details, summary_revision
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        self.now += 1  # Every access is later than the last one
+        return self.now
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    """An empty cache in a temporary SQLite file, with a fake clock for last_access."""
+    monkeypatch.setattr(detail_cache, 'DETAIL_CACHE_PATH', str(tmp_path / 'details.sqlite'))
+    monkeypatch.setattr(detail_cache, 'time', FakeClock())
+    monkeypatch.setattr(detail_cache, '_conn', None)
+    monkeypatch.setattr(detail_cache, '_stores_since_eviction', 0)
+    monkeypatch.setattr(detail_cache, '_stats', {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0})
+    yield
+    if detail_cache._conn is not None:
+        detail_cache._conn.close()
+
+
+def test_revision_tracks_revision_fields_only():
+    summary = {'title': '14k ring', 'price': {'value': '10.00'}, 'itemWebUrl': 'a'}
+    assert summary_revision(summary) == summary_revision(dict(summary, itemWebUrl='b'))
+    assert summary_revision(summary) != summary_revision(dict(summary, price={'value': '9.00'}))
+
+
+def test_store_and_hit(cache):
+    assert get_cached_details('1', 'r1') is None
+    store_details('1', 'r1', {'weight': '3.2g'})
+    assert get_cached_details('1', 'r1') == {'weight': '3.2g'}
+    assert get_cache_stats() == {'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0}
+
+
+def test_other_revision_is_a_miss_and_replaced(cache):
+    store_details('1', 'r1', {'weight': '3.2g'})
+    assert get_cached_details('1', 'r2') is None
+    store_details('1', 'r2', {'weight': '4g'})
+    assert get_cached_details('1', 'r1') is None
+    assert get_cached_details('1', 'r2') == {'weight': '4g'}
+
+
+def test_least_recently_used_evicted(cache, monkeypatch):
+    monkeypatch.setattr(detail_cache, 'DETAIL_CACHE_MAX_ENTRIES', 2)
+    monkeypatch.setattr(detail_cache, 'EVICTION_CHECK_INTERVAL', 1)
+    store_details('1', 'r', {})
+    store_details('2', 'r', {})
+    assert get_cached_details('1', 'r') == {}  # 2 is now the least recently used
+    store_details('3', 'r', {})
+    assert get_cached_details('2', 'r') is None
+    assert get_cached_details('1', 'r') == {}
+    assert get_cached_details('3', 'r') == {}
+    assert get_cache_stats()['evictions'] == 1
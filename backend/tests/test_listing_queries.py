@@ -0,0 +1,79 @@
+import pytest
+from app.database import (
+    _feed_filters, build_keyset_query, build_listings_query, decode_listings_cursor, encode_listings_cursor
+)
+
+
+@pytest.mark.parametrize('value, item_id', [
+    ('123.45', 'v1|1234|0'),
+    (None, 'v1|99|0'),
+    ('-5', 'id with spaces and = signs'),
+])
+def test_cursor_round_trip(value, item_id):
+    token = encode_listings_cursor('profit_desc', value, item_id)
+    assert '=' not in token
+    assert decode_listings_cursor(token, 'profit_desc') == (value, item_id)
+
+
+def test_cursor_keeps_decimal_as_string():
+    from decimal import Decimal
+    token = encode_listings_cursor('price_asc', Decimal('10.50'), 'v1|1|0')
+    assert decode_listings_cursor(token, 'price_asc') == ('10.50', 'v1|1|0')
+
+
+def test_cursor_for_another_sort_rejected():
+    token = encode_listings_cursor('profit_desc', '1', 'v1|1|0')
+    with pytest.raises(ValueError, match="issued for sort 'profit_desc'"):
+        decode_listings_cursor(token, 'price_asc')
+
+
+@pytest.mark.parametrize('token', ['not a cursor', 'e30', 'bnVsbA', '!!!!'])
+def test_malformed_cursor_rejected(token):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_listings_cursor(token, 'profit_desc')
+
+
+def test_feed_filters_skip_unset_and_non_positive_values():
+    assert _feed_filters() == ('', [])
+    assert _feed_filters(profit_min=0, scam_risk_max=0) == ('', [])
+
+
+def test_feed_filters_combine_in_order():
+    condition_string, params = _feed_filters(
+        profit_min=10, scam_risk_max=40, returns_accepted=True,
+        specifics={'Metal': '14k Gold', 'Brand': None}, shipping_max=5
+    )
+    assert condition_string == (
+        " AND profit_pct >= %s AND scam_risk_score <= %s AND returns_accepted = %s"
+        " AND item_specifics ? %s AND item_specifics @> %s::jsonb AND shipping_cost <= %s"
+    )
+    assert params[:4] == [10, 40, True, 'Brand']
+    assert params[4].adapted == {'Metal': '14k Gold'}
+    assert params[5] == 5
+
+
+def test_listings_query_falls_back_to_profit_order():
+    count_query, query, params = build_listings_query(profit_min=5, sort_by='no_such_order')
+    assert 'profit_pct >= %s' in count_query
+    assert 'ORDER BY profit DESC, item_id DESC LIMIT %s OFFSET %s' in query
+    assert params == [5]
+
+
+def test_keyset_query_first_page():
+    query, extra_params = build_keyset_query('price', 'ASC', '')
+    assert 'WHERE price IS NOT NULL' in query
+    assert 'ORDER BY price ASC, item_id ASC' in query
+    assert extra_params == []
+
+
+def test_keyset_query_after_row_uses_row_comparison():
+    query, extra_params = build_keyset_query('profit', 'DESC', ' AND profit_pct >= %s', after=('12.5', 'v1|7|0'))
+    assert '(profit, item_id) < (%s, %s)  AND profit_pct >= %s' in query
+    assert extra_params == ['12.5', 'v1|7|0']
+
+
+def test_keyset_query_null_segment_pages_by_item_id():
+    query, extra_params = build_keyset_query('profit', 'DESC', '', after=(None, 'v1|7|0'), null_segment=True)
+    assert 'WHERE profit IS NULL AND item_id < %s' in query
+    assert 'ORDER BY item_id DESC' in query
+    assert extra_params == ['v1|7|0']
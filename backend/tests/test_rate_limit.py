@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import pytest
+from app import rate_limit
+from app.rate_limit import RETRY_MAX_DELAY, backoff_delay, parse_retry_after
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('120', 120),
+    ('1.5', 1.5),
+    ('-3', 0),
+    (None, None),
+    ('', None),
+    ('soon', None),
+])
+def test_parse_retry_after_seconds(value, seconds):
+    assert parse_retry_after(value) == seconds
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=90)
+    assert 80 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 90
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+
+@pytest.fixture
+def max_jitter(monkeypatch):
+    """Makes the full jitter pick the top of its range."""
+    monkeypatch.setattr(rate_limit.random, 'uniform', lambda low, high: high)
+
+
+@pytest.mark.parametrize('attempt, delay', [(0, 1), (1, 2), (3, 8), (10, RETRY_MAX_DELAY)])
+def test_backoff_doubles_up_to_the_cap(max_jitter, attempt, delay):
+    assert backoff_delay(attempt) == delay
+
+
+def test_backoff_jitter_stays_in_range():
+    assert all(0 <= backoff_delay(2) <= 4 for _ in range(100))
+
+
+def test_backoff_honours_longer_retry_after(max_jitter):
+    assert backoff_delay(0, retry_after='7') == 7
+    assert backoff_delay(3, retry_after='2') == 8
+    assert backoff_delay(0, retry_after='3600') == RETRY_MAX_DELAY
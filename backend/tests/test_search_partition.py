@@ -0,0 +1,73 @@
+import re
+from decimal import Decimal
+import pytest
+from app import search_partition
+from app.search_partition import band_filter, partition_price_bands
+
+
+class FakeSearch:
+    """Stands in for search_ebay_listings: counts listings at the given prices per price filter."""
+
+    def __init__(self, prices, fail_bands=()):
+        self.prices = [Decimal(str(price)) for price in prices]
+        self.fail_bands = set(fail_bands)
+        self.filters = []
+
+    def __call__(self, access_token, search_query, category_ids, limit, marketplace_id, filter_str):
+        self.filters.append(filter_str)
+        match = re.search(r'price:\[([\d.]+)\.\.([\d.]*)\]', filter_str or '')
+        if match is None:
+            return [{}], len(self.prices)
+        low, high = Decimal(match.group(1)), Decimal(match.group(2)) if match.group(2) else None
+        if (low, high) in self.fail_bands:
+            return None, 0
+        total = sum(1 for price in self.prices if price >= low and (high is None or price <= high))
+        return [{}] * min(total, 1), total
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    def install(prices, **kwargs):
+        search = FakeSearch(prices, **kwargs)
+        monkeypatch.setattr(search_partition, 'search_ebay_listings', search)
+        monkeypatch.setattr(search_partition, 'PRICE_PARTITION_CEILING', 100)
+        return search
+    return install
+
+
+def test_band_filter():
+    assert band_filter(None, (Decimal('0'), Decimal('50')), 'USD') == 'price:[0..50],priceCurrency:USD'
+    assert band_filter('buyingOptions:{FIXED_PRICE}', (Decimal('100.01'), None), 'GBP') == \
+        'buyingOptions:{FIXED_PRICE},price:[100.01..],priceCurrency:GBP'
+
+
+def test_small_search_is_not_partitioned(fake_search):
+    search = fake_search([1, 2, 3])
+    assert partition_price_bands('token', 'gold', 'EBAY_US', max_results=5) == [(None, None, 3)]
+    assert len(search.filters) == 1
+
+
+def test_bands_are_disjoint_cover_every_listing_and_fit(fake_search):
+    prices = [1, 5, 5, 12, 30, 30, 31, 60, 75, 99, 100, 250, 900]
+    fake_search(prices)
+    bands = partition_price_bands('token', 'gold', 'EBAY_US', max_results=3)
+
+    assert all(total <= 3 for _, _, total in bands)
+    assert sum(total for _, _, total in bands) == len(prices)
+    assert [band[0] for band in bands] == sorted(band[0] for band in bands)
+    for (_, high, _), (next_low, _, _) in zip(bands, bands[1:]):
+        assert next_low > high
+    assert bands[-1][:2] == (Decimal('100.01'), None)
+
+
+def test_band_at_a_single_price_is_kept_whole(fake_search):
+    fake_search([5] * 4 + [80])
+    bands = partition_price_bands('token', 'gold', 'EBAY_US', max_results=3)
+    assert (Decimal('5'), Decimal('5'), 4) in bands
+    assert sum(total for _, _, total in bands) == 5
+
+
+def test_failed_probe_keeps_band_uncounted(fake_search):
+    fake_search([10, 20, 30, 40, 200], fail_bands={(Decimal('100.01'), None)})
+    bands = partition_price_bands('token', 'gold', 'EBAY_US', max_results=3)
+    assert (Decimal('100.01'), None, 0) in bands
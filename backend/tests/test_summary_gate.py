@@ -0,0 +1,48 @@
+import pytest
+from app.summary_gate import _rejected_term, gate_summary
+
+
+@pytest.mark.parametrize('title', [
+    '14k Solid Gold Ring Not Gold Plated',
+    '18k gold chain, acid tested',
+    '10k gold GP mark scrap',
+    'Not real gold-plated 14k chain',
+    '14K yellow gold bracelet not gold filled',
+    'Vintage 14k gold ring NOT PLATED',
+    '14k non-plated solid gold band',
+    '14k gold pendant no gold tone',
+    '14K White Gold Rhodium Plated Diamond Ring 3.2g',
+    '10k GF Grandfather estate ring',
+    'Costume box lot with 14k gold ring',
+])
+def test_gold_titles_pass(title):
+    assert _rejected_term(title) is None
+
+
+@pytest.mark.parametrize('title, term', [
+    ('Gold Plated Sterling Silver Ring', 'gold plated'),
+    ('NO RESERVE gold plated ring', 'gold plated'),
+    ('14k gold ring, no stones, gold filled chain', 'gold filled'),
+    ('Gold Plated Not Solid', 'gold plated'),
+    ('18k HGE bangle', 'hge'),
+    ('Electroplated 14k gold chain', 'electroplated'),
+    ('Gold test kit with acid', 'test'),
+    ('Electronic gold tester 10k-24k', 'test'),
+])
+def test_fake_or_accessory_titles_rejected(title, term):
+    assert _rejected_term(title) == term
+
+
+def test_gate_summary_reports_reject_term():
+    summary = {'title': '14k Gold Plated Chain', 'price': {'value': '20.00', 'currency': 'USD'}}
+    assert gate_summary(summary) == 'reject_term:gold plated'
+
+
+def test_gate_summary_passes_negated_phrase():
+    summary = {'title': '14k Solid Gold Ring Not Gold Plated', 'price': {'value': '250.00', 'currency': 'USD'}}
+    assert gate_summary(summary) is None
+
+
+def test_gate_summary_passes_rhodium_plated_white_gold():
+    summary = {'title': 'rhodium plated 14k white gold band', 'price': {'value': '180.00', 'currency': 'USD'}}
+    assert gate_summary(summary) is None
@@ -0,0 +1,75 @@
+import json
+import pytest
+from app import token_provider
+from app.token_provider import REFRESH_MARGIN_SECONDS, current_access_token, get_access_token, refresh_access_token
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def tokens(monkeypatch, tmp_path):
+    """Fresh provider state with a fake clock, a temporary disk cache and a fake token endpoint."""
+    clock = FakeClock()
+    issued = []
+
+    def request_access_token(client_id, client_secret, token_url):
+        issued.append(client_id)
+        return {'access_token': f'token-{len(issued)}', 'expires_in': 7200}
+
+    monkeypatch.setattr(token_provider, 'time', clock)
+    monkeypatch.setattr(token_provider, 'TOKEN_CACHE_PATH', str(tmp_path / 'token.json'))
+    monkeypatch.setattr(token_provider, 'request_access_token', request_access_token)
+    monkeypatch.setattr(token_provider, '_token', None)
+    monkeypatch.setattr(token_provider, '_credentials', None)
+    return clock, issued
+
+
+def test_token_reused_until_refresh_margin(tokens):
+    clock, issued = tokens
+    assert get_access_token('id', 'secret', 'url') == 'token-1'
+    clock.now += 7200 - REFRESH_MARGIN_SECONDS - 1
+    assert get_access_token('id', 'secret', 'url') == 'token-1'
+    clock.now += 2
+    assert get_access_token('id', 'secret', 'url') == 'token-2'
+    assert issued == ['id', 'id']
+
+
+def test_token_loaded_from_disk_cache(tokens):
+    clock, issued = tokens
+    get_access_token('id', 'secret', 'url')
+    with open(token_provider.TOKEN_CACHE_PATH) as f:
+        assert json.load(f)['access_token'] == 'token-1'
+    token_provider._token = None  # A new process
+    assert get_access_token('id', 'secret', 'url') == 'token-1'
+    assert len(issued) == 1
+
+
+def test_cached_token_for_other_client_ignored(tokens):
+    clock, issued = tokens
+    get_access_token('id', 'secret', 'url')
+    assert get_access_token('other-id', 'secret', 'url') == 'token-2'
+    assert issued == ['id', 'other-id']
+
+
+def test_refresh_after_401_only_once(tokens):
+    clock, issued = tokens
+    assert refresh_access_token('stale') is None  # No credentials yet
+    get_access_token('id', 'secret', 'url')
+    assert refresh_access_token('token-1') == 'token-2'
+    # A second worker rejected with the old token gets the refreshed one
+    assert refresh_access_token('token-1') == 'token-2'
+    assert len(issued) == 2
+
+
+def test_current_access_token(tokens):
+    clock, issued = tokens
+    assert current_access_token('static') == 'static'
+    get_access_token('id', 'secret', 'url')
+    clock.now += 7200
+    assert current_access_token('static') == 'token-2'
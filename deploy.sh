@@ -21,6 +21,10 @@ echo "🔧 Installing backend dependencies..."
 cd /root/Ebay-Gold-Scraper/backend
 pip install -r requirements.txt
 
+# Apply schema migrations before the new code serves requests
+echo "🗄️  Applying database migrations..."
+python -m app.migrations
+
 # Restart backend service
 echo "🔄 Restarting backend service..."
 sudo systemctl restart meltwise-backend
@@ -8,7 +8,9 @@ cd /root/Ebay-Gold-Scraper/backend
 source /root/Ebay-Gold-Scraper/production_env/bin/activate
 
 # Run the pipeline with logging
-python run.py >> /var/log/gold-scraper.log 2>&1
+# --resume continues the previous run if it failed (e.g. keeping its scraped generation), or starts a new one;
+# a failed run older than a day or attempted 3 times is abandoned
+python run.py --resume >> /var/log/gold-scraper.log 2>&1
 
 # Optional: Add timestamp to log
 echo "$(date): Daily scraper run completed" >> /var/log/gold-scraper.log